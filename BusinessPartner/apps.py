@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class BusinessPartnerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'BusinessPartner'
+
+    def ready(self):
+        from . import directory  # noqa: F401  (registers the directory cache invalidation signals)
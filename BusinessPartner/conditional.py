@@ -0,0 +1,48 @@
+import hashlib
+
+from django.db.models import Count
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def weak_etag(request, *state):
+    """
+    Weak validator for a response built from `state`. The path and query
+    string are part of it, since fieldsets, filters and cursors change the body.
+    """
+    digest = hashlib.md5(repr([request.get_full_path(), *state]).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def row_etag(request, *instances):
+    """Validator for a response serialized from `instances` (None is skipped), from their updated_at."""
+    return weak_etag(request, [
+        (instance._meta.label, instance.pk, instance.updated_at) for instance in instances if instance is not None
+    ])
+
+
+def list_etag(request, queryset, count=None):
+    """
+    Validator for a list: the newest updated_at among the rows and their
+    number, so edits, additions and deletions all change it. Pass `count`
+    when it is known without counting the rows.
+    """
+    queryset = queryset.order_by()
+    latest = queryset.order_by('-updated_at').values_list('updated_at', flat=True).first()
+    if count is None:
+        count = queryset.aggregate(rows=Count('pk'))['rows']
+    return weak_etag(request, queryset.model._meta.label, latest, count)
+
+
+def not_modified(request, etag):
+    """Whether If-None-Match names `etag`; the comparison is weak, as RFC 9110 asks for GET."""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    return tags == ['*'] or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in tags}
+
+
+def not_modified_response(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+RELOAD_CHECK_SECONDS = 60
+
+
+class DatasetCache:
+    """
+    The loaded form of a bundled data file whose path comes from `setting`.
+    The file is opened on first use and again when it is replaced (within
+    RELOAD_CHECK_SECONDS), e.g. by a refresh command writing it with
+    write_atomic(). `load(path)` returns an object with `path` and `mtime`.
+    """
+    instances = []
+
+    def __init__(self, setting, default_path, load):
+        self.setting = setting
+        self.default_path = default_path
+        self.load = load
+        self.lock = threading.Lock()
+        self.value = None
+        self.checked_at = None  # time.monotonic() of the last look at the file
+        DatasetCache.instances.append(self)
+
+    def path(self):
+        return getattr(settings, self.setting, self.default_path)
+
+    def get(self):
+        """The loaded dataset, or None when the file does not exist."""
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < RELOAD_CHECK_SECONDS:
+            return self.value
+        with self.lock:
+            self.checked_at = now
+            path = self.path()
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                self.value = None
+                return None
+            if self.value is None or self.value.path != path or self.value.mtime != mtime:
+                self.value = self.load(path)
+            return self.value
+
+    def reset(self):
+        """Forget the loaded dataset, so the next lookup opens the file again."""
+        with self.lock:
+            self.value, self.checked_at = None, None
+
+
+@receiver(setting_changed)
+def reset_datasets(setting, **kwargs):
+    for cache in DatasetCache.instances:
+        if cache.setting == setting:
+            cache.reset()
+
+
+def write_atomic(path, write):
+    """
+    Call `write(file)` on a temporary file next to `path` and move it into
+    place, so readers never see a partial file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            write(file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
@@ -0,0 +1,132 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .enrichment import enriched
+from .imports import imported
+from .models import BusinessPartner
+
+
+KEY_PREFIX = 'bp-directory'
+STATS = ('hits', 'misses', 'rebuilds', 'coalesced')
+
+
+def generation_key(role):
+    return f"{KEY_PREFIX}:generation:{role}"
+
+
+def generation(role):
+    """
+    The role's current generation; cached responses are keyed by it, so
+    bumping it drops them all at once. A generation evicted from the cache
+    restarts from a random value, never from one that old entries used.
+    """
+    key = generation_key(role)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, uuid.uuid4().int % 10 ** 12, timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def invalidate(*roles):
+    """Drop the cached directories of `roles` once the current transaction commits."""
+    transaction.on_commit(lambda: bump(roles))
+
+
+def bump(roles):
+    for role in {role for role in roles if role}:
+        try:
+            cache.incr(generation_key(role))
+        except ValueError:
+            # Not cached: the next read starts a fresh generation anyway.
+            pass
+
+
+def count(stat):
+    key = f"{KEY_PREFIX}:stats:{stat}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    values = cache.get_many([f"{KEY_PREFIX}:stats:{stat}" for stat in STATS])
+    return {stat: values.get(f"{KEY_PREFIX}:stats:{stat}", 0) for stat in STATS}
+
+
+def response_key(role, request):
+    """Cache key for `request` (path, filters, fieldset and page) in the role's current generation."""
+    query = sorted(request.GET.lists())
+    digest = hashlib.md5(repr([request.path, query]).encode()).hexdigest()
+    return f"{KEY_PREFIX}:{role}:{generation(role)}:{digest}"
+
+
+def cached_response(role, request, build):
+    """
+    Return (body, hit) for `request`, calling `build()` for the body on a
+    miss. Only one caller rebuilds a missing entry: the others wait up to
+    BP_DIRECTORY_WAIT_SECONDS (default 5) for it to appear before building
+    it themselves. Entries live BP_DIRECTORY_CACHE_SECONDS (default 3600)
+    at most, in case partners are changed without the model signals.
+    """
+    key = response_key(role, request)
+    body = cache.get(key)
+    if body is not None:
+        count('hits')
+        return body, True
+
+    count('misses')
+    lock = f"{key}:lock"
+    wait = getattr(settings, 'BP_DIRECTORY_WAIT_SECONDS', 5)
+    locked = cache.add(lock, 1, timeout=wait)
+    if not locked:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            body = cache.get(key)
+            if body is not None:
+                count('coalesced')
+                return body, True
+    try:
+        body = build()
+        count('rebuilds')
+        cache.set(key, body, timeout=getattr(settings, 'BP_DIRECTORY_CACHE_SECONDS', 3600))
+    finally:
+        if locked:
+            cache.delete(lock)
+    return body, False
+
+
+@receiver(pre_save, sender=BusinessPartner)
+def remember_directory_role(sender, instance, **kwargs):
+    if instance.pk:
+        instance._role_before = BusinessPartner.objects.filter(pk=instance.pk).values_list('role', flat=True).first()
+
+
+@receiver(post_save, sender=BusinessPartner)
+def invalidate_on_save(sender, instance, **kwargs):
+    invalidate(instance.role, getattr(instance, '_role_before', None))
+
+
+@receiver(post_delete, sender=BusinessPartner)
+def invalidate_on_delete(sender, instance, **kwargs):
+    invalidate(instance.role)
+
+
+@receiver(imported, sender=BusinessPartner)
+def invalidate_on_import(sender, instances, **kwargs):
+    invalidate(*(partner.role for partner in instances))
+
+
+@receiver(enriched, sender=BusinessPartner)
+def invalidate_on_enrich(sender, pks, **kwargs):
+    invalidate(*BusinessPartner.objects.filter(pk__in=pks).values_list('role', flat=True).distinct())
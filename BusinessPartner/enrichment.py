@@ -0,0 +1,261 @@
+import logging
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .outbound import get_client
+from .pincodes import resolve as resolve_pincode
+
+
+logger = logging.getLogger(__name__)
+
+ENRICH_BATCH_SIZE = 200
+ENRICH_MAX_ATTEMPTS = 5
+ENRICH_RETRY_SECONDS = 60
+ENRICH_CLAIM_SECONDS = 300
+UNKNOWN = 'Unknown'
+
+# Sent after each batch is written, with sender=model and pks=[enriched rows].
+# The rows are written with UPDATE, so post_save does not run.
+enriched = Signal()
+
+# Location fields filled from the pincode, per model; the LOCATION_ENRICHED_MODELS setting can add or replace entries.
+DEFAULT_ENRICHED_MODELS = {
+    'BusinessPartner.BusinessPartner': ('city', 'state'),
+    'user.ResUser': ('city', 'state', 'country'),
+}
+LOCATION_KEYS = ('city', 'state', 'country')
+
+
+def enriched_models():
+    """[(model, location fields)] for every model enriched in the background."""
+    models = {**DEFAULT_ENRICHED_MODELS, **getattr(settings, 'LOCATION_ENRICHED_MODELS', {})}
+    return [(apps.get_model(label), fields) for label, fields in models.items()]
+
+
+def is_missing(value):
+    return value is None or value == '' or value == UNKNOWN
+
+
+def missing(field):
+    return Q(**{f"{field}__isnull": True}) | Q(**{field: ''}) | Q(**{field: UNKNOWN})
+
+
+def resolve_location(pincode, online=False):
+    """
+    {city, state, country} for the pincode, or None when it cannot be
+    resolved. With `online` and the LOCATION_ONLINE_FALLBACK setting,
+    pincodes missing from the local dataset are asked of the postalpincode
+    service, which raises OutboundError when it cannot answer.
+    """
+    location = resolve_pincode(pincode)
+    if location is None and online and getattr(settings, 'LOCATION_ONLINE_FALLBACK', False):
+        location = lookup_online(pincode)
+    return dict(zip(LOCATION_KEYS, location)) if location is not None else None
+
+
+def lookup_online(pincode):
+    """(district, state, country) from api.postalpincode.in, or None."""
+    pincode = str(pincode or '')
+    if len(pincode) != 6 or not pincode.isdigit():
+        return None
+    data = get_client('postalpincode').get_json(
+        f"pincode/{pincode}", negative=lambda data: not (data and data[0].get('Status') == 'Success' and data[0].get('PostOffice')))
+    if not (data and data[0].get('Status') == 'Success' and data[0].get('PostOffice')):
+        return None
+    post_office = data[0]['PostOffice'][0]
+    return post_office.get('District') or None, post_office.get('State') or None, post_office.get('Country') or None
+
+
+def fill_location(instance, fields, location):
+    """Set the missing `fields` of an unsaved instance from a resolve_location() result."""
+    for field in fields:
+        if is_missing(getattr(instance, field)):
+            setattr(instance, field, location[field])
+
+
+def clear_stale_location(instance, fields):
+    """
+    When the pincode of a stored row changes, set those of `fields` that the
+    save leaves as they were to Unknown, so they are filled for the new
+    pincode instead of being kept for the old one.
+    """
+    if instance._state.adding or not instance.pincode:
+        return
+    stored = type(instance)._base_manager.filter(pk=instance.pk).values_list('pincode', *fields).first()
+    if stored is None or stored[0] == instance.pincode:
+        return
+    for field, value in zip(fields, stored[1:]):
+        if getattr(instance, field) == value:
+            setattr(instance, field, UNKNOWN)
+
+
+def touches_location(update_fields, fields):
+    """Whether a save with `update_fields` writes the pincode or any of the location `fields`."""
+    return update_fields is None or bool({'pincode', *fields} & set(update_fields))
+
+
+def mark_pending(instance, fields):
+    """
+    Flag an instance about to be saved for enrichment when it has a pincode
+    but some of `fields` are empty or Unknown, or its pincode changed.
+    Called from pre_save, so the save itself never waits for a lookup.
+    """
+    clear_stale_location(instance, fields)
+    if instance.pincode and any(is_missing(getattr(instance, field)) for field in fields):
+        instance.location_status = 'pending'
+        instance.location_attempts = 0
+        instance.location_retry_at = timezone.now()
+    elif instance.location_status == 'pending':
+        # Filled in by hand before the worker got to it.
+        instance.location_status = ''
+        instance.location_retry_at = None
+
+
+def retry_delay(attempts):
+    """Seconds before attempt `attempts` + 1: ENRICH_RETRY_SECONDS doubled per attempt, capped at a day."""
+    base = getattr(settings, 'LOCATION_ENRICH_RETRY_SECONDS', ENRICH_RETRY_SECONDS)
+    return min(base * 2 ** (attempts - 1), 86400)
+
+
+def claim_batch(model, batch_size, now):
+    """
+    Claim up to `batch_size` pending rows that are due, oldest first, as
+    [(pk, pincode, attempts)]. Claimed rows are pushed out of reach for
+    LOCATION_ENRICH_CLAIM_SECONDS, so concurrent workers take different
+    rows, and rows of a worker that died are picked up again afterwards.
+    """
+    claim_until = now + timedelta(seconds=getattr(settings, 'LOCATION_ENRICH_CLAIM_SECONDS', ENRICH_CLAIM_SECONDS))
+    rows = model._base_manager.filter(location_status='pending', location_retry_at__lte=now)
+    with transaction.atomic():
+        claimed = list(
+            rows.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+            .order_by('location_retry_at', 'pk')
+            .values_list('pk', 'pincode', 'location_attempts')[:batch_size]
+        )
+        if claimed:
+            model._base_manager.filter(pk__in=[pk for pk, pincode, attempts in claimed]).update(location_retry_at=claim_until)
+    return claimed
+
+
+def resolve_batch(claimed):
+    """
+    {pincode: resolve_location() result} for the claimed rows, each
+    distinct pincode looked up once; None for those that failed. Runs
+    outside any transaction, since it may wait on the online lookup.
+    """
+    locations = {}
+    for pk, pincode, attempts in claimed:
+        if pincode in locations:
+            continue
+        try:
+            locations[pincode] = resolve_location(pincode, online=True)
+        except Exception:
+            logger.exception("Location lookup failed for pincode %s", pincode)
+            locations[pincode] = None
+    return locations
+
+
+def enrich_batch(model, fields, claimed, locations, now):
+    """
+    Write the resolve_batch() `locations` of the claimed rows with one
+    UPDATE per pincode; only fields that are still empty or Unknown are
+    filled. Rows whose pincode changed since the claim are left to their
+    new claim. Unresolved rows are retried with exponential backoff and
+    marked failed after LOCATION_ENRICH_MAX_ATTEMPTS.
+    Returns a Counter of rows per outcome (resolved, retried, failed).
+    """
+    by_pincode = defaultdict(list)
+    for pk, pincode, attempts in claimed:
+        by_pincode[pincode].append((pk, attempts))
+    max_attempts = getattr(settings, 'LOCATION_ENRICH_MAX_ATTEMPTS', ENRICH_MAX_ATTEMPTS)
+    outcome = Counter()
+    resolved = []
+    unresolved = defaultdict(list)
+    for pincode, rows in by_pincode.items():
+        location = locations.get(pincode)
+        if location is None:
+            for pk, attempts in rows:
+                unresolved[(pincode, attempts + 1)].append(pk)
+            continue
+        pks = [pk for pk, attempts in rows]
+        values = {field: Case(When(missing(field), then=Value(location[field])), default=F(field)) for field in fields}
+        outcome['resolved'] += model._base_manager.filter(pk__in=pks, location_status='pending', pincode=pincode).update(
+            location_status='', location_attempts=0, location_retry_at=None, updated_at=now, **values
+        )
+        resolved.extend(pks)
+
+    for (pincode, attempts), pks in unresolved.items():
+        rows = model._base_manager.filter(pk__in=pks, location_status='pending', pincode=pincode)
+        if attempts >= max_attempts:
+            outcome['failed'] += rows.update(location_status='failed', location_attempts=attempts, location_retry_at=None)
+        else:
+            retry_at = now + timedelta(seconds=retry_delay(attempts))
+            outcome['retried'] += rows.update(location_attempts=attempts, location_retry_at=retry_at)
+
+    if resolved:
+        transaction.on_commit(lambda: enriched.send(sender=model, pks=resolved))
+    return outcome
+
+
+def enrich_pending(batch_size=None, now=None):
+    """
+    Enrich pending rows of every enriched model, a batch at a time, until
+    none are due. Safe to run in several threads or processes at once.
+    Returns a Counter of rows per outcome.
+    """
+    batch_size = batch_size or getattr(settings, 'LOCATION_ENRICH_BATCH_SIZE', ENRICH_BATCH_SIZE)
+    outcome = Counter()
+    for model, fields in enriched_models():
+        while True:
+            batch_now = now or timezone.now()
+            claimed = claim_batch(model, batch_size, batch_now)
+            if not claimed:
+                break
+            locations = resolve_batch(claimed)
+            with transaction.atomic():
+                outcome += enrich_batch(model, fields, claimed, locations, batch_now)
+            if len(claimed) < batch_size:
+                break
+    return outcome
+
+
+def _worker(batch_size):
+    try:
+        return enrich_pending(batch_size)
+    finally:
+        connection.close()
+
+
+def run_pool(workers=None, batch_size=None):
+    """Run enrich_pending() in LOCATION_ENRICH_WORKERS (default 4) threads and add up their outcomes."""
+    workers = workers or getattr(settings, 'LOCATION_ENRICH_WORKERS', 4)
+    if workers <= 1:
+        return enrich_pending(batch_size)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = [pool.submit(_worker, batch_size) for _ in range(workers)]
+        return sum((result.result() for result in results), Counter())
+
+
+def requeue(now=None):
+    """
+    Queue for enrichment again every row with a pincode whose location is
+    still empty or Unknown: failed rows, and rows saved as Unknown by the
+    old synchronous lookups. Returns {model label: rows queued}.
+    """
+    now = now or timezone.now()
+    queued = {}
+    for model, fields in enriched_models():
+        stale = reduce(or_, (missing(field) for field in fields))
+        rows = model._base_manager.filter(stale).exclude(location_status='pending').exclude(pincode__isnull=True).exclude(pincode='')
+        queued[model._meta.label] = rows.update(location_status='pending', location_attempts=0, location_retry_at=now)
+    return queued
@@ -0,0 +1,99 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def parse_field_list(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for `?fields=a,b` and `?exclude=c,d` on read requests.
+
+    Only the readable fields of the serializer can be named; anything else is
+    a 400. Fields that do not map one-to-one onto a model column (method
+    fields, computed values) list the columns they read in
+    `Meta.sparse_field_sources`, so views can project the queryset with
+    `apply_sparse_fields()` and skip loading the unused wide columns.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        selected = self.get_sparse_fields(request)
+        if selected is not None:
+            for name in list(self.fields):
+                if name not in selected:
+                    self.fields.pop(name)
+
+    @classmethod
+    def get_readable_fields(cls):
+        return [name for name, field in cls().fields.items() if not field.write_only]
+
+    @classmethod
+    def get_sparse_fields(cls, request):
+        """Return the set of requested field names, or None when all fields are wanted."""
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        fields = parse_field_list(request.query_params.get('fields', ''))
+        exclude = parse_field_list(request.query_params.get('exclude', ''))
+        if not fields and not exclude:
+            return None
+
+        readable = cls.get_readable_fields()
+        unknown = [name for name in fields + exclude if name not in readable]
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(readable)}."
+            })
+        selected = set(fields) if fields else set(readable)
+        return selected - set(exclude)
+
+    @classmethod
+    def get_sparse_columns(cls, selected):
+        """
+        Map the selected serializer fields to model columns for `.only()`.
+        Returns None when a field cannot be mapped, meaning "load everything".
+        """
+        model = cls.Meta.model
+        sources = getattr(cls.Meta, 'sparse_field_sources', {})
+        fields = cls().fields
+        columns = []
+        for name in selected:
+            if name in sources:
+                columns.extend(sources[name])
+                continue
+            field = fields[name]
+            if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+                return None
+            try:
+                model_field = model._meta.get_field(field.source.split('.')[0])
+            except FieldDoesNotExist:
+                return None
+            if model_field.concrete and not model_field.many_to_many:
+                columns.append(model_field.name)
+        return columns
+
+
+def apply_sparse_fields(queryset, serializer_class, request):
+    """
+    Defer the model columns the requested fieldset does not need.
+    Relations in the view's select_related() plan whose field was not
+    selected are dropped, since a deferred field cannot be joined.
+    """
+    selected = serializer_class.get_sparse_fields(request)
+    if selected is None:
+        return queryset
+    columns = serializer_class.get_sparse_columns(selected)
+    if columns is None:
+        return queryset
+    related = queryset.query.select_related
+    if isinstance(related, dict):
+        keep = [name for name in related if name in columns]
+        queryset = queryset.select_related(None)
+        if keep:
+            queryset = queryset.select_related(*keep)
+    return queryset.only(*columns)
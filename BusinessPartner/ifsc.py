@@ -0,0 +1,232 @@
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from .datasets import DatasetCache, write_atomic
+
+
+# File layout: header, then uint32 arrays in the byte order named in the
+# header: (bank, branch, city, state) name indexes per branch, the branch
+# numbers sorted by (bank, branch) and by (bank, city, branch); then the
+# sorted 11 byte IFSC codes and the JSON table of names and bank code ranges.
+MAGIC = b'IFSCDIR1'
+HEADER = struct.Struct('<8s6sII')  # magic, byte order, count, offset of the name table
+CODE_SIZE = 11
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'ifsc.bin')
+IFSC_PATTERN = re.compile(r'^[A-Z]{4}0[A-Z0-9]{6}$')
+
+# CSV column names accepted for each value, e.g. the RBI and razorpay IFSC lists.
+COLUMNS = {
+    'ifsc': ('ifsc', 'ifsc_code'),
+    'bank': ('bank', 'bank_name'),
+    'branch': ('branch', 'branch_name'),
+    'city': ('city', 'centre', 'city1', 'district'),
+    'state': ('state', 'state_name'),
+}
+
+Branch = namedtuple('Branch', 'ifsc bank branch city state')
+
+
+def fold(name):
+    """Comparison form of a bank, branch or city name: case and runs of spaces ignored."""
+    return ' '.join((name or '').split()).casefold()
+
+
+class Codes:
+    """The sorted IFSC codes of the file as a sequence of bytes, for bisect."""
+
+    def __init__(self, view):
+        self.view = view
+
+    def __len__(self):
+        return len(self.view) // CODE_SIZE
+
+    def __getitem__(self, index):
+        return bytes(self.view[index * CODE_SIZE:(index + 1) * CODE_SIZE])
+
+
+class IfscDirectory:
+    """
+    Bank branches read from a memory-mapped file written by write_dataset().
+    A code is found by bisecting the IFSC codes within the range of its
+    4 letter bank code; branches by name or city by bisecting an index of
+    branch numbers sorted by those names. Nothing but the name table is
+    parsed on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byteorder, count, names_offset = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an IFSC dataset")
+        if byteorder.rstrip(b'\0').decode() != sys.byteorder:
+            raise ValueError(f"{path} was written on a {byteorder.decode()}-endian host; rebuild it with load_ifsc")
+        view = memoryview(self.map)
+        start = HEADER.size
+        self.fields = view[start:start + 16 * count].cast('I')
+        self.by_branch = view[start + 16 * count:start + 20 * count].cast('I')
+        self.by_city = view[start + 20 * count:start + 24 * count].cast('I')
+        self.codes = Codes(view[start + 24 * count:start + (24 + CODE_SIZE) * count])
+        table = json.loads(bytes(view[names_offset:]).decode())
+        self.names = table['names']
+        self.folded = [fold(name) for name in self.names]
+        self.bank_codes = table['bank_codes']
+        self.banks = sorted(table['banks'], key=fold)
+        self.folded_banks = [fold(bank) for bank in self.banks]
+        self.mtime = os.stat(path).st_mtime
+
+    def __len__(self):
+        return len(self.codes)
+
+    def branch(self, number):
+        bank, branch, city, state = self.fields[4 * number:4 * number + 4]
+        return Branch(self.codes[number].decode(), self.names[bank], self.names[branch], self.names[city], self.names[state])
+
+    def lookup(self, ifsc):
+        """The Branch with this IFSC code, or None."""
+        ifsc = (ifsc or '').strip().upper()
+        if not IFSC_PATTERN.match(ifsc) or ifsc[:4] not in self.bank_codes:
+            return None
+        first, last = self.bank_codes[ifsc[:4]]
+        key = ifsc.encode()
+        number = bisect_left(self.codes, key, first, last)
+        if number == last or self.codes[number] != key:
+            return None
+        return self.branch(number)
+
+    def branch_key(self, number):
+        return self.folded[self.fields[4 * number]], self.folded[self.fields[4 * number + 1]]
+
+    def city_key(self, number):
+        fields = self.fields[4 * number:4 * number + 4]
+        return self.folded[fields[0]], self.folded[fields[2]], self.folded[fields[1]]
+
+    def scan(self, index, key, start, limit):
+        """
+        Branches whose index key begins with `start`; its last item may be
+        a prefix of the key's item in that position.
+        """
+        *exact, prefix = start
+        found = []
+        position = bisect_left(index, tuple(start), key=key)
+        while position < len(index) and (limit is None or len(found) < limit):
+            number = index[position]
+            values = key(number)
+            if list(values[:len(exact)]) != exact or not values[len(exact)].startswith(prefix):
+                break
+            found.append(self.branch(number))
+            position += 1
+        return found
+
+    def find_branch(self, bank, branch):
+        """Branches of `bank` named `branch` (ignoring case)."""
+        return [match for match in self.scan(self.by_branch, self.branch_key, [fold(bank), fold(branch)], None)
+                if fold(match.branch) == fold(branch)]
+
+    def find_city(self, bank, city, limit=None):
+        """Branches of `bank` in `city`, by branch name."""
+        return self.scan(self.by_city, self.city_key, [fold(bank), fold(city), ''], limit)
+
+    def suggest_branches(self, bank, prefix, city=None, limit=10):
+        """Branches of `bank` (in `city`, if given) whose name starts with `prefix`."""
+        if city:
+            return self.scan(self.by_city, self.city_key, [fold(bank), fold(city), fold(prefix)], limit)
+        return self.scan(self.by_branch, self.branch_key, [fold(bank), fold(prefix)], limit)
+
+    def suggest_banks(self, prefix, limit=10):
+        """Bank names starting with `prefix`."""
+        prefix = fold(prefix)
+        position = bisect_left(self.folded_banks, prefix)
+        found = []
+        while position < len(self.banks) and len(found) < limit and self.folded_banks[position].startswith(prefix):
+            found.append(self.banks[position])
+            position += 1
+        return found
+
+
+_dataset = DatasetCache('IFSC_DATASET', DEFAULT_PATH, IfscDirectory)
+dataset_path = _dataset.path
+reset = _dataset.reset
+
+
+def get_directory():
+    """
+    The directory for the IFSC_DATASET file, or None when there is none.
+    A file replaced by load_ifsc is picked up within a minute.
+    """
+    return _dataset.get()
+
+
+def lookup(ifsc):
+    """The Branch for an IFSC code, or None when unknown or no dataset is installed."""
+    directory = get_directory()
+    return directory.lookup(ifsc) if directory is not None else None
+
+
+def read_csv(file):
+    """
+    Yield (ifsc, bank, branch, city, state) from a CSV with a header row.
+    Rows without a well-formed IFSC code are skipped.
+    """
+    reader = csv.DictReader(file)
+    header = {name.strip().lower(): name for name in reader.fieldnames or ()}
+    columns = {}
+    for key, candidates in COLUMNS.items():
+        found = next((header[name] for name in candidates if name in header), None)
+        if found is None:
+            raise ValueError(f"The CSV has no {key} column (one of: {', '.join(candidates)})")
+        columns[key] = found
+    for row in reader:
+        ifsc = (row[columns['ifsc']] or '').strip().upper()
+        if IFSC_PATTERN.match(ifsc):
+            yield (ifsc,) + tuple(' '.join((row[columns[key]] or '').split()) for key in ('bank', 'branch', 'city', 'state'))
+
+
+def write_dataset(rows, path):
+    """
+    Write (ifsc, bank, branch, city, state) rows to `path` in the mapped
+    format. The first row wins for codes listed more than once. The file
+    is replaced atomically. Returns the number of branches.
+    """
+    branches, names, index = {}, [], {}
+    for ifsc, *values in rows:
+        if ifsc in branches:
+            continue
+        for name in values:
+            if name not in index:
+                index[name] = len(names)
+                names.append(name)
+        branches[ifsc] = [index[name] for name in values]
+
+    codes = sorted(branches)
+    fields = array('I', [value for ifsc in codes for value in branches[ifsc]])
+    folded = [fold(name) for name in names]
+    numbers = range(len(codes))
+    by_branch = array('I', sorted(numbers, key=lambda n: (folded[fields[4 * n]], folded[fields[4 * n + 1]])))
+    by_city = array('I', sorted(numbers, key=lambda n: (folded[fields[4 * n]], folded[fields[4 * n + 2]], folded[fields[4 * n + 1]])))
+    bank_codes = {}
+    for number, ifsc in enumerate(codes):
+        bank_codes.setdefault(ifsc[:4], [number, number])[1] = number + 1
+    banks = sorted({names[fields[4 * n]] for n in numbers})
+    table = json.dumps({'names': names, 'bank_codes': bank_codes, 'banks': banks}).encode()
+    names_offset = HEADER.size + (24 + CODE_SIZE) * len(codes)
+
+    def write(file):
+        file.write(HEADER.pack(MAGIC, sys.byteorder.encode(), len(codes), names_offset))
+        fields.tofile(file)
+        by_branch.tofile(file)
+        by_city.tofile(file)
+        file.write(''.join(codes).encode())
+        file.write(table)
+
+    write_atomic(path, write)
+    return len(codes)
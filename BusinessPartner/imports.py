@@ -0,0 +1,341 @@
+import csv
+import io
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .enrichment import enriched_models, fill_location, mark_pending, resolve_location
+from .models import ROLE_CHOICES, BusinessPartner, ImportJob
+from .sequences import reserve
+from .serializers import bp_code_series
+
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+# Sent after each batch is written, with sender=model and instances=[created rows].
+# bulk_create skips post_save, so other apps hook in here instead.
+imported = Signal()
+
+# Importer class per job kind; the IMPORTERS setting can add or replace entries.
+DEFAULT_IMPORTERS = {
+    'orders': 'order.imports.OrderImporter',
+    'business_partners': 'BusinessPartner.imports.BusinessPartnerImporter',
+    'users': 'user.imports.UserImporter',
+}
+
+
+class ImportFailed(Exception):
+    """The file as a whole cannot be imported (bad header, no permission, ...)."""
+
+
+def get_importer(kind):
+    importers = {**DEFAULT_IMPORTERS, **getattr(settings, 'IMPORTERS', {})}
+    if kind not in importers:
+        raise ImportFailed(f"Unknown import kind: {kind}")
+    return import_string(importers[kind])
+
+
+def clean_value(value):
+    if isinstance(value, datetime):
+        return value.date() if value.time() == datetime.min.time() else value
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '':
+        return None
+    return value
+
+
+def read_rows(file, name):
+    """
+    (header, rows) of a CSV or XLSX file: the column names of the first row
+    and an iterator of one {column: value} dict per data row. Empty cells
+    are left out of the rows.
+    """
+    if name.lower().endswith('.xlsx'):
+        header, rows = _read_xlsx(file)
+    else:
+        header, rows = _read_csv(file)
+    return header, ({column: value for column, value in row if column and value is not None} for row in rows)
+
+
+def _read_csv(file):
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    header = [column.strip() for column in next(reader, [])]
+    rows = (
+        [(column, clean_value(value)) for column, value in zip(header, values)]
+        for values in reader if any(value.strip() for value in values)
+    )
+    return header, rows
+
+
+def _read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFailed("XLSX files need the openpyxl package. Upload a CSV file instead.")
+    sheet = load_workbook(file, read_only=True, data_only=True).active
+    rows = sheet.iter_rows(values_only=True)
+    header = [str(column).strip() if column is not None else '' for column in next(rows, ())]
+    values = ([clean_value(value) for value in row] for row in rows)
+    return header, (list(zip(header, row)) for row in values if any(value is not None for value in row))
+
+
+class BaseImporter:
+    """
+    Turns the rows of an import file into model instances, a batch at a time.
+
+    Row values go through the model fields' own parsing and validators
+    (`clean_fields`). Everything that needs the database is done once per
+    batch instead of once per row:
+    - `lookups` {column: (model, field)} resolve codes in the file to related
+      objects with a single IN query per column;
+    - `unique_together` field tuples are checked against the file and the
+      table with a single IN query per tuple;
+    - `prepare()` reserves generated codes in blocks and the valid rows are
+      written with bulk_create.
+    Model save() and pre/post_save signals do not run, so subclasses redo
+    their side effects in `prepare()` and `after_create()`.
+    """
+    model = None
+    columns = ()
+    required = ()
+    generated = ()
+    lookups = {}
+    unique_together = ()
+
+    def __init__(self, job):
+        self.job = job
+        self.user = job.created_by
+        self.locations = {}
+
+    def check_permission(self):
+        pass
+
+    def uploader_is_admin(self):
+        return self.user is not None and self.user.role_name in ROLE_CHOICES
+
+    def check_columns(self, header):
+        allowed = set(self.columns) | set(self.lookups)
+        unknown = [column for column in header if column and column not in allowed]
+        if unknown:
+            raise ImportFailed(
+                f"Unknown column(s): {', '.join(unknown)}. Allowed: {', '.join(sorted(allowed))}."
+            )
+
+    def build(self, data, related):
+        values = {column: value for column, value in data.items() if column not in self.lookups}
+        for column in self.lookups:
+            values[column] = related[column].get(data.get(column))
+        return self.model(**values)
+
+    def validate_row(self, instance, data):
+        pass
+
+    def prepare(self, instances):
+        pass
+
+    def after_create(self, instances):
+        pass
+
+    def close(self):
+        pass
+
+    def process_batch(self, rows):
+        """
+        Validate and create one batch of [(row number, data)].
+        Returns (created instances, {row number: {field: [messages]}}).
+        """
+        errors = {}
+        for number, data in rows:
+            missing = [column for column in self.required if data.get(column) is None]
+            if missing:
+                errors[number] = {column: ["This field is required."] for column in missing}
+
+        related = self.resolve_lookups(rows, errors)
+        # Relations are set by lookups or the importer itself; validating them would query per row.
+        relations = [field.name for field in self.model._meta.concrete_fields if field.is_relation]
+        exclude = set(self.lookups) | set(self.generated) | set(relations)
+        candidates = []
+        for number, data in rows:
+            if number in errors:
+                continue
+            instance = self.build(data, related)
+            try:
+                instance.clean_fields(exclude=exclude)
+                self.validate_row(instance, data)
+            except ValidationError as exc:
+                errors[number] = exc.message_dict if hasattr(exc, 'error_dict') else {'non_field_errors': exc.messages}
+                continue
+            candidates.append((number, instance))
+
+        instances = [instance for number, instance in self.check_unique(candidates, errors)]
+        if instances:
+            self.prepare(instances)
+            self.model._default_manager.bulk_create(instances)
+            self.after_create(instances)
+            imported.send(sender=self.model, instances=instances)
+        return instances, errors
+
+    def resolve_lookups(self, rows, errors):
+        related = {}
+        for column, (model, field) in self.lookups.items():
+            values = {data[column] for number, data in rows if data.get(column) is not None}
+            related[column] = model._default_manager.in_bulk(values, field_name=field) if values else {}
+            for number, data in rows:
+                value = data.get(column)
+                if value is not None and value not in related[column] and number not in errors:
+                    errors[number] = {column: [f"No {model._meta.verbose_name} with {field} '{value}'."]}
+        return related
+
+    def check_unique(self, candidates, errors):
+        for fields in self.unique_together:
+            label = ', '.join(fields)
+            first_rows = {}
+            for number, instance in candidates:
+                key = tuple(getattr(instance, field) for field in fields)
+                if None in key:
+                    continue
+                if key in first_rows:
+                    errors[number] = {fields[-1]: [f"Duplicate {label} (same as row {first_rows[key]})."]}
+                else:
+                    first_rows[key] = number
+            if first_rows:
+                lookup = {f"{field}__in": {key[i] for key in first_rows} for i, field in enumerate(fields)}
+                existing = set(self.model._default_manager.filter(**lookup).values_list(*fields))
+                for key in existing & set(first_rows):
+                    errors[first_rows[key]] = {fields[-1]: [f"A record with this {label} already exists."]}
+            candidates = [(number, instance) for number, instance in candidates if number not in errors]
+        return candidates
+
+    def fill_locations(self, instances):
+        """
+        Fill missing location fields from the pincode. Each distinct pincode
+        is looked up once per job instead of once per row; rows it cannot
+        fill are left pending for the enrichment worker.
+        """
+        fields = dict(enriched_models())[self.model]
+        for instance in instances:
+            if instance.pincode:
+                if instance.pincode not in self.locations:
+                    self.locations[instance.pincode] = resolve_location(instance.pincode)
+                if self.locations[instance.pincode] is not None:
+                    fill_location(instance, fields, self.locations[instance.pincode])
+            mark_pending(instance, fields)
+
+
+class BusinessPartnerImporter(BaseImporter):
+    model = BusinessPartner
+    columns = (
+        'role', 'term', 'business_name', 'full_name', 'mobile', 'alternate_mobile',
+        'landline', 'alternate_landline', 'email', 'business_email', 'refered_by', 'referer_mobile', 'more', 'door_no', 'shop_no', 'complex_name',
+        'building_name', 'street_name', 'area', 'pincode', 'city', 'state', 'map_location', 'location_guide',
+    )
+    required = ('role', 'term', 'business_name', 'full_name', 'mobile', 'email', 'pincode')
+    generated = ('bp_code',)
+    unique_together = (('role', 'mobile'), ('role', 'email'), ('role', 'business_email'))
+
+    def check_permission(self):
+        if not self.uploader_is_admin():
+            raise ImportFailed("You do not have permission to create a Business Partner.")
+
+    def build(self, data, related):
+        partner = super().build(data, related)
+        partner.role = (partner.role or '').upper()
+        partner.user_id = self.user
+        return partner
+
+    def prepare(self, partners):
+        series = defaultdict(list)
+        for partner in partners:
+            series[bp_code_series(partner.role, partner.business_name)].append(partner)
+        for (key, code_prefix), group in series.items():
+            first, last = reserve(key, len(group))
+            for number, partner in zip(range(first, last + 1), group):
+                partner.bp_code = f"{code_prefix}{number:03d}"
+        self.fill_locations(partners)
+
+
+def claim_job(job_id=None):
+    """
+    Mark the next runnable job as running and return it, or None.
+    Runnable means pending, or running without progress for IMPORT_STALE_AFTER
+    seconds (its worker died), in which case it is resumed.
+    """
+    stale = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_STALE_AFTER', 600))
+    runnable = Q(status='pending') | Q(status='running', updated_at__lt=stale)
+    jobs = ImportJob.objects.filter(runnable)
+    if job_id is not None:
+        jobs = jobs.filter(pk=job_id)
+    for pk in jobs.order_by('created_at', 'pk').values_list('pk', flat=True)[:10]:
+        if ImportJob.objects.filter(runnable, pk=pk).update(status='running', updated_at=timezone.now()):
+            return ImportJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(job, batch_size=None):
+    """
+    Import the job's file. Rows before `job.processed_rows` are skipped, so
+    running a job again continues where it stopped.
+    """
+    batch_size = batch_size or getattr(settings, 'IMPORT_BATCH_SIZE', IMPORT_BATCH_SIZE)
+    importer = None
+    try:
+        importer = get_importer(job.kind)(job)
+        importer.check_permission()
+        with job.file.open('rb') as file:
+            header, rows = read_rows(file, job.file.name)
+            importer.check_columns(header)
+            if job.total_rows is None:
+                job.total_rows = sum(1 for row in rows)
+                job.save(update_fields=['total_rows', 'updated_at'])
+
+        with job.file.open('rb') as file:
+            header, rows = read_rows(file, job.file.name)
+            batch = []
+            # Row numbers are spreadsheet line numbers: the header is line 1.
+            for number, data in enumerate(rows, start=2):
+                if number - 1 <= job.processed_rows:
+                    continue
+                batch.append((number, data))
+                if len(batch) == batch_size:
+                    run_batch(job, importer, batch)
+                    batch = []
+            if batch:
+                run_batch(job, importer, batch)
+    except ImportFailed as exc:
+        job.status = 'failed'
+        job.message = str(exc)
+    except Exception as exc:
+        logger.exception("Import job %s failed", job.pk)
+        job.status = 'failed'
+        job.message = f"Import stopped after {job.processed_rows} rows: {exc}"
+    else:
+        job.status = 'completed'
+    finally:
+        if importer is not None:
+            importer.close()
+    job.save(update_fields=['status', 'message', 'updated_at'])
+    return job
+
+
+def run_batch(job, importer, batch):
+    """Create one batch and record the progress in the same transaction."""
+    with transaction.atomic():
+        created, errors = importer.process_batch(batch)
+        job.processed_rows += len(batch)
+        job.created_rows += len(created)
+        job.error_rows += len(errors)
+        for number in sorted(errors)[:max(0, MAX_REPORTED_ERRORS - len(job.errors))]:
+            job.errors.append({'row': number, 'errors': errors[number]})
+        job.save(update_fields=['processed_rows', 'created_rows', 'error_rows', 'errors', 'updated_at'])
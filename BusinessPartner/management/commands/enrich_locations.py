@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from BusinessPartner.enrichment import requeue, run_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill city, state and country of business partners and users saved "
+        "with only a pincode. Lookups that fail are retried with backoff; "
+        "--requeue queues failed and Unknown locations again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help="Worker threads (default: LOCATION_ENRICH_WORKERS or 4).")
+        parser.add_argument('--batch-size', type=int, help="Rows per batch (default: LOCATION_ENRICH_BATCH_SIZE or 200).")
+        parser.add_argument('--requeue', action='store_true', help="Queue failed and Unknown locations before running.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for pending rows.")
+        parser.add_argument('--sleep', type=float, default=5, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            for label, count in requeue().items():
+                self.stdout.write(f"Queued {count} {label} rows")
+        while True:
+            outcome = run_pool(options['workers'], options['batch_size'])
+            if any(outcome.values()) or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{outcome['resolved']} resolved, {outcome['retried']} to retry, {outcome['failed']} failed"
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
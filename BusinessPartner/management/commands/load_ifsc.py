@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from BusinessPartner.ifsc import dataset_path, read_csv, reset, write_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the local IFSC directory used to check IFSC codes and suggest "
+        "bank branches from a CSV with ifsc, bank, branch, city and state "
+        "columns, such as the RBI or razorpay IFSC lists. Running processes "
+        "pick up the new file within a minute."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv', help="CSV file to read.")
+        parser.add_argument('--output', help="Dataset file to write (default: the IFSC_DATASET setting).")
+
+    def handle(self, *args, **options):
+        output = options['output'] or dataset_path()
+        try:
+            with open(options['csv'], newline='', encoding='utf-8-sig') as file:
+                count = write_dataset(read_csv(file), output)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        reset()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} branches to {output}"))
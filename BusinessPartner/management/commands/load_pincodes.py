@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from BusinessPartner.pincodes import dataset_path, read_csv, reset, write_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the offline pincode dataset used to fill city and state from a "
+        "CSV with pincode, district and state columns, such as India Post's "
+        "all-India pincode directory. Running processes pick up the new file "
+        "within a minute."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv', help="CSV file to read.")
+        parser.add_argument('--output', help="Dataset file to write (default: the PINCODE_DATASET setting).")
+        parser.add_argument('--country', default='India')
+
+    def handle(self, *args, **options):
+        output = options['output'] or dataset_path()
+        try:
+            with open(options['csv'], newline='', encoding='utf-8-sig') as file:
+                count = write_dataset(read_csv(file), output, options['country'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        reset()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} pincodes to {output}"))
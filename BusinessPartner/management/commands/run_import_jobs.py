@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from BusinessPartner.imports import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Import queued CSV/XLSX files. Jobs whose worker died are resumed "
+        "after the last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, help="Only run this job.")
+        parser.add_argument('--batch-size', type=int, help="Rows per batch (default: IMPORT_BATCH_SIZE or 500).")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new jobs.")
+        parser.add_argument('--sleep', type=float, default=5, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_job(options['job'])
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            self.stdout.write(f"Running {job.kind} import #{job.pk} from row {job.processed_rows + 1}")
+            job = run_job(job, options['batch_size'])
+            summary = f"#{job.pk} {job.status}: {job.created_rows} created, {job.error_rows} rejected of {job.total_rows} rows"
+            if job.message:
+                summary += f" ({job.message})"
+            self.stdout.write(self.style.SUCCESS(summary) if job.status == 'completed' else self.style.ERROR(summary))
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0029_remove_businesspartner_partner_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
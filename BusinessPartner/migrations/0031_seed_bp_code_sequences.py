@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:20
+
+import re
+
+from django.db import migrations
+
+
+def seed_bp_code_sequences(apps, schema_editor):
+    """Start each bp_code:<prefix><letter> sequence after the highest code in use."""
+    BusinessPartner = apps.get_model('BusinessPartner', 'BusinessPartner')
+    Sequence = apps.get_model('BusinessPartner', 'Sequence')
+
+    highest = {}
+    for bp_code in BusinessPartner.objects.values_list('bp_code', flat=True).iterator():
+        match = re.fullmatch(r'([AB].)(\d+)', bp_code or '')
+        if match:
+            key = f"bp_code:{match.group(1)}"
+            highest[key] = max(highest.get(key, 0), int(match.group(2)))
+
+    for key, value in highest.items():
+        sequence, created = Sequence.objects.get_or_create(key=key, defaults={'last_value': value})
+        if not created and sequence.last_value < value:
+            sequence.last_value = value
+            sequence.save(update_fields=['last_value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0030_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_bp_code_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-16 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0032_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businesspartner',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='businesspartnerkyc',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
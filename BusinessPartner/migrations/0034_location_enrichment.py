@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-16 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0033_partner_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businesspartner',
+            name='location_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='businesspartner',
+            name='location_retry_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='businesspartner',
+            name='location_status',
+            field=models.CharField(blank=True, choices=[('', 'Done'), ('pending', 'Pending'), ('failed', 'Failed')], default='', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='businesspartner',
+            index=models.Index(fields=['location_status', 'location_retry_at'], name='bp_location_pending_idx'),
+        ),
+    ]
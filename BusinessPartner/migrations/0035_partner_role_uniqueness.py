@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicates(apps, schema_editor):
+    """
+    Refuse to add the constraints over partners that already share a mobile,
+    email or business email within a role; those need merging by hand first.
+    """
+    BusinessPartner = apps.get_model('BusinessPartner', 'BusinessPartner')
+    duplicates = []
+    for field in ('mobile', 'email', 'business_email'):
+        rows = (
+            BusinessPartner.objects.exclude(**{f"{field}__isnull": True})
+            .values('role', field).annotate(partners=Count('id')).filter(partners__gt=1)
+        )
+        duplicates += [f"{row['role']} {field} {row[field]!r} ({row['partners']} partners)" for row in rows]
+    if duplicates:
+        raise RuntimeError("Duplicate business partners within a role: " + "; ".join(duplicates))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0034_location_enrichment'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='businesspartner',
+            constraint=models.UniqueConstraint(fields=('role', 'mobile'), name='bp_role_mobile_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='businesspartner',
+            constraint=models.UniqueConstraint(fields=('role', 'email'), name='bp_role_email_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='businesspartner',
+            constraint=models.UniqueConstraint(fields=('role', 'business_email'), name='bp_role_business_email_unique'),
+        ),
+    ]
@@ -5,11 +5,14 @@ from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from django.utils.timezone import now
 from django.conf import settings
-import requests
 import logging
 import re
 from urllib.parse import quote
 
+from . import ifsc
+from .enrichment import mark_pending, touches_location
+from .pincodes import resolve as resolve_pincode
+
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +20,13 @@ logger = logging.getLogger(__name__)
 
 ROLE_CHOICES = ['Super Admin', 'Project Owner', 'Admin']
 
+# Progress of the background fill of city/state from the pincode (see BusinessPartner.enrichment).
+LOCATION_STATUS_CHOICES = [
+    ('', 'Done'),
+    ('pending', 'Pending'),
+    ('failed', 'Failed'),
+]
+
 def validate_pan_number(value):
     """
     Validates if the given value is a valid PAN number (Permanent Account Number - India).
@@ -48,8 +58,8 @@ def validate_aadhar_no(value):
         raise ValidationError(_("Invalid Aadhar Number. It must be exactly 12 digits."))
     
 def validate_ifsc_code(value):
-    ifsc_pattern = r'^[A-Z]{4}[0-9]{7}$'
-    if not re.match(ifsc_pattern, value):
+    # RBI format: 4 letter bank code, a zero, then a 6 character branch code.
+    if not ifsc.IFSC_PATTERN.match(value):
         raise ValidationError(_("Invalid IFSC Code. Expected format: ABCD0123456."))
 
 def validate_mobile_no(value):
@@ -124,6 +134,23 @@ class BusinessPartner(models.Model):
     state = models.CharField(max_length=100, blank=True, null=True)
     map_location = models.CharField(max_length=500, null=True, blank=True)
     location_guide = models.TextField(blank=True, null=True)
+    location_status = models.CharField(max_length=10, choices=LOCATION_STATUS_CHOICES, default='', blank=True, editable=False)
+    location_attempts = models.PositiveSmallIntegerField(default=0, editable=False)
+    location_retry_at = models.DateTimeField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['location_status', 'location_retry_at'], name='bp_location_pending_idx'),
+        ]
+        # Mobile, email and business email are unique within a role. The
+        # constraints' indexes also serve the conflict lookup of
+        # BusinessPartnerSerializer after an IntegrityError.
+        constraints = [
+            models.UniqueConstraint(fields=['role', 'mobile'], name='bp_role_mobile_unique'),
+            models.UniqueConstraint(fields=['role', 'email'], name='bp_role_email_unique'),
+            models.UniqueConstraint(fields=['role', 'business_email'], name='bp_role_business_email_unique'),
+        ]
     
     
     def __str__(self):
@@ -184,7 +211,66 @@ class BusinessPartnerKYC(models.Model):
     note = models.TextField(blank=True, null=True)
     freezed = models.BooleanField(default=False)
     revoked = models.BooleanField(default=False)
-    
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Sequence(models.Model):
+    """
+    Named counter used to hand out order numbers and codes.
+    Values are taken with an atomic increment (see BusinessPartner.sequences)
+    instead of reading the last row of the numbered table.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} - {self.last_value}"
+
+
+class ImportJob(models.Model):
+    """
+    A CSV/XLSX file queued for bulk import (see BusinessPartner.imports).
+    `processed_rows` is committed together with each batch, so a job that
+    was interrupted resumes after the last batch that made it to the database.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    KIND_CHOICES = [
+        ('orders', 'Orders'),
+        ('business_partners', 'Business Partners'),
+        ('users', 'Users'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='imports/')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='import_jobs',
+        blank=True,
+        null=True)
+    total_rows = models.IntegerField(null=True, blank=True)
+    processed_rows = models.IntegerField(default=0)
+    created_rows = models.IntegerField(default=0)
+    error_rows = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='import_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} import #{self.pk} - {self.status}"
+
 
 def __str__(self):
         return self.name
@@ -201,46 +287,30 @@ def save(self, *args, **kwargs):
 
 def fetch_ifsc_code(bank_name, branch):
     """
-    Fetch IFSC Code based on Bank Name and Branch using an external API.
+    IFSC Code of the bank's branch from the local IFSC directory (see
+    BusinessPartner.ifsc), or None when the branch is unknown or ambiguous.
     """
-    try:
-        url = f"https://ifsc.razorpay.com/{bank_name}"
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("IFSC")
-        else:
-            logger.warning(f"Failed to fetch IFSC Code for {bank_name}, {branch}. API Response: {response.status_code}")
-            return None
-    except requests.RequestException as e:
-        logger.error(f"Error fetching IFSC Code: {str(e)}")
-        return None 
+    directory = ifsc.get_directory()
+    if directory is None:
+        return None
+    matches = directory.find_branch(bank_name, branch)
+    if len(matches) != 1:
+        logger.warning(f"Found {len(matches)} IFSC codes for {bank_name}, {branch}.")
+        return None
+    return matches[0].ifsc
 
 def fetch_location_from_pincode(pincode):
-    if not pincode or not pincode.isdigit() or len(pincode) != 6:
+    """(district, state) for the pincode from the offline dataset (see BusinessPartner.pincodes), or (None, None)."""
+    location = resolve_pincode(pincode)
+    if location is None:
         return None, None
-    url = f"https://api.postalpincode.in/pincode/{pincode}"
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        if data and data[0]['Status'] == "Success" and data[0]['PostOffice']:
-            city = data[0]['PostOffice'][0].get('District', '')
-            state = data[0]['PostOffice'][0].get('State', '')
-            return city, state
-        else:
-            logger.warning(f"Invalid pincode response: {data[0].get('Message', 'Unknown error')}")
-            return None, None
-    except requests.RequestException as e:
-        logger.error(f"Request error: {str(e)}")
-    return None, None
+    return location[0], location[1]
 
 @receiver(pre_save, sender=BusinessPartner)
-def fetch_location_pre_save(sender, instance, **kwargs):
-    if instance.pincode and (not instance.city or not instance.state):
-        city, state = fetch_location_from_pincode(instance.pincode)
-        instance.city = city
-        instance.state = state
+def fetch_location_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Queue a missing city/state for the enrichment worker instead of looking it up during the save."""
+    if touches_location(update_fields, ('city', 'state')):
+        mark_pending(instance, ('city', 'state'))
         
         
 def get_map_url(self):
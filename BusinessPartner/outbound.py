@@ -0,0 +1,238 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+
+# Settings per outbound service; the OUTBOUND_SERVICES setting can add
+# services or override these values, e.g. point base_url at a stand-in
+# server in tests.
+DEFAULT_SERVICE = {
+    'base_url': '',
+    'timeout': 5,  # seconds to connect and to read
+    'pool_size': 10,  # kept-alive connections
+    'cache_size': 1024,  # GET responses kept, least recently used dropped first
+    'cache_seconds': 3600,
+    'negative_cache_seconds': 300,  # for 404s and answers the caller marks as negative
+    'failure_threshold': 5,  # consecutive failures that open the circuit
+    'reset_seconds': 30,  # time the circuit stays open before one trial call
+}
+DEFAULT_SERVICES = {
+    'postalpincode': {'base_url': 'https://api.postalpincode.in', 'cache_seconds': 86400, 'negative_cache_seconds': 3600},
+    'twilio': {'base_url': 'https://api.twilio.com', 'cache_size': 0},
+}
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class OutboundError(Exception):
+    """The service could not answer: connection error, timeout, 5xx/429 or an open circuit."""
+
+
+class CircuitOpen(OutboundError):
+    pass
+
+
+class ResponseCache:
+    """Thread-safe LRU of (expiry, value), with a time to live per entry."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """(True, value) while a fresh entry exists, else (False, None)."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value, seconds):
+        if self.size <= 0 or seconds <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+class CircuitBreaker:
+    """
+    Closed until `failure_threshold` calls in a row fail, then open: calls
+    fail at once for `reset_seconds`. After that one trial call is let
+    through (half open); it closes the circuit again or reopens it.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.trial = True
+            return True
+
+    def record(self, success):
+        with self.lock:
+            self.trial = False
+            if success:
+                self.failures, self.opened_at = 0, None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Client:
+    """
+    Calls to one outbound service over a pooled keep-alive session, with
+    a response cache for GETs, a circuit breaker and call statistics.
+    """
+
+    def __init__(self, name, config):
+        self.name = name
+        self.base_url = config['base_url'].rstrip('/')
+        self.timeout = config['timeout']
+        self.cache_seconds = config['cache_seconds']
+        self.negative_cache_seconds = config['negative_cache_seconds']
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config['pool_size'], max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.cache = ResponseCache(config['cache_size'])
+        self.breaker = CircuitBreaker(config['failure_threshold'], config['reset_seconds'])
+        self.lock = threading.Lock()
+        self.counts = {'calls': 0, 'failures': 0, 'rejected': 0, 'cache_hits': 0}
+        self.latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def url(self, path):
+        return path if path.startswith(('http://', 'https://')) else f"{self.base_url}/{path.lstrip('/')}"
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def request(self, method, path, **kwargs):
+        """
+        Send a request and return the requests.Response. Raises
+        OutboundError for connection errors, timeouts, 5xx and 429 answers,
+        which count against the circuit, and CircuitOpen while it is open.
+        """
+        if not self.breaker.allow():
+            self.count('rejected')
+            raise CircuitOpen(f"{self.name} is unavailable: too many recent failures")
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+        except requests.RequestException as exc:
+            self.finish(started, success=False)
+            raise OutboundError(f"{self.name}: {exc}") from exc
+        failed = response.status_code >= 500 or response.status_code == 429
+        self.finish(started, success=not failed)
+        if failed:
+            raise OutboundError(f"{self.name} answered {response.status_code}")
+        return response
+
+    def finish(self, started, success):
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.breaker.record(success)
+        with self.lock:
+            self.counts['calls'] += 1
+            if not success:
+                self.counts['failures'] += 1
+            self.latency[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def get_json(self, path, params=None, negative=None):
+        """
+        The decoded JSON of a GET, or None for a 404. Answers are cached
+        for `cache_seconds`; 404s, and answers for which `negative(data)` is
+        true, for `negative_cache_seconds`.
+        """
+        key = (path, tuple(sorted((params or {}).items())))
+        hit, data = self.cache.get(key)
+        if hit:
+            self.count('cache_hits')
+            return data
+        response = self.request('GET', path, params=params)
+        if response.status_code == 404:
+            data = None
+        else:
+            if response.status_code >= 400:
+                raise OutboundError(f"{self.name} answered {response.status_code}")
+            try:
+                data = response.json()
+            except ValueError as exc:
+                raise OutboundError(f"{self.name} sent invalid JSON") from exc
+        is_negative = data is None or (negative is not None and negative(data))
+        self.cache.set(key, data, self.negative_cache_seconds if is_negative else self.cache_seconds)
+        return data
+
+    def stats(self):
+        with self.lock:
+            histogram = {f"le_{bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self.latency)}
+            histogram['gt_%dms' % LATENCY_BUCKETS_MS[-1]] = self.latency[-1]
+            return {**self.counts, 'circuit': self.breaker.state, 'latency': histogram}
+
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def service_config(name):
+    services = {**DEFAULT_SERVICES, **getattr(settings, 'OUTBOUND_SERVICES', {})}
+    if name not in services:
+        raise KeyError(f"Unknown outbound service: {name}")
+    return {**DEFAULT_SERVICE, **DEFAULT_SERVICES.get(name, {}), **services[name]}
+
+
+def get_client(name):
+    """The shared Client of the outbound service `name`."""
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = Client(name, service_config(name))
+    return client
+
+
+def stats():
+    return {name: client.stats() for name, client in list(_clients.items())}
+
+
+@receiver(setting_changed)
+def reset(setting=None, **kwargs):
+    """Drop the clients, with their connections, caches and circuits."""
+    if setting not in (None, 'OUTBOUND_SERVICES'):
+        return
+    with _lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
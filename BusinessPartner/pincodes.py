@@ -0,0 +1,148 @@
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from .datasets import DatasetCache, write_atomic
+
+
+# File layout: header, the sorted pincodes as uint32, then (district, state)
+# name indexes as uint16 pairs, then the JSON name table. Arrays are in the
+# byte order named in the header, so they can be used straight from the map.
+MAGIC = b'PINCODE1'
+HEADER = struct.Struct('<8s6sII')  # magic, byte order, count, offset of the name table
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'pincodes.bin')
+
+# CSV column names accepted for each value, e.g. India Post's all-India pincode directory.
+COLUMNS = {
+    'pincode': ('pincode', 'pin', 'postal_code'),
+    'district': ('district', 'districtname', 'city'),
+    'state': ('statename', 'state', 'state_name'),
+}
+
+
+class PincodeDirectory:
+    """
+    Pincode to (district, state, country), read from a memory-mapped file
+    written by write_dataset(). Lookups bisect the mapped pincode array
+    within the range of the pincode's 3 digit prefix, so the data is shared
+    between the processes on a host and never parsed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byteorder, count, names_offset = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a pincode dataset")
+        if byteorder.rstrip(b'\0').decode() != sys.byteorder:
+            raise ValueError(f"{path} was written on a {byteorder.decode()}-endian host; rebuild it with load_pincodes")
+        view = memoryview(self.map)
+        start = HEADER.size
+        self.pincodes = view[start:start + 4 * count].cast('I')
+        self.places = view[start + 4 * count:start + 8 * count].cast('H')
+        table = json.loads(bytes(view[names_offset:]).decode())
+        self.names, self.country = table['names'], table['country']
+        self.mtime = os.stat(path).st_mtime
+        # Where each 3 digit prefix starts, so a lookup only bisects the pincodes sharing it.
+        self.starts = array('I', (bisect_left(self.pincodes, prefix * 1000) for prefix in range(1001)))
+
+    def __len__(self):
+        return len(self.pincodes)
+
+    def lookup(self, pincode):
+        """(district, state, country) for a pincode (str or int), or None."""
+        try:
+            key = int(pincode)
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= key < 1000000:
+            return None
+        prefix = key // 1000
+        index = bisect_left(self.pincodes, key, self.starts[prefix], self.starts[prefix + 1])
+        if index == self.starts[prefix + 1] or self.pincodes[index] != key:
+            return None
+        return self.names[self.places[2 * index]], self.names[self.places[2 * index + 1]], self.country
+
+
+_dataset = DatasetCache('PINCODE_DATASET', DEFAULT_PATH, PincodeDirectory)
+dataset_path = _dataset.path
+reset = _dataset.reset
+
+
+def get_directory():
+    """
+    The directory for the PINCODE_DATASET file, or None when there is none.
+    A file replaced by load_pincodes is picked up within a minute.
+    """
+    return _dataset.get()
+
+
+def resolve(pincode):
+    """(district, state, country) for a 6 digit pincode, or None when unknown or no dataset is installed."""
+    pincode = str(pincode or '')
+    if len(pincode) != 6 or not pincode.isdigit():
+        return None
+    directory = get_directory()
+    return directory.lookup(pincode) if directory is not None else None
+
+
+def read_csv(file):
+    """
+    Yield (pincode, district, state) from a CSV with a header row. The
+    first row wins for pincodes listed more than once (one per post office).
+    """
+    reader = csv.DictReader(file)
+    header = {name.strip().lower(): name for name in reader.fieldnames or ()}
+    columns = {}
+    for key, candidates in COLUMNS.items():
+        found = next((header[name] for name in candidates if name in header), None)
+        if found is None:
+            raise ValueError(f"The CSV has no {key} column (one of: {', '.join(candidates)})")
+        columns[key] = found
+    for row in reader:
+        pincode = (row[columns['pincode']] or '').strip()
+        if len(pincode) == 6 and pincode.isdigit():
+            yield int(pincode), title(row[columns['district']]), title(row[columns['state']])
+
+
+def title(name):
+    return ' '.join((name or '').split()).title()
+
+
+def write_dataset(rows, path, country='India'):
+    """
+    Write (pincode, district, state) rows to `path` in the mapped format.
+    The file is replaced atomically. Returns the number of pincodes.
+    """
+    places, names, index = {}, [], {}
+    for pincode, district, state in rows:
+        if pincode in places:
+            continue
+        for name in (district, state):
+            if name not in index:
+                index[name] = len(names)
+                names.append(name)
+        places[pincode] = (index[district], index[state])
+    if len(names) > 0xFFFF:
+        raise ValueError("Too many distinct district and state names")
+
+    pincodes = sorted(places)
+    keys = array('I', pincodes)
+    values = array('H', [value for pincode in pincodes for value in places[pincode]])
+    table = json.dumps({'country': country, 'names': names}).encode()
+    names_offset = HEADER.size + 8 * len(pincodes)
+
+    def write(file):
+        file.write(HEADER.pack(MAGIC, sys.byteorder.encode(), len(pincodes), names_offset))
+        keys.tofile(file)
+        values.tofile(file)
+        file.write(table)
+
+    write_atomic(path, write)
+    return len(pincodes)
@@ -0,0 +1,79 @@
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import Sequence
+
+
+# Per-process blocks of pre-allocated values: key -> [next_value, last_value]
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def reserve(key, count=1):
+    """
+    Atomically reserve `count` consecutive values of the `key` sequence.
+    Returns a (first, last) tuple. The counter row is created on first use.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+
+    with transaction.atomic():
+        updated = Sequence.objects.filter(key=key).update(last_value=F('last_value') + count)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    Sequence.objects.create(key=key, last_value=count)
+                return 1, count
+            except IntegrityError:
+                # Another worker created the row first, increment it instead.
+                Sequence.objects.filter(key=key).update(last_value=F('last_value') + count)
+        last_value = Sequence.objects.filter(key=key).values_list('last_value', flat=True).get()
+
+    return last_value - count + 1, last_value
+
+
+def next_value(key, block_size=None):
+    """
+    Return the next value of the `key` sequence.
+
+    With a block size above 1 each worker process reserves a block of values
+    at once and hands them out from memory, so the counter row is only
+    touched once per block. Unused values of a block are lost when the
+    process exits, so numbers can have gaps but are never repeated.
+
+    Blocks are only cached in autocommit mode: inside a transaction the
+    reservation could still be rolled back, so a single value is reserved.
+    """
+    if block_size is None:
+        block_size = getattr(settings, 'SEQUENCE_BLOCK_SIZE', 1)
+
+    if block_size <= 1 or connection.in_atomic_block:
+        return reserve(key)[0]
+
+    with _blocks_lock:
+        block = _blocks.get(key)
+        if block is None or block[0] > block[1]:
+            block = list(reserve(key, block_size))
+            _blocks[key] = block
+        value = block[0]
+        block[0] += 1
+    return value
+
+
+def set_minimum(key, value):
+    """
+    Make sure the `key` sequence will not hand out `value` or anything below.
+    Used when seeding counters from codes that already exist.
+    """
+    sequence, created = Sequence.objects.get_or_create(key=key, defaults={'last_value': value})
+    if not created and sequence.last_value < value:
+        Sequence.objects.filter(key=key, last_value__lt=value).update(last_value=value)
+
+
+def discard_blocks():
+    """Forget the blocks cached by this process (used by tests and benchmarks)."""
+    with _blocks_lock:
+        _blocks.clear()
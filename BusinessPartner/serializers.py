@@ -1,7 +1,11 @@
 from rest_framework import serializers
-from .models import BusinessPartner, BusinessPartnerKYC,fetch_ifsc_code
+from . import ifsc
+from .models import BusinessPartner, BusinessPartnerKYC, ImportJob, fetch_ifsc_code
+from .sequences import next_value
+from .fieldsets import SparseFieldsetMixin
 import re
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import ValidationError
 
@@ -31,8 +35,7 @@ def validate_aadhar_no(value):
     return value
 
 def validate_ifsc_code(value):
-    ifsc_pattern = r'^[A-Z]{4}[0-9]{7}$'
-    if not re.match(ifsc_pattern, value):
+    if not ifsc.IFSC_PATTERN.match(value):
         raise serializers.ValidationError(_("Invalid IFSC Code. Expected format: ABCD0123456."))
     return value
 
@@ -53,7 +56,49 @@ def validate_msme_no(value):
     return value  
     
 
-class BusinessPartnerSerializer(serializers.ModelSerializer):
+def bp_code_series(role, business_name):
+    """Return the (sequence key, code prefix) pair for a role and business name, e.g. ('bp_code:BA', 'BA')."""
+    prefix = 'B' if role == 'BUYER' else 'A'
+    first_letter = business_name.strip()[0].upper()
+    return f"bp_code:{prefix}{first_letter}", f"{prefix}{first_letter}"
+
+
+def generate_bp_code(role, business_name):
+    """
+    Generate the next bp_code, e.g. BA001 for the first BUYER named "A...".
+    Each prefix + first letter pair has its own sequence counter.
+    """
+    key, code_prefix = bp_code_series(role, business_name)
+    return f"{code_prefix}{next_value(key):03d}"
+
+
+def role_conflicts(role, values, exclude_pk=None):
+    """
+    {field: [message]} for the mobile, email and business email in `values`
+    that another partner of `role` already uses, found with one query.
+    """
+    messages = {
+        'mobile': _("This mobile number is already used in the same role."),
+        'email': _("This email is already used in the same role."),
+        'business_email': f'This business email already exists for a {role}.',
+    }
+    values = {field: values.get(field) for field in messages if values.get(field)}
+    if not values:
+        return {}
+    queryset = BusinessPartner.objects.filter(role=role).filter(
+        Q(*[Q(**{field: value}) for field, value in values.items()], _connector=Q.OR)
+    )
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    conflicts = {}
+    for row in queryset.values(*values)[:len(values)]:
+        for field, value in values.items():
+            if row[field] == value:
+                conflicts[field] = [messages[field]]
+    return conflicts
+
+
+class BusinessPartnerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for BusinessPartner model with explicit fields and nested KYC details.
     """
@@ -71,59 +116,49 @@ class BusinessPartnerSerializer(serializers.ModelSerializer):
         fields = [
             'role', 'bp_code', 'term', 'business_name', 'full_name', 'mobile', 'alternate_mobile',
             'landline', 'alternate_landline', 'email', 'business_email', 'refered_by', 'referer_mobile', 'more', 'door_no', 'shop_no', 'complex_name',
-            'building_name', 'street_name', 'area', 'pincode', 'city', 'state', 'map_location', 'location_guide',
+            'building_name', 'street_name', 'area', 'pincode', 'city', 'state', 'location_status', 'map_location', 'location_guide',
         ]
-        read_only_fields = ['status','bp_code'] 
-        unique_together = ('role', 'business_email')
+        read_only_fields = ['status','bp_code', 'location_status'] 
+        sparse_field_sources = {'bp_code': ['bp_code', 'business_name']}
+        # Uniqueness within a role is left to the database constraints (see save_unique).
+        validators = []
         
     def get_bp_code(self, obj):
         return f"{obj.bp_code}-{obj.business_name}"
         
         
     def validate(self, data):
-        mobile = data.get('mobile')
-        email = data.get('email')
-        business_email = data.get('business_email', None)
         role = data.get('role', '').upper()
-        instance = self.instance
 
         if not role or role not in ['BUYER', 'CRAFTSMAN']:
             raise serializers.ValidationError({
                 "role": _("Invalid role. Must be either 'BUYER' or 'CRAFTSMAN'.")
             })
-        queryset = BusinessPartner.objects.filter(role=role)
 
-        if instance:
-            queryset = queryset.exclude(id=instance.id)
+        return data
 
-        if mobile and queryset.filter(mobile=mobile).exists():
-            raise serializers.ValidationError({
-                "mobile": _("This mobile number is already used in the same role.")
-            })
+    def save_unique(self, save, role, values, exclude_pk=None):
+        """
+        Run `save()` and turn a violation of the role uniqueness constraints
+        into field errors. Nothing is checked up front, so a save that does
+        not clash costs no extra query.
+        """
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            conflicts = role_conflicts(role, values, exclude_pk)
+            if not conflicts:
+                raise
+            raise serializers.ValidationError(conflicts)
 
-        if email and queryset.filter(email=email).exists():
-            raise serializers.ValidationError({
-                "email": _("This email is already used in the same role.")
-            })
-        if business_email:
-            qs = BusinessPartner.objects.filter(business_email=business_email, role=role)
-            if instance:
-                qs = qs.exclude(pk=instance.pk)
-            if qs.exists():
-                raise serializers.ValidationError({
-                    'business_email': f'This business email already exists for a {role}.'
-                })
+    def save(self, **kwargs):
+        role = (self.validated_data.get('role') or getattr(self.instance, 'role', None) or '').upper()
+        values = {**{field: getattr(self.instance, field, None) for field in ('mobile', 'email', 'business_email')},
+                  **self.validated_data, **kwargs}
+        return self.save_unique(lambda: super(BusinessPartnerSerializer, self).save(**kwargs), role, values,
+                                getattr(self.instance, 'pk', None))
 
-        return data
-
-    
-    
-    def create(self, validated_data):
-        if BusinessPartner.objects.filter(business_email=validated_data['business_email']).exists():
-            raise ValidationError({"business_email": "A business partner with this email already exists."})
-        return super().create(validated_data)
-    
-    
     def create(self, validated_data):
         user = self.context.get('request').user if self.context.get('request') else None
         if user is None or user.role_name not in ["super_admin", "admin", "Project Owner"]:
@@ -137,12 +172,7 @@ class BusinessPartnerSerializer(serializers.ModelSerializer):
         if role not in ['BUYER', 'CRAFTSMAN']:
             raise serializers.ValidationError({"role": "Invalid role. Must be either 'BUYER' or 'CRAFTSMAN'."})
 
-        prefix = 'B' if role == 'BUYER' else 'A'
-        first_letter = business_name[0].upper()
-        last_bp = BusinessPartner.objects.filter(bp_code__regex=rf'^{prefix}{first_letter}\d+$').order_by('-bp_code').first()
-        
-        new_number = int(last_bp.bp_code[2:]) + 1 if last_bp else 1
-        validated_data['bp_code'] = f"{prefix}{first_letter}{new_number:03d}"
+        validated_data['bp_code'] = generate_bp_code(role, business_name)
         validated_data['user_id'] = user
 
         return super().create(validated_data)
@@ -157,6 +187,7 @@ class BusinessPartnerSerializer(serializers.ModelSerializer):
                 **validated_data,
                 "role": "CRAFTSMAN"
             }
+            new_instance_data['bp_code'] = generate_bp_code("CRAFTSMAN", new_instance_data['business_name'])
             return BusinessPartner.objects.create(**new_instance_data)
         return super().update(instance, validated_data)
 
@@ -207,7 +238,45 @@ class BusinessPartnerKYCSerializer(serializers.ModelSerializer):
         return data
 
 
+    def validate(self, attrs):
+        """
+        Check the IFSC code against the local IFSC directory and fill the
+        bank details it gives; without a code, take it from the bank and
+        branch when they name exactly one branch. Skipped when no directory
+        is installed.
+        """
+        directory = ifsc.get_directory()
+        if directory is None:
+            return attrs
+        if attrs.get('ifsc_code'):
+            branch = directory.lookup(attrs['ifsc_code'])
+            if branch is None:
+                raise serializers.ValidationError({"ifsc_code": "Unknown IFSC Code."})
+        elif attrs.get('bank_name') and attrs.get('branch'):
+            matches = directory.find_branch(attrs['bank_name'], attrs['branch'])
+            if len(matches) != 1:
+                return attrs
+            branch = matches[0]
+        else:
+            return attrs
+        attrs['ifsc_code'] = branch.ifsc
+        for field, value in (('bank_name', branch.bank), ('branch', branch.branch), ('bank_city', branch.city), ('bank_state', branch.state)):
+            if not attrs.get(field):
+                attrs[field] = value
+        return attrs
+
     def create(self, validated_data):
         if 'bp_code' not in validated_data:
             raise serializers.ValidationError({"bp_code": "This field is required."})
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Progress and per-row error report of a bulk import job."""
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'kind', 'status', 'total_rows', 'processed_rows', 'created_rows', 'error_rows',
+            'errors', 'message', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
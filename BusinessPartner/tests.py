@@ -0,0 +1,624 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import ifsc, outbound, pincodes
+from .directory import cached_response, stats as directory_stats
+from .enrichment import enrich_pending, requeue
+from .imports import claim_job, run_job
+from .models import BusinessPartner, BusinessPartnerKYC, ImportJob, Sequence, fetch_ifsc_code
+from .sequences import next_value, reserve, set_minimum
+from .serializers import BusinessPartnerKYCSerializer, BusinessPartnerSerializer, generate_bp_code
+
+
+class SequenceTests(TestCase):
+    def test_reserve_creates_counter_on_first_use(self):
+        self.assertEqual(reserve('test'), (1, 1))
+        self.assertEqual(Sequence.objects.get(key='test').last_value, 1)
+
+    def test_reserve_block_is_contiguous(self):
+        reserve('test')
+        self.assertEqual(reserve('test', 5), (2, 6))
+        self.assertEqual(reserve('test'), (7, 7))
+
+    def test_keys_are_independent(self):
+        reserve('a', 3)
+        self.assertEqual(next_value('b'), 1)
+
+    def test_set_minimum_never_moves_counter_back(self):
+        reserve('test', 10)
+        set_minimum('test', 4)
+        self.assertEqual(next_value('test'), 11)
+        set_minimum('test', 20)
+        self.assertEqual(next_value('test'), 21)
+
+
+class BPCodeTests(TestCase):
+    def test_codes_are_keyed_by_role_and_first_letter(self):
+        self.assertEqual(generate_bp_code('BUYER', 'Aurum Jewels'), 'BA001')
+        self.assertEqual(generate_bp_code('BUYER', 'apex gold'), 'BA002')
+        self.assertEqual(generate_bp_code('CRAFTSMAN', 'Aurum Jewels'), 'AA001')
+        self.assertEqual(generate_bp_code('BUYER', 'Kanak'), 'BK001')
+
+    def test_codes_continue_past_999(self):
+        set_minimum('bp_code:BA', 999)
+        self.assertEqual(generate_bp_code('BUYER', 'Aurum'), 'BA1000')
+        self.assertEqual(generate_bp_code('BUYER', 'Aurum'), 'BA1001')
+
+
+def make_partner(number, role='BUYER'):
+    return BusinessPartner.objects.create(
+        role=role, bp_code=f"BP{number:03d}", term='T1', business_name=f"Partner {number}",
+        full_name=f"Partner {number}", mobile=f"90000{number:05d}", email=f"partner{number}@example.com",
+        pincode='600001', city='Chennai', state='Tamil Nadu')
+
+
+class BusinessPartnerUniquenessTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().post('/BusinessPartner/create')
+        self.request.user = get_user_model().objects.create_user(username='owner', password='pass', role_name='Project Owner')
+
+    def serializer(self, **overrides):
+        data = {
+            'role': 'BUYER', 'term': 'T1', 'business_name': "Aurum", 'full_name': "Buyer", 'mobile': '9000000001',
+            'email': 'buyer@example.com', 'business_email': 'sales@aurum.example.com', 'pincode': '600001',
+            'city': 'Chennai', 'state': 'Tamil Nadu',
+        }
+        serializer = BusinessPartnerSerializer(data={**data, **overrides}, context={'request': self.request})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer
+
+    def test_validation_runs_no_uniqueness_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.serializer()
+        self.assertEqual(len(queries), 0)
+
+    def test_clashes_within_a_role_become_field_errors(self):
+        self.serializer().save()
+        with self.assertRaises(serializers.ValidationError) as raised:
+            self.serializer(email='other@example.com').save()
+        self.assertEqual(set(raised.exception.detail), {'mobile', 'business_email'})
+        self.serializer(role='CRAFTSMAN').save()
+        self.assertEqual(BusinessPartner.objects.count(), 2)
+
+    def test_constraints_hold_for_direct_saves(self):
+        make_partner(1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BusinessPartner.objects.create(
+                role='BUYER', bp_code='BP002', term='T1', business_name="Copy", full_name="Copy",
+                mobile='9000000002', email='partner1@example.com', pincode='600001')
+
+
+class KYCListQueryCountTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.client.force_login(user_model.objects.create_user(username='staff', password='pass', role_name='Admin'))
+
+    def add_kyc(self, number):
+        BusinessPartnerKYC.objects.create(
+            bp_code=make_partner(number), status='pending', bis_no=f"BIS{number}",
+            gst_no='22AAAAA1234A1Z5', gst_attachment='attachments/gst.png')
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/BusinessPartnerKYC/list')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_kyc(1)
+        single = self.list_queries()
+        for number in range(2, 12):
+            self.add_kyc(number)
+        self.assertEqual(self.list_queries(), single)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user(username='staff', password='pass', role_name='Admin'))
+        self.partner = make_partner(1)
+        self.kyc = BusinessPartnerKYC.objects.create(
+            bp_code=self.partner, status='pending', bis_no='BIS1', gst_no='22AAAAA1234A1Z5', gst_attachment='attachments/gst.png')
+
+    def assertRevalidates(self, url, change):
+        etag = self.client.get(url)['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def rename_partner(self):
+        self.partner.business_name = "Renamed"
+        self.partner.save()
+
+    def test_partner_detail(self):
+        self.assertRevalidates('/BusinessPartner/detail/BP001/', self.rename_partner)
+
+    def test_kyc_detail_follows_its_partner(self):
+        self.assertRevalidates('/BusinessPartnerKYC/detail/BIS1/', self.rename_partner)
+
+    def test_lists_change_on_additions_and_deletions(self):
+        self.assertRevalidates('/BusinessPartner/list', lambda: make_partner(2))
+        self.assertRevalidates('/BusinessPartnerKYC/list', self.kyc.delete)
+
+    def test_fieldsets_have_their_own_etag(self):
+        url = '/BusinessPartner/detail/BP001/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, {'fields': 'full_name'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'directory-tests'}})
+class DirectoryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = make_partner(1)
+        make_partner(2, role='CRAFTSMAN')
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache'], json.loads(response.content)
+
+    def test_saves_and_deletes_invalidate_only_their_role(self):
+        self.assertEqual(self.get('/BusinessPartner/Buyers/')[0], 'MISS')
+        self.assertEqual(self.get('/BusinessPartner/Craftsmans/')[0], 'MISS')
+        self.assertEqual(self.get('/BusinessPartner/Buyers/')[0], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_partner(3)
+        state, body = self.get('/BusinessPartner/Buyers/')
+        self.assertEqual((state, len(body)), ('MISS', 2))
+        self.assertEqual(self.get('/BusinessPartner/Craftsmans/')[0], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buyer.delete()
+        state, body = self.get('/BusinessPartner/Buyers/')
+        self.assertEqual((state, len(body)), ('MISS', 1))
+
+    def test_role_change_invalidates_both_roles(self):
+        self.get('/BusinessPartner/Buyers/')
+        self.get('/BusinessPartner/Craftsmans/')
+        craftsman = BusinessPartner.objects.get(role='CRAFTSMAN')
+        craftsman.role = 'BUYER'
+        with self.captureOnCommitCallbacks(execute=True):
+            craftsman.save()
+        self.assertEqual(self.get('/BusinessPartner/Buyers/')[0], 'MISS')
+        self.assertEqual(self.get('/BusinessPartner/Craftsmans/'), ('MISS', []))
+
+    def test_filters_and_fieldsets_are_cached_separately(self):
+        self.get('/BusinessPartner/Buyers/')
+        state, body = self.get('/BusinessPartner/Buyers/', fields='full_name')
+        self.assertEqual((state, body), ('MISS', [{'full_name': "Partner 1"}]))
+
+    def test_concurrent_misses_rebuild_once(self):
+        request = RequestFactory().get('/BusinessPartner/Buyers/')
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return b'[]'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cached_response('BUYER', request, build))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(sorted(hit for body, hit in results), [False, True, True, True, True])
+        self.assertEqual(directory_stats(), {'hits': 0, 'misses': 5, 'rebuilds': 1, 'coalesced': 4})
+
+    def test_stats_endpoint(self):
+        self.get('/BusinessPartner/Buyers/')
+        self.get('/BusinessPartner/Buyers/')
+        self.client.force_login(get_user_model().objects.create_user(username='staff', password='pass', role_name='Admin'))
+        stats = self.client.get('/BusinessPartner/directory-cache').json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+PINCODE_CSV = """circlename,officename,pincode,officetype,Districtname,statename
+Tamilnadu Circle,Anna Road H.O,600002,H.O,CHENNAI,TAMIL NADU
+Tamilnadu Circle,Chintadripet S.O,600002,S.O,CHENNAI,TAMIL NADU
+Maharashtra Circle,Mumbai G.P.O.,400001,H.O,MUMBAI,MAHARASHTRA
+Delhi Circle,Connaught Place S.O,110001,S.O,NEW  DELHI,DELHI
+Delhi Circle,Bad Row,11000A,S.O,NEW DELHI,DELHI
+"""
+
+
+class PincodeDatasetTestCase(TestCase):
+    """Runs with a small pincode dataset built by the load_pincodes command."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data_dir = tempfile.mkdtemp()
+        cls.dataset = os.path.join(cls.data_dir, 'pincodes.bin')
+        csv_path = os.path.join(cls.data_dir, 'pincodes.csv')
+        with open(csv_path, 'w') as file:
+            file.write(PINCODE_CSV)
+        call_command('load_pincodes', csv_path, output=cls.dataset, stdout=StringIO())
+        cls.settings_override = override_settings(PINCODE_DATASET=cls.dataset)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        pincodes.reset()
+        shutil.rmtree(cls.data_dir)
+        super().tearDownClass()
+
+
+class PincodeTests(PincodeDatasetTestCase):
+    def test_lookup(self):
+        self.assertEqual(pincodes.resolve('600002'), ('Chennai', 'Tamil Nadu', 'India'))
+        self.assertEqual(pincodes.resolve(110001), ('New Delhi', 'Delhi', 'India'))
+        self.assertIsNone(pincodes.resolve('600001'))
+        self.assertIsNone(pincodes.resolve('99999999'))
+        self.assertIsNone(pincodes.resolve('11000A'))
+        self.assertEqual(len(pincodes.get_directory()), 3)
+
+    def test_missing_dataset_resolves_nothing(self):
+        with override_settings(PINCODE_DATASET=os.path.join(self.data_dir, 'missing.bin')):
+            self.assertIsNone(pincodes.resolve('600002'))
+
+
+
+def make_unlocated_partner(number, pincode):
+    return BusinessPartner.objects.create(
+        role='BUYER', bp_code=f"BP{number:03d}", term='T1', business_name=f"Partner {number}",
+        full_name=f"Partner {number}", mobile=f"90000{number:05d}", email=f"partner{number}@example.com",
+        pincode=pincode)
+
+
+class LocationEnrichmentTests(PincodeDatasetTestCase):
+    def test_save_queues_missing_city_and_state_for_the_worker(self):
+        partner = make_unlocated_partner(900, '400001')
+        self.assertEqual((partner.city, partner.location_status), (None, 'pending'))
+        self.assertEqual(make_partner(901).location_status, '')
+
+        self.assertEqual(enrich_pending(), Counter(resolved=1))
+        partner.refresh_from_db()
+        self.assertEqual((partner.city, partner.state, partner.location_status), ('Mumbai', 'Maharashtra', ''))
+
+    def test_changed_pincode_replaces_the_old_location(self):
+        partner = make_unlocated_partner(900, '400001')
+        enrich_pending()
+        partner.refresh_from_db()
+
+        partner.pincode = '600002'
+        partner.save()
+        self.assertEqual((partner.city, partner.state, partner.location_status), ('Unknown', 'Unknown', 'pending'))
+        enrich_pending()
+        partner.refresh_from_db()
+        self.assertEqual((partner.city, partner.state), ('Chennai', 'Tamil Nadu'))
+
+    def test_batch_resolves_each_pincode_once(self):
+        for number in range(900, 904):
+            make_unlocated_partner(number, '600002')
+        make_unlocated_partner(904, '400001')
+        with mock.patch('BusinessPartner.enrichment.resolve_pincode', wraps=pincodes.resolve) as resolve:
+            self.assertEqual(enrich_pending(batch_size=10), Counter(resolved=5))
+        self.assertEqual(resolve.call_count, 2)
+        self.assertEqual(BusinessPartner.objects.filter(city='Chennai').count(), 4)
+
+    @override_settings(LOCATION_ENRICH_MAX_ATTEMPTS=2, LOCATION_ENRICH_RETRY_SECONDS=60)
+    def test_unresolved_rows_back_off_then_fail_and_can_be_requeued(self):
+        partner = make_unlocated_partner(900, '600001')
+        now = timezone.now()
+        self.assertEqual(enrich_pending(now=now), Counter(retried=1))
+        partner.refresh_from_db()
+        self.assertEqual((partner.location_attempts, partner.location_retry_at), (1, now + timedelta(seconds=60)))
+        self.assertEqual(enrich_pending(now=now), Counter())
+        self.assertEqual(enrich_pending(now=now + timedelta(seconds=60)), Counter(failed=1))
+
+        BusinessPartner.objects.filter(pk=partner.pk).update(pincode='600002', state='Unknown')
+        self.assertEqual(requeue()['BusinessPartner.BusinessPartner'], 1)
+        enrich_pending()
+        partner.refresh_from_db()
+        self.assertEqual((partner.city, partner.state, partner.location_status), ('Chennai', 'Tamil Nadu', ''))
+
+
+IFSC_CSV = """BANK,IFSC,BRANCH,CENTRE,DISTRICT,STATE,ADDRESS,CITY
+State Bank of India,SBIN0005943,Anna Nagar,CHENNAI,CHENNAI,TAMIL NADU,Anna Nagar,CHENNAI
+State Bank of India,SBIN0001234,Anna Salai,CHENNAI,CHENNAI,TAMIL NADU,Mount Road,CHENNAI
+State Bank of India,SBIN0000300,Anna Nagar,MADURAI,MADURAI,TAMIL NADU,Anna Nagar,MADURAI
+State Bank of India,SBIN0RRCHGB,Chhattisgarh Rajya Gramin Bank,RAIPUR,RAIPUR,CHHATTISGARH,Raipur,RAIPUR
+HDFC Bank,HDFC0000001,Anna Nagar,CHENNAI,CHENNAI,TAMIL NADU,2nd Avenue,CHENNAI
+HDFC Bank,HDFC00001,Bad Row,CHENNAI,CHENNAI,TAMIL NADU,,CHENNAI
+"""
+
+
+class IfscTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data_dir = tempfile.mkdtemp()
+        csv_path = os.path.join(cls.data_dir, 'ifsc.csv')
+        with open(csv_path, 'w') as file:
+            file.write(IFSC_CSV)
+        dataset = os.path.join(cls.data_dir, 'ifsc.bin')
+        call_command('load_ifsc', csv_path, output=dataset, stdout=StringIO())
+        cls.settings_override = override_settings(IFSC_DATASET=dataset)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        ifsc.reset()
+        shutil.rmtree(cls.data_dir)
+        super().tearDownClass()
+
+    def test_lookup_by_code(self):
+        directory = ifsc.get_directory()
+        self.assertEqual(len(directory), 5)
+        self.assertEqual(
+            ifsc.lookup('sbin0005943'),
+            ifsc.Branch('SBIN0005943', 'State Bank of India', 'Anna Nagar', 'CHENNAI', 'TAMIL NADU'))
+        self.assertEqual(ifsc.lookup('SBIN0RRCHGB').city, 'RAIPUR')
+        self.assertIsNone(ifsc.lookup('SBIN0005944'))
+        self.assertIsNone(ifsc.lookup('ABCD0000001'))
+
+    def test_branch_and_city_indexes(self):
+        directory = ifsc.get_directory()
+        self.assertEqual([branch.ifsc for branch in directory.find_branch('state bank of india', 'ANNA NAGAR')], ['SBIN0000300', 'SBIN0005943'])
+        self.assertEqual([branch.ifsc for branch in directory.find_city('State Bank of India', 'Chennai')], ['SBIN0005943', 'SBIN0001234'])
+        self.assertEqual([branch.branch for branch in directory.suggest_branches('State Bank of India', 'anna s')], ['Anna Salai'])
+        self.assertEqual([branch.ifsc for branch in directory.suggest_branches('State Bank of India', 'anna', city='Madurai')], ['SBIN0000300'])
+        self.assertEqual(directory.suggest_banks('s'), ['State Bank of India'])
+        self.assertEqual(fetch_ifsc_code('HDFC Bank', 'anna nagar'), 'HDFC0000001')
+        self.assertIsNone(fetch_ifsc_code('State Bank of India', 'Anna Nagar'))
+
+    def test_kyc_validation_checks_code_and_fills_bank_details(self):
+        serializer = BusinessPartnerKYCSerializer()
+        attrs = serializer.validate({'ifsc_code': 'SBIN0001234'})
+        self.assertEqual(
+            (attrs['bank_name'], attrs['branch'], attrs['bank_city'], attrs['bank_state']),
+            ('State Bank of India', 'Anna Salai', 'CHENNAI', 'TAMIL NADU'))
+        self.assertEqual(serializer.validate({'bank_name': 'HDFC Bank', 'branch': 'Anna Nagar'})['ifsc_code'], 'HDFC0000001')
+        with self.assertRaises(serializers.ValidationError):
+            serializer.validate({'ifsc_code': 'SBIN0005944'})
+
+    def test_typeahead_endpoint(self):
+        self.client.force_login(get_user_model().objects.create_user(username='staff', password='pass', role_name='Admin'))
+        self.assertEqual(self.client.get('/BusinessPartnerKYC/ifsc', {'q': 'hd'}).json(), {'banks': ['HDFC Bank']})
+        response = self.client.get('/BusinessPartnerKYC/ifsc', {'bank': 'State Bank of India', 'q': 'Anna', 'limit': 2})
+        self.assertEqual([branch['ifsc'] for branch in response.json()['branches']], ['SBIN0000300', 'SBIN0005943'])
+        self.assertEqual(self.client.get('/BusinessPartnerKYC/ifsc', {'ifsc': 'HDFC0000001'}).json()['branch'], 'Anna Nagar')
+        self.assertEqual(self.client.get('/BusinessPartnerKYC/ifsc', {'ifsc': 'HDFC0000002'}).status_code, 404)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers GETs from the server's `routes` {path: (status, JSON body)}; other paths get a 404."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.connections.add(self.client_address)
+        status, body = self.server.routes.get(self.path, (404, {}))
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServerTestCase(TestCase):
+    """Points the outbound services at a local stand-in server."""
+    services = ()
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.routes, self.server.requests, self.server.connections = {}, [], set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        base_url = f"http://127.0.0.1:{self.server.server_port}"
+        services = override_settings(OUTBOUND_SERVICES={
+            name: {'base_url': base_url, 'failure_threshold': 2, 'reset_seconds': 60} for name in self.services
+        })
+        services.enable()
+        self.addCleanup(services.disable)
+
+
+class OutboundClientTests(StandInServerTestCase):
+    services = ('stand-in',)
+
+    def test_connections_are_reused_and_answers_cached(self):
+        self.server.routes = {'/a': (200, {'value': 1}), '/b': (200, {'value': 2})}
+        client = outbound.get_client('stand-in')
+        self.assertEqual(client.get_json('a'), {'value': 1})
+        self.assertEqual(client.get_json('b'), {'value': 2})
+        self.assertEqual(client.get_json('a'), {'value': 1})
+        self.assertIsNone(client.get_json('missing'))
+        self.assertIsNone(client.get_json('missing'))
+        self.assertEqual(self.server.requests, ['/a', '/b', '/missing'])
+        self.assertEqual(len(self.server.connections), 1)
+        stats = outbound.stats()['stand-in']
+        self.assertEqual((stats['calls'], stats['cache_hits']), (3, 2))
+        self.assertEqual(sum(stats['latency'].values()), 3)
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        self.server.routes = {'/down': (500, {}), '/up': (200, {})}
+        client = outbound.get_client('stand-in')
+        for _ in range(2):
+            with self.assertRaises(outbound.OutboundError):
+                client.get_json('down')
+        with self.assertRaises(outbound.CircuitOpen):
+            client.get_json('up')
+        self.assertEqual(self.server.requests, ['/down', '/down'])
+        client.breaker.opened_at -= 60
+        self.assertEqual(client.get_json('up'), {})
+        self.assertEqual(client.breaker.state, 'closed')
+
+
+@override_settings(LOCATION_ONLINE_FALLBACK=True, PINCODE_DATASET='/nonexistent/pincodes.bin')
+class OnlineLocationFallbackTests(StandInServerTestCase):
+    services = ('postalpincode',)
+
+    def test_worker_asks_the_service_for_unknown_pincodes(self):
+        self.server.routes = {'/pincode/560001': (200, [{'Status': 'Success', 'PostOffice': [
+            {'District': 'Bangalore', 'State': 'Karnataka', 'Country': 'India'}]}])}
+        partner = make_unlocated_partner(900, '560001')
+        self.assertEqual(enrich_pending(), Counter(resolved=1))
+        partner.refresh_from_db()
+        self.assertEqual((partner.city, partner.state), ('Bangalore', 'Karnataka'))
+
+    def test_service_errors_are_retried(self):
+        self.server.routes = {'/pincode/560001': (503, {})}
+        make_unlocated_partner(900, '560001')
+        self.assertEqual(enrich_pending(), Counter(retried=1))
+
+
+class ImportTestCase(TestCase):
+    """Base for import tests: uploaded files go to a temporary MEDIA_ROOT."""
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def make_job(self, kind, lines, user=None):
+        job = ImportJob(kind=kind, created_by=user)
+        job.file.save('import.csv', ContentFile('\n'.join(lines).encode()), save=False)
+        job.save()
+        return job
+
+
+class BusinessPartnerImportTests(ImportTestCase):
+    header = 'role,term,business_name,full_name,mobile,email,pincode,city,state'
+
+    def setUp(self):
+        super().setUp()
+        self.owner = get_user_model().objects.create_user(username='owner', password='pass', role_name='Project Owner')
+
+    def row(self, number, role='BUYER', name='Aurum', email=None):
+        email = email or f"partner{number}@example.com"
+        return f"{role},T1,{name} {number},Partner {number},90000{number:05d},{email},600001,Chennai,Tamil Nadu"
+
+    def test_import_creates_partners_with_codes_and_reports_bad_rows(self):
+        make_partner(99)
+        job = self.make_job('business_partners', [
+            self.header,
+            self.row(1),
+            self.row(2, role='craftsman'),
+            self.row(3, email='partner99@example.com'),
+            self.row(4, email='partner1@example.com'),
+            'BUYER,T1,Kanak,Kanak,123,kanak@example.com,600001,Chennai,Tamil Nadu',
+            'BUYER,T9,Kanak,,9000000777,kanak@example.com,600001,,',
+        ], user=self.owner)
+
+        run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.total_rows, job.processed_rows, job.created_rows, job.error_rows), (6, 6, 2, 4))
+        self.assertEqual(
+            set(BusinessPartner.objects.exclude(bp_code='BP099').values_list('bp_code', 'role')),
+            {('BA001', 'BUYER'), ('AA001', 'CRAFTSMAN')})
+        self.assertEqual([error['row'] for error in job.errors], [4, 5, 6, 7])
+        self.assertIn('email', job.errors[0]['errors'])
+        self.assertIn('same as row 2', job.errors[1]['errors']['email'][0])
+        self.assertIn('mobile', job.errors[2]['errors'])
+        self.assertEqual(job.errors[3]['errors'], {'full_name': ['This field is required.']})
+
+    def test_queries_per_batch_do_not_grow_with_rows(self):
+        def import_queries(first, count):
+            job = self.make_job('business_partners', [self.header] + [self.row(n) for n in range(first, first + count)], user=self.owner)
+            with CaptureQueriesContext(connection) as queries:
+                run_job(job)
+            self.assertEqual(job.created_rows, count)
+            return len(queries)
+
+        import_queries(1, 5)  # creates the bp_code sequence row
+        self.assertEqual(import_queries(10, 5), import_queries(20, 30))
+
+    def test_interrupted_job_resumes_after_last_batch(self):
+        job = self.make_job('business_partners', [self.header] + [self.row(n) for n in range(1, 6)], user=self.owner)
+        job.status = 'running'
+        job.processed_rows = 3
+        job.save()
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=job.created_at.replace(year=2000))
+
+        job = claim_job()
+        run_job(job, batch_size=1)
+
+        self.assertEqual(job.processed_rows, 5)
+        self.assertEqual(
+            sorted(BusinessPartner.objects.values_list('business_name', flat=True)), ['Aurum 4', 'Aurum 5'])
+        self.assertIsNone(claim_job())
+
+    def test_upload_queues_job(self):
+        self.client.force_login(self.owner)
+        upload = ContentFile('\n'.join([self.header, self.row(1)]).encode(), name='partners.csv')
+        response = self.client.post('/BusinessPartner/import', {'file': upload})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'pending')
+
+        run_job(claim_job())
+        response = self.client.get(f"/imports/{response.json()['id']}")
+        self.assertEqual(response.json()['created_rows'], 1)
+
+    def test_upload_needs_permission_to_create_partners(self):
+        self.client.force_login(get_user_model().objects.create_user(username='clerk', password='pass', role_name='User'))
+        upload = ContentFile(self.header.encode(), name='partners.csv')
+        self.assertEqual(self.client.post('/BusinessPartner/import', {'file': upload}).status_code, 403)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_unknown_column_fails_the_job_before_any_row(self):
+        job = self.make_job('business_partners', [
+            self.header + ',password',
+            self.row(1) + ',',
+            self.row(2) + ',secret',
+        ], user=self.owner)
+
+        run_job(job)
+
+        self.assertEqual((job.status, job.processed_rows, job.total_rows), ('failed', 0, None))
+        self.assertIn('password', job.message)
+        self.assertFalse(BusinessPartner.objects.exists())
+
+    def test_admins_may_import_partners(self):
+        admin = get_user_model().objects.create_user(username='admin', password='pass', role_name='Admin')
+        job = self.make_job('business_partners', [self.header, self.row(1)], user=admin)
+
+        run_job(job)
+
+        self.assertEqual((job.status, job.created_rows), ('completed', 1))
+
+    def test_job_report_is_shown_to_its_uploader_and_admins_only(self):
+        job = self.make_job('business_partners', [self.header, self.row(1)], user=self.owner)
+
+        self.client.force_login(get_user_model().objects.create_user(username='clerk', password='pass', role_name='User'))
+        self.assertEqual(self.client.get(f"/imports/{job.pk}").status_code, 404)
+        self.client.force_login(get_user_model().objects.create_user(username='admin', password='pass', role_name='Admin'))
+        self.assertEqual(self.client.get(f"/imports/{job.pk}").status_code, 200)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(f"/imports/{job.pk}").status_code, 200)
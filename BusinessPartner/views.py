@@ -2,22 +2,106 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from .models import BusinessPartner, BusinessPartnerKYC
-from .serializers import BusinessPartnerSerializer, BusinessPartnerKYCSerializer
+from .models import ROLE_CHOICES, BusinessPartner, BusinessPartnerKYC, ImportJob
+from .serializers import BusinessPartnerSerializer, BusinessPartnerKYCSerializer, ImportJobSerializer
+from . import ifsc
+from .fieldsets import apply_sparse_fields
+from .conditional import list_etag, not_modified, not_modified_response, row_etag
+from .directory import cached_response, stats as directory_stats
+from .outbound import stats as outbound_stats
+from .exports import export_columns, stream_csv
+from .imports import ImportFailed, get_importer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework import viewsets
 from rest_framework.generics import ListAPIView
+from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse
+
+class CachedDirectoryMixin:
+    """
+    Serve the list from the directory cache (see BusinessPartner.directory),
+    which partner changes of `directory_role` invalidate. X-Cache tells
+    whether the body came from the cache.
+    """
+    directory_role = None
+
+    def list(self, request, *args, **kwargs):
+        def build():
+            return JSONRenderer().render(super(CachedDirectoryMixin, self).list(request, *args, **kwargs).data)
+
+        body, hit = cached_response(self.directory_role, request, build)
+        response = HttpResponse(body, content_type='application/json')
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
 
 # API for listing only BUYER data
-class BuyerListView(ListAPIView):
+class BuyerListView(CachedDirectoryMixin, ListAPIView):
     queryset = BusinessPartner.objects.filter(role="BUYER")
     serializer_class = BusinessPartnerSerializer
+    directory_role = 'BUYER'
+
+    def get_queryset(self):
+        return apply_sparse_fields(super().get_queryset(), self.serializer_class, self.request)
 
 # API for listing only CRAFTSMAN data
-class CraftsmanListView(ListAPIView):
+class CraftsmanListView(CachedDirectoryMixin, ListAPIView):
     queryset = BusinessPartner.objects.filter(role="CRAFTSMAN")
     serializer_class = BusinessPartnerSerializer
+    directory_role = 'CRAFTSMAN'
+
+    def get_queryset(self):
+        return apply_sparse_fields(super().get_queryset(), self.serializer_class, self.request)
+
+
+class DirectoryCacheStatsView(APIView):
+    """Hit, miss, rebuild and coalesced-wait counts of the buyer and craftsman directory cache."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(directory_stats(), status=status.HTTP_200_OK)
+
+
+class OutboundStatsView(APIView):
+    """Call, failure and cache counts, circuit state and latency histogram per outbound service."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(outbound_stats(), status=status.HTTP_200_OK)
+
+
+class IfscSearchView(APIView):
+    """
+    Bank details from the local IFSC directory, for KYC entry:
+    - ?ifsc=SBIN0005943: the branch with that code.
+    - ?q=sta: bank names starting with `q`.
+    - ?bank=State Bank of India&q=anna[&city=Chennai]: the bank's branches whose name starts with `q`.
+    At most `limit` (default 10, up to 50) suggestions are returned.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        directory = ifsc.get_directory()
+        if directory is None:
+            return Response({"error": "The IFSC directory is not installed."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        code = request.query_params.get('ifsc')
+        if code:
+            branch = directory.lookup(code)
+            if branch is None:
+                return Response({"error": "Unknown IFSC Code."}, status=status.HTTP_404_NOT_FOUND)
+            return Response(branch._asdict(), status=status.HTTP_200_OK)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        query = request.query_params.get('q', '')
+        bank = request.query_params.get('bank')
+        if not bank:
+            return Response({"banks": directory.suggest_banks(query, limit)}, status=status.HTTP_200_OK)
+        branches = directory.suggest_branches(bank, query, request.query_params.get('city'), limit)
+        return Response({"branches": [branch._asdict() for branch in branches]}, status=status.HTTP_200_OK)
 
 
 
@@ -36,9 +120,13 @@ class BusinessPartnerView(generics.GenericAPIView):
         Get all Business Partners or filter by `bp_code`.
         """
         bp_code = request.query_params.get("bp_code")
-        queryset = self.get_queryset().filter(bp_code=bp_code) if bp_code else self.get_queryset()
+        queryset = apply_sparse_fields(self.get_queryset(), BusinessPartnerSerializer, request)
+        queryset = queryset.filter(bp_code=bp_code) if bp_code else queryset
+        etag = list_etag(request, queryset)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     def post(self, request, *args, **kwargs):
         """
@@ -52,6 +140,83 @@ class BusinessPartnerView(generics.GenericAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+BUSINESS_PARTNER_EXPORT_COLUMNS = {
+    'bp_code': 'bp_code',
+    'role': 'role',
+    'status': 'status',
+    'term': 'term',
+    'business_name': 'business_name',
+    'full_name': 'full_name',
+    'mobile': 'mobile',
+    'alternate_mobile': 'alternate_mobile',
+    'landline': 'landline',
+    'email': 'email',
+    'business_email': 'business_email',
+    'door_no': 'door_no',
+    'shop_no': 'shop_no',
+    'building_name': 'building_name',
+    'street_name': 'street_name',
+    'area': 'area',
+    'pincode': 'pincode',
+    'city': 'city',
+    'state': 'state',
+    'refered_by': 'refered_by',
+}
+
+
+class BusinessPartnerExportView(APIView):
+    """
+    Stream Business Partners as CSV.
+    - columns: comma separated subset of BUSINESS_PARTNER_EXPORT_COLUMNS
+    - filters: role, status, city, state
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        columns = export_columns(request, BUSINESS_PARTNER_EXPORT_COLUMNS)
+        partners = BusinessPartner.objects.order_by('id')
+        for param in ("role", "status", "city", "state"):
+            value = request.query_params.get(param)
+            if value:
+                partners = partners.filter(**{f"{param}__iexact": value})
+        return stream_csv(partners, columns, "business_partners.csv")
+
+
+class ImportJobView(APIView):
+    """
+    Bulk import from a CSV or XLSX file (first row = column names).
+    - POST: upload `file`. The job is queued and imported in batches by the
+      run_import_jobs command, so the request returns right away (202).
+    - GET <pk>: job progress and the per-row error report. Only admins see
+      the jobs of other users.
+    """
+    permission_classes = [IsAuthenticated]
+    kind = None
+    allowed_extensions = ('.csv', '.xlsx')
+
+    def get(self, request, pk, *args, **kwargs):
+        jobs = ImportJob.objects.all()
+        if request.user.role_name not in ROLE_CHOICES:
+            jobs = jobs.filter(created_by=request.user)
+        job = get_object_or_404(jobs, pk=pk)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"file": "This field is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if not upload.name.lower().endswith(self.allowed_extensions):
+            return Response({"file": "Upload a .csv or .xlsx file."}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = ImportJob(kind=self.kind, file=upload, created_by=request.user)
+        try:
+            get_importer(self.kind)(job).check_permission()
+        except ImportFailed as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_403_FORBIDDEN)
+        job.save()
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
 class BusinessPartnerDetailView(generics.GenericAPIView):
     """
     API for a single Business Partner:
@@ -68,9 +233,12 @@ class BusinessPartnerDetailView(generics.GenericAPIView):
 
     def get(self, request, bp_code, *args, **kwargs):
         """Retrieve a Business Partner by bp_code."""
-        instance = self.get_object(bp_code)
+        instance = get_object_or_404(apply_sparse_fields(self.get_queryset(), BusinessPartnerSerializer, request), bp_code=bp_code)
+        etag = row_etag(request, instance)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
         serializer = self.get_serializer(instance)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     def put(self, request, bp_code, *args, **kwargs):
         """Update an existing Business Partner using bp_code."""
@@ -108,7 +276,7 @@ class BusinessPartnerKYCView(generics.GenericAPIView):
     - GET: Retrieve all KYC entries or filter by `bp_code`.
     - POST: Create a new KYC entry.
     """
-    queryset = BusinessPartnerKYC.objects.all()
+    queryset = BusinessPartnerKYC.objects.select_related('bp_code')
     serializer_class = BusinessPartnerKYCSerializer
     permission_classes = [IsAuthenticated]
 
@@ -116,8 +284,11 @@ class BusinessPartnerKYCView(generics.GenericAPIView):
         """Retrieve Business Partner KYC details or filter by `bp_code`."""
         bp_code = request.query_params.get("bp_code")
         queryset = self.get_queryset().filter(bp_code=bp_code) if bp_code else self.get_queryset()
+        etag = list_etag(request, queryset)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     def post(self, request, *args, **kwargs):
         """Create a new BusinessPartnerKYC entry."""
@@ -135,19 +306,22 @@ class BusinessPartnerKYCDetailView(generics.GenericAPIView):
     - PUT: Update a KYC entry.
     - DELETE: Delete a KYC entry.
     """
-    queryset = BusinessPartnerKYC.objects.all()
+    queryset = BusinessPartnerKYC.objects.select_related('bp_code')
     serializer_class = BusinessPartnerKYCSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self, bis_no):
         """Helper method to get the object or return 404 using bp_code."""
-        return get_object_or_404(BusinessPartnerKYC, bis_no=bis_no)
+        return get_object_or_404(self.get_queryset(), bis_no=bis_no)
 
     def get(self, request, bis_no, *args, **kwargs):
         """Retrieve a Business Partner KYC entry using bp_code."""
         instance = self.get_object(bis_no)
+        etag = row_etag(request, instance, instance.bp_code)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
         serializer = self.get_serializer(instance)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     def put(self, request, bis_no, *args, **kwargs):
         """Update an existing Business Partner KYC entry using bp_code."""
@@ -215,7 +389,7 @@ class BusinessPartnerKycRevoke(APIView):
         )
         
 class YourModelViewSet(viewsets.ModelViewSet):
-    queryset = BusinessPartnerKYC.objects.all()
+    queryset = BusinessPartnerKYC.objects.select_related('bp_code')
     serializer_class = BusinessPartnerKYCSerializer
         
         
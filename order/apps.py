@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class OrderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'order'
+
+    def ready(self):
+        from . import counters, feed, history, scheduler, search  # noqa: F401  (registers the counter, feed, history, craftsman load and search index signals)
@@ -0,0 +1,151 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from BusinessPartner.models import BusinessPartner
+
+from .history import stamp_status_change
+from .models import OPEN_STATUSES, CraftsmanLoad, Order, OrderStatusCounter
+
+
+def counter_key(status, craftsman_id, bp_code_id):
+    return (status, craftsman_id or 0, bp_code_id or 0)
+
+
+def shift_counters(changes):
+    """
+    Apply {(status, craftsman_key, bp_code_key): delta} to the counters table,
+    and to the craftsmen's open-order loads, with atomic increments.
+    Must run in the transaction that changed the orders.
+    """
+    loads = Counter()
+    for (status, craftsman_key, bp_code_key), delta in changes.items():
+        if not delta:
+            continue
+        if craftsman_key and status in OPEN_STATUSES:
+            loads[craftsman_key] += delta
+        counters = OrderStatusCounter.objects.filter(status=status, craftsman_key=craftsman_key, bp_code_key=bp_code_key)
+        if counters.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                OrderStatusCounter.objects.create(
+                    status=status, craftsman_key=craftsman_key, bp_code_key=bp_code_key, count=delta)
+        except IntegrityError:
+            counters.update(count=F('count') + delta)
+
+    for craftsman_id, delta in loads.items():
+        if delta:
+            CraftsmanLoad.objects.filter(craftsman_id=craftsman_id).update(open_orders=F('open_orders') + delta)
+
+
+def record_moves(moves):
+    """Shift the counters for a list of (old_key, new_key) pairs; None means created/deleted."""
+    changes = Counter()
+    for old_key, new_key in moves:
+        if old_key == new_key:
+            continue
+        if old_key is not None:
+            changes[old_key] -= 1
+        if new_key is not None:
+            changes[new_key] += 1
+    shift_counters(changes)
+
+
+def count_orders():
+    """Recount the Order table, returning {(status, craftsman_key, bp_code_key): count}."""
+    rows = Order.objects.order_by().values_list('status', 'craftsman_id', 'bp_code_id').annotate(total=Count('id'))
+    counts = Counter()
+    for status, craftsman_id, bp_code_id, total in rows:
+        counts[counter_key(status, craftsman_id, bp_code_id)] += total
+    return counts
+
+
+def count_loads(counts=None):
+    """Open orders per craftsman id, from `counts` as returned by count_orders()."""
+    counts = count_orders() if counts is None else counts
+    loads = Counter()
+    for (status, craftsman_key, bp_code_key), total in counts.items():
+        if craftsman_key and status in OPEN_STATUSES:
+            loads[craftsman_key] += total
+    return loads
+
+
+def summarize(craftsman_id=None, bp_code_id=None):
+    """Order counts per status (total and assigned to a craftsman) in one read."""
+    counters = OrderStatusCounter.objects.filter(count__gt=0)
+    if craftsman_id is not None:
+        counters = counters.filter(craftsman_key=craftsman_id)
+    if bp_code_id is not None:
+        counters = counters.filter(bp_code_key=bp_code_id)
+    rows = counters.order_by().values('status').annotate(
+        total=Sum('count'),
+        assigned=Sum('count', filter=~Q(craftsman_key=0)),
+    )
+    statuses = {row['status']: {'total': row['total'], 'assigned': row['assigned'] or 0} for row in rows}
+    return {
+        'statuses': statuses,
+        'total': sum(row['total'] for row in statuses.values()),
+        'assigned': sum(row['assigned'] for row in statuses.values()),
+    }
+
+
+COUNTER_FIELDS = {'status', 'craftsman', 'craftsman_id', 'bp_code', 'bp_code_id'}
+
+
+def touches_counters(update_fields):
+    return update_fields is None or bool(COUNTER_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=Order)
+def remember_counter_key(sender, instance, update_fields=None, **kwargs):
+    instance._counter_key_before = instance._status_before = None
+    if instance.pk is not None and touches_counters(update_fields):
+        previous = (
+            Order.objects.select_for_update()
+            .filter(pk=instance.pk)
+            .values_list('status', 'craftsman_id', 'bp_code_id', 'status_changed_at')
+            .first()
+        )
+        if previous:
+            status, craftsman_id, bp_code_id, status_changed_at = previous
+            instance._counter_key_before = counter_key(status, craftsman_id, bp_code_id)
+            # Read by order.history to record the status change.
+            instance._status_before = (status, craftsman_id, status_changed_at)
+    stamp_status_change(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_counters_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if not created and not touches_counters(update_fields):
+        return
+    new_key = counter_key(instance.status, instance.craftsman_id, instance.bp_code_id)
+    record_moves([(getattr(instance, '_counter_key_before', None), new_key)])
+
+
+@receiver(post_delete, sender=Order)
+def update_counters_on_delete(sender, instance, **kwargs):
+    record_moves([(counter_key(instance.status, instance.craftsman_id, instance.bp_code_id), None)])
+
+
+@receiver(pre_delete, sender=BusinessPartner)
+def release_craftsman_counters(sender, instance, **kwargs):
+    """
+    Deleting a craftsman sets Order.craftsman to NULL with a bulk UPDATE that
+    skips the order signals, so move the craftsman's counters to key 0 here.
+    Its CraftsmanLoad is deleted along with it. Orders that also belong to
+    the partner as bp_code are deleted, and their post_delete takes them off.
+    """
+    rows = (
+        OrderStatusCounter.objects.filter(craftsman_key=instance.pk, count__gt=0)
+        .exclude(bp_code_key=instance.pk)
+        .values_list('status', 'bp_code_key', 'count')
+    )
+    changes = Counter()
+    for status, bp_code_key, count in rows:
+        changes[(status, instance.pk, bp_code_key)] -= count
+        changes[(status, 0, bp_code_key)] += count
+    shift_counters(changes)
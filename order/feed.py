@@ -0,0 +1,186 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from BusinessPartner.models import BusinessPartner
+
+from .history import status_changed
+from .models import Order
+from .transitions import ADMINS
+
+
+KEEPALIVE_SECONDS = 15
+
+# Statuses a role follows, across all orders.
+ROLE_STATUSES = {
+    'Key User': ('pending', 'in-process'),
+}
+# Roles that follow the orders of their own business partner.
+CUSTOMER_ROLES = ('User', 'Walking Customer')
+
+
+class LocalBroker:
+    """
+    In-process fan-out of order status events. The last `size` events are
+    kept in a ring buffer with increasing ids; subscribers read from it with
+    their own cursor, so a slow client never makes the broker hold more.
+    Only reaches clients connected to the same process: deployments with
+    several workers point ORDER_FEED_BROKER at a broker backed by shared pub/sub.
+    """
+
+    def __init__(self, size=None):
+        self.events = deque(maxlen=size or getattr(settings, 'ORDER_FEED_BUFFER', 1000))
+        self.last_id = 0
+        self.lock = threading.Lock()
+        self.waiters = set()
+
+    def publish(self, payloads):
+        """Append the payloads and wake the subscribers; may be called from any thread."""
+        with self.lock:
+            for payload in payloads:
+                self.last_id += 1
+                self.events.append((self.last_id, payload))
+            waiters = list(self.waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def since(self, last_id):
+        """
+        Return ([(id, payload)] after `last_id`, missed), where `missed`
+        means events after `last_id` already dropped out of the buffer.
+        """
+        with self.lock:
+            oldest = self.events[0][0] if self.events else self.last_id + 1
+            return [(event_id, payload) for event_id, payload in self.events if event_id > last_id], last_id + 1 < oldest
+
+    async def wait(self, last_id, timeout):
+        """Wait until there are events after `last_id`; False on timeout."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.lock:
+            if self.last_id > last_id:
+                return True
+            self.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self.lock:
+                self.waiters.discard(waiter)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'ORDER_FEED_BROKER', 'order.feed.LocalBroker'))()
+
+
+@receiver(status_changed, sender=Order)
+def publish_status_changes(sender, changes, ts, **kwargs):
+    orders = {
+        pk: (order_no, bp_code_id)
+        for pk, order_no, bp_code_id in Order.objects.filter(pk__in={change.order_id for change in changes})
+        .values_list('pk', 'order_no', 'bp_code_id')
+    }
+    get_broker().publish([
+        {
+            'order_id': change.order_id,
+            'order_no': orders[change.order_id][0],
+            'from_status': change.from_status,
+            'to_status': change.to_status,
+            'craftsman_id': change.craftsman_after,
+            'previous_craftsman_id': change.craftsman_before,
+            'bp_code_id': orders[change.order_id][1],
+            'ts': ts.isoformat(),
+        }
+        for change in changes
+        if change.order_id in orders
+    ])
+
+
+def partner_id(code):
+    if not code:
+        return None
+    pk = BusinessPartner.objects.filter(bp_code=code).values_list('id', flat=True).first()
+    if pk is None:
+        raise BusinessPartner.DoesNotExist(f"Business partner {code} not found")
+    return pk
+
+
+def event_filter(user, params):
+    """
+    Build the predicate for the events `user` may see, narrowed by the
+    `craftsman` and `bp_code` query parameters (partner codes). Admins see
+    every change, roles in ROLE_STATUSES the changes into or out of their
+    statuses, craftsmen the orders that are or were theirs and customers the
+    orders of their own business partner. Other roles get PermissionDenied.
+    """
+    craftsman_id = partner_id(params.get('craftsman'))
+    bp_code_id = partner_id(params.get('bp_code'))
+    statuses = ROLE_STATUSES.get(user.role_name)
+    if user.role_name == 'Craftsman':
+        craftsman_id = user.bp_code_id or 0
+    elif user.role_name in CUSTOMER_ROLES:
+        bp_code_id = user.bp_code_id or 0
+    elif statuses is None and user.role_name not in ADMINS and not user.is_superuser:
+        raise PermissionDenied("You are not allowed to follow order changes.")
+
+    def matches(event):
+        if craftsman_id is not None and craftsman_id not in (event['craftsman_id'], event['previous_craftsman_id']):
+            return False
+        if bp_code_id is not None and event['bp_code_id'] != bp_code_id:
+            return False
+        return statuses is None or event['from_status'] in statuses or event['to_status'] in statuses
+
+    return matches
+
+
+@sync_to_async
+def authenticate(request):
+    """Authenticate with the API's configured authentication classes."""
+    user = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]).user
+    return user if user.is_authenticated else None
+
+
+def format_event(event_id, payload, name='status'):
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def stream(broker, matches, last_id, seconds):
+    """
+    Yield server-sent events after `last_id` for `seconds`, then end so the
+    client reconnects with Last-Event-ID. A client that fell behind the
+    buffer gets a `reset` event and should refetch its lists.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    yield "retry: 3000\n\n"
+    if last_id is None:
+        last_id = broker.last_id
+    elif last_id > broker.last_id:
+        # The id comes from before a restart of this broker.
+        last_id = broker.last_id
+        yield format_event(last_id, {}, name='reset')
+    while True:
+        events, missed = broker.since(last_id)
+        if missed:
+            yield format_event(events[0][0] - 1 if events else broker.last_id, {}, name='reset')
+        for event_id, payload in events:
+            last_id = event_id
+            if matches(payload):
+                yield format_event(event_id, payload)
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        if not await broker.wait(last_id, min(remaining, KEEPALIVE_SECONDS)):
+            yield ": keepalive\n\n"
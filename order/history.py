@@ -0,0 +1,127 @@
+from collections import defaultdict, namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Sum, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import Order, OrderEvent, OrderStateDuration
+
+
+EVENT_BATCH_SIZE = 500
+
+# Sent after the transaction that recorded the changes commits, with
+# sender=Order, changes (StatusChange tuples) and actor.
+status_changed = Signal()
+
+# One status change of one order. from_status is '' for a new order;
+# entered_at is when the order entered from_status. A reassignment that
+# keeps the status is recorded with from_status == to_status and no entered_at.
+StatusChange = namedtuple(
+    'StatusChange', 'order_id from_status to_status entered_at craftsman_before craftsman_after category',
+)
+
+
+def record_events(changes, actor=None, notes='', ts=None):
+    """
+    Append an OrderEvent per StatusChange with batched inserts, and add the
+    time spent in the old status to the per (status, craftsman, category)
+    durations. Must run in the transaction that changed the orders.
+    """
+    ts = ts or timezone.now()
+    changes = list(changes)
+    events, durations = [], defaultdict(list)
+    for change in changes:
+        seconds = None
+        if change.from_status and change.entered_at:
+            seconds = max(0, int((ts - change.entered_at).total_seconds()))
+            durations[(change.from_status, change.craftsman_before or 0, change.category or '')].append(seconds)
+        events.append(OrderEvent(
+            order_id=change.order_id, ts=ts, from_status=change.from_status, to_status=change.to_status,
+            seconds_in_previous=seconds, actor=actor, craftsman_id=change.craftsman_after, notes=notes,
+        ))
+    OrderEvent.objects.bulk_create(events, batch_size=EVENT_BATCH_SIZE)
+    shift_durations(durations)
+    transaction.on_commit(lambda: status_changed.send(sender=Order, changes=changes, actor=actor, ts=ts))
+
+
+def shift_durations(durations):
+    """Add {(status, craftsman_key, category): [seconds, ...]} to the duration table."""
+    for (status, craftsman_key, category), seconds in durations.items():
+        rows = OrderStateDuration.objects.filter(status=status, craftsman_key=craftsman_key, category=category)
+        increments = {
+            'orders': F('orders') + len(seconds),
+            'total_seconds': F('total_seconds') + sum(seconds),
+            'max_seconds': Greatest('max_seconds', Value(max(seconds))),
+        }
+        if rows.update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                OrderStateDuration.objects.create(
+                    status=status, craftsman_key=craftsman_key, category=category,
+                    orders=len(seconds), total_seconds=sum(seconds), max_seconds=max(seconds),
+                )
+        except IntegrityError:
+            rows.update(**increments)
+
+
+def time_in_state(craftsman_id=None, category=None, by=None):
+    """
+    Orders that left each status and how long they stayed, optionally for
+    one craftsman or category and broken down `by` 'craftsman' or 'category'.
+    """
+    rows = OrderStateDuration.objects.filter(orders__gt=0)
+    if craftsman_id is not None:
+        rows = rows.filter(craftsman_key=craftsman_id)
+    if category is not None:
+        rows = rows.filter(category=category)
+    group = ['status'] + ({'craftsman': ['craftsman_key'], 'category': ['category']}.get(by) or [])
+    rows = rows.order_by(*group).values(*group).annotate(
+        total_orders=Sum('orders'), seconds=Sum('total_seconds'), longest=Max('max_seconds'),
+    )
+    return [
+        {
+            **{key: row[key] for key in group},
+            'orders': row['total_orders'],
+            'average_seconds': row['seconds'] // row['total_orders'],
+            'max_seconds': row['longest'],
+        }
+        for row in rows
+    ]
+
+
+def stamp_status_change(instance):
+    """
+    Called from order.counters' pre_save receiver once it has read the
+    stored row into `_status_before`.
+    """
+    before = instance._status_before
+    if before and before[0] != instance.status:
+        instance.status_changed_at = timezone.now()
+
+
+@receiver(post_save, sender=Order)
+def record_event_on_save(sender, instance, created, **kwargs):
+    """
+    Record status changes and reassignments made with save(); set
+    `_changed_by` on the order to name the actor.
+    """
+    if created:
+        before = ('', None, None)
+    else:
+        before = getattr(instance, '_status_before', None)
+        if not before or before[:2] == (instance.status, instance.craftsman_id):
+            return
+    status, craftsman_id, entered_at = before
+    ts = instance.status_changed_at
+    if status == instance.status:
+        # status_changed_at still holds when the status was entered.
+        entered_at, ts = None, timezone.now()
+    record_events(
+        [StatusChange(instance.pk, status, instance.status, entered_at, craftsman_id, instance.craftsman_id, instance.category)],
+        actor=getattr(instance, '_changed_by', None),
+        ts=ts,
+    )
@@ -0,0 +1,67 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from BusinessPartner.imports import BaseImporter, ImportFailed
+from BusinessPartner.models import BusinessPartner
+
+from .counters import counter_key, record_moves
+from .history import StatusChange, record_events
+from .models import Order, _order_no_series, reserve_order_nos
+from .search import index_new_orders
+from .transitions import KEY_USERS
+
+
+# Roles that may import orders; all but the key users only for their own business partner.
+ORDER_ROLES = KEY_USERS + ('User',)
+
+
+class OrderImporter(BaseImporter):
+    """Bulk import of orders. Imported orders start as drafts with status 'new'."""
+    model = Order
+    columns = (
+        'name', 'reference_no', 'due_date', 'category', 'order_type',
+        'quantity', 'weight', 'dtype', 'branch_code', 'product', 'design', 'vendor_design', 'barcoded_quality',
+        'supplied', 'balance', 'assigned_by', 'narration', 'note', 'sub_brand', 'make', 'work_style', 'form',
+        'finish', 'theme', 'collection', 'description', 'assign_remarks', 'screw', 'polish', 'metal_colour',
+        'purity', 'stone', 'hallmark', 'rodium', 'enamel', 'hook', 'size', 'open_close', 'length', 'hbt_class',
+        'console_id', 'tolerance_from', 'tolerance_to',
+    )
+    required = ('bp_code', 'name', 'reference_no', 'due_date', 'branch_code', 'product', 'design', 'vendor_design')
+    generated = ('order_no',)
+    lookups = {'bp_code': (BusinessPartner, 'bp_code')}
+    unique_together = (('reference_no',), ('branch_code',))
+
+    def build(self, data, related):
+        order = super().build(data, related)
+        order.state = 'draft'
+        return order
+
+    def check_permission(self):
+        if self.user is None or self.user.role_name not in ORDER_ROLES:
+            raise ImportFailed("You do not have permission to create orders.")
+
+    def validate_row(self, order, data):
+        if self.user.role_name not in KEY_USERS and order.bp_code_id != self.user.bp_code_id:
+            raise ValidationError({'bp_code': ["You can only import orders of your own business partner."]})
+        _order_no_series(order.branch_code)
+        if order.due_date < timezone.now().date() + timedelta(days=1):
+            raise ValidationError({'due_date': ["Due date must be tomorrow or later. Cannot be today or in the past."]})
+
+    def prepare(self, orders):
+        series = defaultdict(list)
+        for order in orders:
+            series[_order_no_series(order.branch_code)[1]].append(order)
+        for group in series.values():
+            for order, order_no in zip(group, reserve_order_nos(len(group), group[0].branch_code)):
+                order.order_no = order_no
+
+    def after_create(self, orders):
+        record_moves([(None, counter_key(order.status, order.craftsman_id, order.bp_code_id)) for order in orders])
+        record_events(
+            [StatusChange(order.pk, '', order.status, None, None, order.craftsman_id, order.category) for order in orders],
+            self.user,
+        )
+        index_new_orders(orders)
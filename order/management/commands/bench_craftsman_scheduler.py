@@ -0,0 +1,103 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from BusinessPartner.models import BusinessPartner
+from order.counters import OPEN_STATUSES
+from order.models import CraftsmanLoad, CraftsmanSkill, Order
+from order.scheduler import POLICIES, available_loads, get_policy
+
+
+class Command(BaseCommand):
+    help = (
+        "Time picking the next craftsman with each assignment policy against "
+        "counting open orders per craftsman. Test data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--craftsmen', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=50_000)
+        parser.add_argument('--picks', type=int, default=200)
+
+    def handle(self, *args, **options):
+        random.seed(7)
+        with transaction.atomic():
+            craftsmen = self.create_craftsmen(options['craftsmen'])
+            orders = self.create_orders(options['orders'], craftsmen)
+            sample = random.sample(orders, min(options['picks'], len(orders)))
+
+            self.stdout.write(f"craftsmen={len(craftsmen)} orders={len(orders)} picks={len(sample)}")
+            self.time("before: count open orders", sample, self.pick_by_counting)
+            for name in POLICIES:
+                policy = get_policy(name)
+                self.time(f"after:  {name}", sample, lambda order: policy.choose(order, available_loads(order)))
+
+            plan = available_loads(sample[0]).order_by('open_orders', 'last_assigned_at', 'craftsman_id')[:1].explain()
+            self.stdout.write(f"least-loaded plan:\n{plan}")
+            transaction.set_rollback(True)
+
+    def time(self, label, orders, pick):
+        started = time.perf_counter()
+        for order in orders:
+            pick(order)
+        elapsed = (time.perf_counter() - started) / len(orders)
+        self.stdout.write(f"{label:34} {elapsed * 1000:8.2f} ms/pick")
+
+    def pick_by_counting(self, order):
+        open_orders = Count('assigned_orders', filter=Q(assigned_orders__status__in=OPEN_STATUSES))
+        return (
+            BusinessPartner.objects.filter(role='CRAFTSMAN')
+            .exclude(order_rejections__order=order)
+            .annotate(open_orders=open_orders)
+            .order_by('open_orders', 'id')
+            .first()
+        )
+
+    def create_craftsmen(self, count):
+        BusinessPartner.objects.bulk_create([
+            BusinessPartner(
+                role='CRAFTSMAN', bp_code=f"BENCH{i:06d}", term='T1', business_name=f"Bench {i}",
+                full_name=f"Bench {i}", mobile=f"8{i:09d}", email=f"bench{i}@example.com", pincode='600001',
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        craftsmen = list(BusinessPartner.objects.filter(bp_code__startswith='BENCH').order_by('id'))
+        now = timezone.now()
+        CraftsmanLoad.objects.bulk_create([
+            CraftsmanLoad(craftsman=craftsman, last_assigned_at=now - timedelta(minutes=random.randint(0, 10_000)))
+            for craftsman in craftsmen
+        ], batch_size=1000, ignore_conflicts=True)
+        CraftsmanSkill.objects.bulk_create([
+            CraftsmanSkill(craftsman=craftsman, category=random.choice(Order.CATEGORY_CHOICES)[0], orders=1)
+            for craftsman in craftsmen
+        ], batch_size=1000, ignore_conflicts=True)
+        return craftsmen
+
+    def create_orders(self, count, craftsmen):
+        due_date = timezone.localdate() + timedelta(days=30)
+        batch = []
+        for i in range(count):
+            craftsman = random.choice(craftsmen) if i % 2 else None
+            batch.append(Order(
+                order_no=f"BS{i:08d}", name=f"Bench order {i}", reference_no=f"BSR{i:08d}", branch_code=f"BS{i:08d}",
+                due_date=due_date, state='draft', product="Ring", design="D", vendor_design="V",
+                category=random.choice(Order.CATEGORY_CHOICES)[0],
+                status=random.choice(OPEN_STATUSES) if craftsman else 'new', craftsman=craftsman,
+            ))
+            if len(batch) == 5000:
+                Order.objects.bulk_create(batch)
+                batch = []
+        Order.objects.bulk_create(batch)
+        # bulk_create skips the counter signals, so set the loads directly.
+        loads = (
+            Order.objects.filter(status__in=OPEN_STATUSES, craftsman__isnull=False)
+            .order_by().values_list('craftsman_id').annotate(total=Count('id'))
+        )
+        for craftsman_id, total in loads:
+            CraftsmanLoad.objects.filter(craftsman_id=craftsman_id).update(open_orders=total)
+        return list(Order.objects.filter(order_no__startswith='BS').order_by('id'))
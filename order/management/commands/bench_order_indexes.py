@@ -0,0 +1,101 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from BusinessPartner.models import BusinessPartner
+from order.models import Order
+
+
+STATUS_WEIGHTS = {
+    'complete': 60, 'in-process': 10, 'assigned': 10, 'awaiting-approval': 5,
+    'pending': 5, 'new': 5, 'rejected': 5,
+}
+WITH_CRAFTSMAN = ('complete', 'in-process', 'assigned', 'awaiting-approval')
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the Order hot-path queries with and without the index each one "
+        "relies on. Test data is inserted in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--partners', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        random.seed(17)
+        with transaction.atomic():
+            partners = self.create_partners(options['partners'])
+            self.create_orders(options['rows'], partners)
+            self.analyze()
+            partner = partners[len(partners) // 2]
+            today = timezone.localdate()
+
+            cases = [
+                ("status list page", 'order_status_created_idx',
+                 lambda: Order.objects.filter(status='in-process').order_by('-created_at', '-id')[:50]),
+                ("bp_code list page", 'order_bp_created_idx',
+                 lambda: Order.objects.filter(bp_code=partner).order_by('-created_at', '-id')[:50]),
+                ("craftsman inbox page", 'order_craftsman_inbox_idx',
+                 lambda: Order.objects.filter(craftsman=partner, status='assigned').order_by('due_date', 'id')[:50]),
+                ("overdue batch", 'order_status_due_idx',
+                 lambda: Order.objects.filter(status='in-process', due_state='', due_date__lt=today).order_by('due_date', 'id')[:500]),
+            ]
+            self.stdout.write(f"rows={options['rows']} partners={len(partners)} repeat={options['repeat']} ({connection.vendor})")
+            for label, index, query in cases:
+                with_index = self.time(query, options['repeat'])
+                self.drop_index(index)
+                without_index = self.time(query, options['repeat'])
+                self.stdout.write(
+                    f"{label:22} {index:28} with {with_index:9.2f} ms   without {without_index:9.2f} ms"
+                )
+            transaction.set_rollback(True)
+
+    def time(self, query, repeat):
+        list(query())  # warm up
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(query())
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def drop_index(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def create_partners(self, count):
+        BusinessPartner.objects.bulk_create([
+            BusinessPartner(
+                role='CRAFTSMAN', bp_code=f"IDX{i:06d}", term='T1', business_name=f"Index {i}",
+                full_name=f"Index {i}", mobile=f"7{i:09d}", email=f"index{i}@example.com", pincode='600001',
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        return list(BusinessPartner.objects.filter(bp_code__startswith='IDX').order_by('id'))
+
+    def create_orders(self, rows, partners):
+        today = timezone.localdate()
+        statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+        batch = []
+        for i in range(rows):
+            status = random.choices(statuses, weights)[0]
+            craftsman = random.choice(partners) if status in WITH_CRAFTSMAN else None
+            batch.append(Order(
+                order_no=f"IX{i:08d}", name=f"Index order {i}", reference_no=f"IXR{i:08d}", branch_code=f"IXB{i:08d}",
+                due_date=today + timedelta(days=random.randint(-60, 60)), state='draft', status=status,
+                product="Ring", design="D", vendor_design="V", bp_code=random.choice(partners), craftsman=craftsman,
+                rejected_by=random.choice(partners) if status == 'rejected' else None,
+            ))
+            if len(batch) == 5000:
+                Order.objects.bulk_create(batch)
+                batch = []
+        Order.objects.bulk_create(batch)
@@ -0,0 +1,74 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection
+from django.utils import timezone
+
+from order.models import Order
+
+
+class Command(BaseCommand):
+    help = "Create orders from many threads at once and report order number throughput and collisions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--orders', type=int, default=50, help="Orders created per thread.")
+        parser.add_argument('--keep', action='store_true', help="Keep the created orders instead of deleting them.")
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        per_thread = options['orders']
+        created_ids = []
+        failures = []
+        lock = threading.Lock()
+        start_gate = threading.Barrier(threads)
+        due_date = timezone.localdate() + timedelta(days=30)
+
+        def worker():
+            ids, errors = [], []
+            start_gate.wait()
+            try:
+                for _ in range(per_thread):
+                    token = uuid.uuid4().hex
+                    try:
+                        order = Order.objects.create(
+                            name="Benchmark order",
+                            reference_no=f"BR{token[:18]}",
+                            branch_code=f"B{token[18:27]}",
+                            due_date=due_date,
+                            state='draft',
+                            product="Benchmark",
+                            design="Benchmark",
+                            vendor_design="Benchmark",
+                        )
+                        ids.append(order.id)
+                    except IntegrityError as e:
+                        errors.append(str(e))
+            finally:
+                connection.close()
+            with lock:
+                created_ids.extend(ids)
+                failures.extend(errors)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        order_nos = list(Order.objects.filter(id__in=created_ids).values_list('order_no', flat=True))
+        duplicates = len(order_nos) - len(set(order_nos))
+
+        self.stdout.write(f"threads={threads} orders/thread={per_thread}")
+        self.stdout.write(f"created={len(created_ids)} failed={len(failures)} duplicate order numbers={duplicates}")
+        self.stdout.write(f"elapsed={elapsed:.2f}s throughput={len(created_ids) / elapsed:.0f} orders/s")
+        for error in failures[:5]:
+            self.stdout.write(self.style.WARNING(error))
+
+        if not options['keep']:
+            Order.objects.filter(id__in=created_ids).delete()
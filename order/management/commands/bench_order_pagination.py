@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from order.models import Order
+from order.pagination import OrderCursorPagination
+from order.serializers import OrderSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serializing a whole order list with keyset pages. "
+        "Test orders are inserted in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--limit', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        limit = options['limit']
+        factory = APIRequestFactory()
+
+        with transaction.atomic():
+            self.create_orders(rows)
+
+            started = time.perf_counter()
+            OrderSerializer(Order.objects.all(), many=True).data
+            full_list = time.perf_counter() - started
+
+            started = time.perf_counter()
+            OrderSerializer(Order.objects.order_by('-created_at', '-id')[rows - limit:rows], many=True).data
+            deep_offset = time.perf_counter() - started
+
+            paginator = OrderCursorPagination()
+            request = Request(factory.get('/orders/list', {'limit': limit}))
+            started = time.perf_counter()
+            OrderSerializer(paginator.paginate_queryset(Order.objects.all(), request), many=True).data
+            first_page = time.perf_counter() - started
+
+            deep_row = Order.objects.order_by('-created_at', '-id')[rows - limit - 1]
+            cursor = OrderCursorPagination.encode_cursor(deep_row)
+            request = Request(factory.get('/orders/list', {'limit': limit, 'cursor': cursor}))
+            started = time.perf_counter()
+            OrderSerializer(paginator.paginate_queryset(Order.objects.all(), request), many=True).data
+            deep_page = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"rows={rows} limit={limit}")
+        self.stdout.write(f"before: whole list            {full_list * 1000:10.1f} ms")
+        self.stdout.write(f"offset: last page             {deep_offset * 1000:10.1f} ms")
+        self.stdout.write(f"after:  first cursor page     {first_page * 1000:10.1f} ms")
+        self.stdout.write(f"after:  last cursor page      {deep_page * 1000:10.1f} ms")
+
+    def create_orders(self, rows):
+        due_date = timezone.localdate() + timedelta(days=30)
+        batch = []
+        for i in range(rows):
+            batch.append(Order(
+                order_no=f"BN{i:08d}",
+                name=f"Benchmark order {i}",
+                reference_no=f"BR{i:08d}",
+                branch_code=f"BB{i:08d}",
+                due_date=due_date,
+                state='draft',
+                status='in-process' if i % 3 else 'new',
+                product="Benchmark",
+                design="Benchmark",
+                vendor_design="Benchmark",
+                narration="Benchmark narration " * 10,
+            ))
+            if len(batch) == 5000:
+                Order.objects.bulk_create(batch)
+                batch = []
+        Order.objects.bulk_create(batch)
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from order.counters import count_loads, count_orders
+from order.models import CraftsmanLoad, OrderStatusCounter
+
+
+class Command(BaseCommand):
+    help = "Recount orders per status, craftsman and bp_code and rebuild the status counters and craftsman loads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report drift, do not rewrite the counters.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            actual = count_orders()
+            stored = {
+                (row.status, row.craftsman_key, row.bp_code_key): row.count
+                for row in OrderStatusCounter.objects.select_for_update()
+            }
+            drift = {
+                key: (stored.get(key, 0), actual.get(key, 0))
+                for key in set(actual) | set(stored)
+                if stored.get(key, 0) != actual.get(key, 0)
+            }
+            actual_loads = count_loads(actual)
+            load_drift = {
+                craftsman_id: (open_orders, actual_loads.get(craftsman_id, 0))
+                for craftsman_id, open_orders in CraftsmanLoad.objects.select_for_update().values_list('craftsman_id', 'open_orders')
+                if open_orders != actual_loads.get(craftsman_id, 0)
+            }
+
+            for (status, craftsman_key, bp_code_key), (was, should_be) in sorted(drift.items()):
+                self.stdout.write(
+                    f"status={status} craftsman={craftsman_key} bp_code={bp_code_key}: counter={was} orders={should_be}")
+            for craftsman_id, (was, should_be) in sorted(load_drift.items()):
+                self.stdout.write(f"craftsman={craftsman_id}: load={was} open orders={should_be}")
+
+            if options['check']:
+                if drift or load_drift:
+                    raise CommandError(f"{len(drift) + len(load_drift)} counter(s) drifted from the order table.")
+                self.stdout.write(self.style.SUCCESS("Order counters match the order table."))
+                return
+
+            OrderStatusCounter.objects.all().delete()
+            OrderStatusCounter.objects.bulk_create([
+                OrderStatusCounter(status=status, craftsman_key=craftsman_key, bp_code_key=bp_code_key, count=count)
+                for (status, craftsman_key, bp_code_key), count in actual.items()
+            ])
+            for craftsman_id, (was, should_be) in load_drift.items():
+                CraftsmanLoad.objects.filter(craftsman_id=craftsman_id).update(open_orders=should_be)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(actual)} counters ({len(drift)} had drifted, {len(load_drift)} craftsman loads fixed)."))
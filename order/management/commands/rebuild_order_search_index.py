@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from order.models import Order
+from order.search import SEARCH_FIELDS, index_order
+
+
+class Command(BaseCommand):
+    help = "Index every order for orders/search (new and edited orders are indexed on save)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        orders = Order.objects.only('id', *SEARCH_FIELDS).order_by('id')
+        indexed = 0
+        for order in orders.iterator(chunk_size=options['chunk_size']):
+            index_order(order)
+            indexed += 1
+            if indexed % 10000 == 0:
+                self.stdout.write(f"{indexed} orders indexed")
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} orders."))
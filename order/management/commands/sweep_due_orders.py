@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from order.sweeper import make_holder, run_sweep
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark open orders that are overdue or due soon and queue notices for "
+        "their craftsmen and key users. Safe to run on several nodes: only the "
+        "one holding the sweep lease does the work."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help="Orders per transaction (default: ORDER_SWEEP_CHUNK_SIZE or 500).")
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping.")
+        parser.add_argument('--sleep', type=float, default=300, help="Seconds between sweeps with --loop.")
+
+    def handle(self, *args, **options):
+        holder = make_holder()
+        while True:
+            swept = run_sweep(holder, chunk_size=options['chunk_size'])
+            if swept is None:
+                self.stdout.write("Another node holds the sweep lease, skipping.")
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{swept['overdue']} overdue, {swept['due-soon']} due soon, {swept['']} cleared"
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
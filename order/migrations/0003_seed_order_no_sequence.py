@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:05
+
+import re
+
+from django.db import migrations
+
+
+def seed_order_no_sequence(apps, schema_editor):
+    """Start the order_no sequence after the highest order number in use."""
+    Order = apps.get_model('order', 'Order')
+    Sequence = apps.get_model('BusinessPartner', 'Sequence')
+
+    highest = 0
+    for order_no in Order.objects.exclude(order_no__isnull=True).values_list('order_no', flat=True).iterator():
+        match = re.fullmatch(r'(?:WR)?(\d+)', order_no)
+        if match:
+            highest = max(highest, int(match.group(1)))
+
+    sequence, created = Sequence.objects.get_or_create(key='order_no', defaults={'last_value': highest})
+    if not created and sequence.last_value < highest:
+        sequence.last_value = highest
+        sequence.save(update_fields=['last_value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0030_sequence'),
+        ('order', '0002_order_rejected_by'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_order_no_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:07
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Order = apps.get_model('order', 'Order')
+    OrderStatusCounter = apps.get_model('order', 'OrderStatusCounter')
+    rows = Order.objects.order_by().values_list('status', 'craftsman_id', 'bp_code_id').annotate(total=Count('id'))
+    OrderStatusCounter.objects.bulk_create([
+        OrderStatusCounter(status=status, craftsman_key=craftsman_id or 0, bp_code_key=bp_code_id or 0, count=total)
+        for status, craftsman_id, bp_code_id, total in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0004_order_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('craftsman_key', models.BigIntegerField(default=0)),
+                ('bp_code_key', models.BigIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['craftsman_key', 'status'], name='order_counter_craftsman_idx'), models.Index(fields=['bp_code_key', 'status'], name='order_counter_bp_idx')],
+                'constraints': [models.UniqueConstraint(fields=('status', 'craftsman_key', 'bp_code_key'), name='order_counter_key_unique')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0005_order_status_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50)),
+                ('weight', models.FloatField(default=0)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='order.order')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'order'), name='order_search_term_unique')],
+            },
+        ),
+    ]
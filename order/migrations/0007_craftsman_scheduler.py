@@ -0,0 +1,88 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+
+OPEN_STATUSES = ('assigned', 'in-process', 'awaiting-approval')
+
+
+def populate_scheduler(apps, schema_editor):
+    BusinessPartner = apps.get_model('BusinessPartner', 'BusinessPartner')
+    Order = apps.get_model('order', 'Order')
+    CraftsmanLoad = apps.get_model('order', 'CraftsmanLoad')
+    CraftsmanSkill = apps.get_model('order', 'CraftsmanSkill')
+    OrderRejection = apps.get_model('order', 'OrderRejection')
+
+    open_orders = dict(
+        Order.objects.filter(status__in=OPEN_STATUSES, craftsman__isnull=False)
+        .order_by().values_list('craftsman_id').annotate(total=Count('id'))
+    )
+    CraftsmanLoad.objects.bulk_create([
+        CraftsmanLoad(
+            craftsman_id=pk, open_orders=open_orders.get(pk, 0),
+            active=status not in ('freezed', 'revoked') and not freezed and not revoked)
+        for pk, status, freezed, revoked in BusinessPartner.objects.filter(role='CRAFTSMAN')
+        .values_list('pk', 'status', 'freezed', 'revoked')
+    ])
+    CraftsmanSkill.objects.bulk_create([
+        CraftsmanSkill(craftsman_id=craftsman_id, category=category, orders=total)
+        for craftsman_id, category, total in Order.objects.filter(craftsman__isnull=False, category__isnull=False)
+        .order_by().values_list('craftsman_id', 'category').annotate(total=Count('id'))
+    ])
+    OrderRejection.objects.bulk_create([
+        OrderRejection(order_id=order_id, craftsman_id=craftsman_id)
+        for order_id, craftsman_id in Order.objects.filter(rejected_by__isnull=False).values_list('id', 'rejected_by_id')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0032_import_job'),
+        ('order', '0006_order_search_term'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CraftsmanLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('open_orders', models.IntegerField(default=0)),
+                ('capacity', models.IntegerField(default=20)),
+                ('active', models.BooleanField(default=True)),
+                ('last_assigned_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('craftsman', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='load', to='BusinessPartner.businesspartner')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('active', True)), fields=['open_orders', 'last_assigned_at', 'craftsman'], name='craftsman_load_idx'), models.Index(condition=models.Q(('active', True)), fields=['last_assigned_at', 'craftsman'], name='craftsman_round_robin_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CraftsmanSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=50)),
+                ('orders', models.IntegerField(default=0)),
+                ('craftsman', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skills', to='BusinessPartner.businesspartner')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'craftsman'), name='craftsman_skill_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderRejection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rejected_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('craftsman', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_rejections', to='BusinessPartner.businesspartner')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rejections', to='order.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'craftsman'], name='order_rejection_idx')],
+            },
+        ),
+        migrations.RunPython(populate_scheduler, migrations.RunPython.noop),
+    ]
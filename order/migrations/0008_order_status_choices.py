@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0007_craftsman_scheduler'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('pending', 'Pending'), ('in-process', 'In Process'), ('verified', 'Verified'), ('admin-rejected', 'Rejected by Admin'), ('assigned', 'Assigned'), ('awaiting-approval', 'Awaiting Approval'), ('complete', 'Complete'), ('completed', 'Completed'), ('accepted', 'Accepted'), ('rejected', 'Rejected')], default='new', max_length=20),
+        ),
+    ]
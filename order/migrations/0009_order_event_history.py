@@ -0,0 +1,63 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_status_changed_at(apps, schema_editor):
+    # No history before this migration; count existing orders' current status from their creation.
+    Order = apps.get_model('order', 'Order')
+    Order.objects.update(status_changed_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0032_import_job'),
+        ('order', '0008_order_status_choices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='status_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='OrderStateDuration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('craftsman_key', models.BigIntegerField(default=0)),
+                ('category', models.CharField(blank=True, max_length=50)),
+                ('orders', models.IntegerField(default=0)),
+                ('total_seconds', models.BigIntegerField(default=0)),
+                ('max_seconds', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('status', 'craftsman_key', 'category'), name='order_state_duration_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ts', models.DateTimeField(default=django.utils.timezone.now)),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('seconds_in_previous', models.BigIntegerField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('craftsman', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='BusinessPartner.businesspartner')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='order.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'ts'], name='order_event_order_ts_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_status_changed_at, migrations.RunPython.noop),
+    ]
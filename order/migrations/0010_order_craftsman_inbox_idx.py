@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0032_import_job'),
+        ('order', '0009_order_event_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['craftsman', 'status', 'due_date', 'id'], name='order_craftsman_inbox_idx'),
+        ),
+    ]
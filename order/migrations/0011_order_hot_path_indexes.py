@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0032_import_job'),
+        ('order', '0010_order_craftsman_inbox_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_craftsman_inbox_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['craftsman', 'status', 'due_date', 'id', 'status_changed_at'], name='order_craftsman_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'due_date', 'id'], name='order_status_due_idx'),
+        ),
+    ]
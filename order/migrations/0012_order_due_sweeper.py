@@ -0,0 +1,55 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:50
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0032_import_job'),
+        ('order', '0011_order_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('holder', models.CharField(max_length=100)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderDueNotice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('due-soon', 'Due Soon'), ('overdue', 'Overdue')], max_length=10)),
+                ('craftsman_key', models.BigIntegerField(default=0)),
+                ('user_key', models.BigIntegerField(default=0)),
+                ('orders', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_status_due_idx',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='due_state',
+            field=models.CharField(blank=True, choices=[('', 'On Time'), ('due-soon', 'Due Soon'), ('overdue', 'Overdue')], default='', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'due_state', 'due_date', 'id'], name='order_status_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderduenotice',
+            constraint=models.UniqueConstraint(condition=models.Q(('sent_at__isnull', True)), fields=('kind', 'craftsman_key', 'user_key'), name='order_due_notice_unsent_unique'),
+        ),
+    ]
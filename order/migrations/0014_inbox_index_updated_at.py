@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0013_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_craftsman_inbox_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['craftsman', 'status', 'due_date', 'id', 'updated_at'], name='order_craftsman_inbox_idx'),
+        ),
+    ]
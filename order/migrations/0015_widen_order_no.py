@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0014_inbox_index_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='order_no',
+            field=models.CharField(blank=True, max_length=30, null=True, unique=True),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from user.models import ResUser  as user
 from django.conf import settings
@@ -8,6 +8,7 @@ from django.contrib.auth.models import AbstractUser, Permission, Group
 from user.models import ResUser
 from SuperAdmin.models import SuperAdmin
 from BusinessPartner.models import BusinessPartner
+from BusinessPartner.sequences import next_value, reserve
 from Users.models import Users
 from django.utils.timezone import now
 from django.conf import settings
@@ -16,6 +17,7 @@ from datetime import date
 from django.utils import timezone
 import pytz
 from django.core.exceptions import ValidationError
+from string import Formatter
 
 
 
@@ -26,12 +28,50 @@ class YourModel(models.Model):
     your_datetime_field = models.DateTimeField(default=now, blank=True, null=True)
 
 
-def get_order_no():
-    last_order = Order.objects.order_by('-id').first()
-    if last_order and last_order.order_no.startswith('WR'):
-        order_number = int(last_order.order_no[2:]) + 1
-        return f"WR{order_number:03d}"
-    return "WR001"
+def _order_no_series(branch_code=None, year=None):
+    """
+    Resolve the ORDER_NO_FORMAT setting (default 'WR{number:03d}') into the
+    format string, the sequence key and the values it needs. Formats using
+    {branch} or {year} get a separate series per branch or per year.
+    Raises ValidationError when the order numbers would not fit the
+    order_no column.
+    """
+    order_no_format = getattr(settings, 'ORDER_NO_FORMAT', 'WR{number:03d}')
+    placeholders = {name for _, name, _, _ in Formatter().parse(order_no_format) if name}
+    key = 'order_no'
+    values = {}
+    if 'branch' in placeholders:
+        values['branch'] = branch_code or ''
+        key += f":{values['branch']}"
+    if 'year' in placeholders:
+        values['year'] = year or timezone.localdate().year
+        key += f":{values['year']}"
+    _format_order_no(order_no_format, 0, values)
+    return order_no_format, key, values
+
+
+def _format_order_no(order_no_format, number, values):
+    order_no = order_no_format.format(number=number, **values)
+    max_length = Order._meta.get_field('order_no').max_length
+    if len(order_no) > max_length:
+        raise ValidationError({'order_no': [
+            f"ORDER_NO_FORMAT gives '{order_no}', longer than the {max_length} characters of an order number."
+        ]})
+    return order_no
+
+
+def get_order_no(branch_code=None):
+    """Allocate the next order number from the order_no sequence."""
+    order_no_format, key, values = _order_no_series(branch_code)
+    number = next_value(key, block_size=getattr(settings, 'ORDER_NO_BLOCK_SIZE', 10))
+    return _format_order_no(order_no_format, number, values)
+
+
+def reserve_order_nos(count, branch_code=None):
+    """Reserve `count` consecutive order numbers at once, e.g. for batch imports."""
+    order_no_format, key, values = _order_no_series(branch_code)
+    first, last = reserve(key, count)
+    return [_format_order_no(order_no_format, number, values) for number in range(first, last + 1)]
 
 def current_user(request):
     current_user = user.objects.get(id=request.user.id)
@@ -61,6 +101,12 @@ class User(AbstractUser):
         blank=True
     )
 
+
+# Statuses of orders a craftsman is working on; they count towards the
+# craftsman's load (see CraftsmanLoad) and can become overdue.
+OPEN_STATUSES = ('assigned', 'in-process', 'awaiting-approval')
+
+
 class Order(models.Model):
     SIZE_CHOICES = [
         ('Large', 'Large'),
@@ -128,12 +174,23 @@ class Order(models.Model):
     ]
     STATUS_CHOICES = [
         ('new', 'New'),
+        ('pending', 'Pending'),
         ('in-process', 'In Process'),
+        ('verified', 'Verified'),
+        ('admin-rejected', 'Rejected by Admin'),
+        ('assigned', 'Assigned'),
         ("awaiting-approval", "Awaiting Approval"),
+        ('complete', 'Complete'),
         ('completed', 'Completed'),
         ('accepted', 'Accepted'),
         ('rejected', 'Rejected'),
     ]
+    # Set by order.sweeper on open orders past or near their due date.
+    DUE_STATE_CHOICES = [
+        ('', 'On Time'),
+        ('due-soon', 'Due Soon'),
+        ('overdue', 'Overdue'),
+    ]
     
     
     user = models.ForeignKey(
@@ -141,16 +198,21 @@ class Order(models.Model):
         on_delete=models.CASCADE, related_name='orders', blank=True, null=True
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new')
+    status_changed_at = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every change, including the queryset updates of order.transitions,
+    # order.scheduler and order.sweeper; detail and list ETags are built from it.
+    updated_at = models.DateTimeField(auto_now=True)
     order_image = models.ImageField(upload_to='order_images/', verbose_name="Add Images", blank=True, null=True)
     # bp_code = models.CharField(max_length=20, unique=True, blank=True, null=True) 
-    order_no = models.CharField(max_length=10, unique=True, blank=True, null=True)
+    order_no = models.CharField(max_length=30, unique=True, blank=True, null=True)
     bp_code = models.ForeignKey(BusinessPartner, on_delete=models.CASCADE, related_name='orders', null=True, blank=True)
     state = models.CharField(max_length=50, choices=[('draft', 'Draft'), ('pending', 'Pending')])
     name = models.CharField(max_length=255)
     reference_no = models.CharField(max_length=20, unique=True)
     order_date = models.DateTimeField(default=timezone.now, editable=False)
     due_date = models.DateField()
+    due_state = models.CharField(max_length=10, choices=DUE_STATE_CHOICES, blank=True, default='', editable=False)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, blank=True, null=True)
     order_type = models.CharField(max_length=10, choices=ORDER_TYPES, default='online')
     quantity = models.CharField(max_length=50, blank=True, null=True)
@@ -193,6 +255,25 @@ class Order(models.Model):
     tolerance_to = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     craftsman = models.ForeignKey(BusinessPartner, null=True, blank=True, on_delete=models.SET_NULL, related_name='assigned_orders')
     rejected_by = models.ForeignKey(BusinessPartner, on_delete=models.SET_NULL, null=True, blank=True, related_name="rejected_orders")
+
+    class Meta:
+        # Each index is checked against the query it serves in OrderIndexPlanTests;
+        # craftsman, bp_code and rejected_by also have their foreign key indexes.
+        indexes = [
+            # Keyset pagination (see order.pagination): newest first, optionally by status or bp_code.
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            models.Index(fields=['bp_code', '-created_at', '-id'], name='order_bp_created_idx'),
+            # Craftsman inbox (OrderInboxView): one craftsman's orders in a status, earliest due
+            # first. updated_at makes it covering for the page keys the ETag is built from.
+            models.Index(fields=['craftsman', 'status', 'due_date', 'id', 'updated_at'], name='order_craftsman_inbox_idx'),
+            # Orders of a status and due state due in a date range, for the overdue sweeper (order.sweeper),
+            # one open status at a time. (A partial index on the open statuses is not used by SQLite
+            # for parameterized IN lists.)
+            models.Index(fields=['status', 'due_state', 'due_date', 'id'], name='order_status_due_idx'),
+            # Newest change, for the list ETag.
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ]
     
     def clean(self):
         super().clean()
@@ -214,7 +295,11 @@ class Order(models.Model):
         if not self.id:  # Only on creation
             ist = pytz.timezone('Asia/Kolkata')  # Indian Standard Time
             self.order_date = timezone.now().astimezone(ist)
-        super().save(*args, **kwargs)
+        if not self.order_no:
+            self.order_no = get_order_no(self.branch_code)
+        # Status counters are updated by the save signals, inside this transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
         
     def __str__(self):
         weight_display = f"{self.weight}{self.weight_unit}" if self.weight and self.weight_unit else "No weight specified"
@@ -242,6 +327,189 @@ class Order(models.Model):
         return f"Order {self.order_no}"
     
     
+class OrderStatusCounter(models.Model):
+    """
+    Number of orders per (status, craftsman, bp_code), kept up to date on
+    every status change so dashboards do not have to count the Order table.
+    The keys hold BusinessPartner ids, 0 when the order has none.
+    """
+    status = models.CharField(max_length=20)
+    craftsman_key = models.BigIntegerField(default=0)
+    bp_code_key = models.BigIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'craftsman_key', 'bp_code_key'], name='order_counter_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['craftsman_key', 'status'], name='order_counter_craftsman_idx'),
+            models.Index(fields=['bp_code_key', 'status'], name='order_counter_bp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.status} - {self.count}"
+
+
+class OrderEvent(models.Model):
+    """
+    Append-only history of status changes: who moved the order, from which
+    status to which, and how long it spent in the old one.
+    Written by order.history, in the transaction that changed the status.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    ts = models.DateTimeField(default=timezone.now)
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20)
+    seconds_in_previous = models.BigIntegerField(null=True, blank=True)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    craftsman = models.ForeignKey(BusinessPartner, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    notes = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'ts'], name='order_event_order_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} {self.from_status} -> {self.to_status}"
+
+
+class OrderStateDuration(models.Model):
+    """
+    Time orders spent in a status, summed per (status, craftsman, category)
+    when they leave it, so bottlenecks can be read without scanning OrderEvent.
+    craftsman_key is the BusinessPartner id, 0 when the order had none.
+    """
+    status = models.CharField(max_length=20)
+    craftsman_key = models.BigIntegerField(default=0)
+    category = models.CharField(max_length=50, blank=True)
+    orders = models.IntegerField(default=0)
+    total_seconds = models.BigIntegerField(default=0)
+    max_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'craftsman_key', 'category'], name='order_state_duration_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.status} - {self.orders}"
+
+
+class OrderSearchTerm(models.Model):
+    """
+    Inverted index for order search: one row per (term, order) with the
+    weighted number of times the term occurs in the order's text fields.
+    Maintained by order.search on every Order save.
+    """
+    term = models.CharField(max_length=50)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'order'], name='order_search_term_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} - {self.order_id}"
+
+
+class CraftsmanLoad(models.Model):
+    """
+    Open orders and capacity per craftsman, used by order.scheduler to pick
+    the next craftsman from an index instead of counting orders.
+    `open_orders` is kept up to date by order.counters on every status change.
+    """
+    craftsman = models.OneToOneField(BusinessPartner, on_delete=models.CASCADE, related_name='load')
+    open_orders = models.IntegerField(default=0)
+    capacity = models.IntegerField(default=20)
+    active = models.BooleanField(default=True)
+    # When the craftsman last got an order, or joined; round-robin goes to the oldest.
+    last_assigned_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['open_orders', 'last_assigned_at', 'craftsman'], condition=models.Q(active=True), name='craftsman_load_idx'),
+            models.Index(fields=['last_assigned_at', 'craftsman'], condition=models.Q(active=True), name='craftsman_round_robin_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.craftsman_id} - {self.open_orders}/{self.capacity}"
+
+
+class OrderRejection(models.Model):
+    """Every time a craftsman turned an order down, so it is not offered to them again."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='rejections')
+    craftsman = models.ForeignKey(BusinessPartner, on_delete=models.CASCADE, related_name='order_rejections')
+    rejected_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'craftsman'], name='order_rejection_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} - {self.craftsman_id}"
+
+
+class CraftsmanSkill(models.Model):
+    """Number of orders of a category assigned to a craftsman, for category affinity."""
+    craftsman = models.ForeignKey(BusinessPartner, on_delete=models.CASCADE, related_name='skills')
+    category = models.CharField(max_length=50)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'craftsman'], name='craftsman_skill_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.craftsman_id} - {self.category}"
+
+
+class OrderDueNotice(models.Model):
+    """
+    Queued reminder to a craftsman or to the key user who raised the orders
+    (Order.user) that some of their orders became overdue or due soon.
+    The sweeper adds to the one unsent notice per recipient and kind, so a
+    recipient gets one message however many orders it covers; whatever
+    delivers the notices sets sent_at. The keys hold BusinessPartner and
+    user ids, 0 for the other kind of recipient.
+    """
+    kind = models.CharField(max_length=10, choices=Order.DUE_STATE_CHOICES[1:])
+    craftsman_key = models.BigIntegerField(default=0)
+    user_key = models.BigIntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'craftsman_key', 'user_key'], condition=models.Q(sent_at__isnull=True),
+                name='order_due_notice_unsent_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} - {self.craftsman_key or self.user_key} - {self.orders}"
+
+
+class Lease(models.Model):
+    """
+    A named lock with an expiry, so periodic jobs that run on several nodes
+    do their work on one at a time. See order.sweeper.acquire_lease.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} - {self.holder}"
+
+
 class Craftsman(models.Model):
     full_name = models.CharField(max_length=100)
     bp_code = models.CharField(max_length=100, null=True, blank=True)
@@ -0,0 +1,125 @@
+import base64
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class OrderCursorPagination(BasePagination):
+    """
+    Keyset pagination for order lists, newest first.
+
+    Pages are located with a WHERE on (created_at, id) instead of an OFFSET,
+    so a deep page costs the same as the first one.
+    - ?limit=    page size, capped at max_limit
+    - ?cursor=   opaque cursor taken from the `next` / `previous` links
+    - ?count=true  also return the total number of matching orders
+
+    Subclasses can page on another column with `position_field`,
+    `descending` and `parse_position`.
+    """
+    position_field = 'created_at'
+    descending = True
+    parse_position = staticmethod(parse_datetime)
+    default_limit = 50
+    max_limit = 200
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+
+        cursor = self.decode_cursor(request)
+        field = self.position_field
+        if cursor is None:
+            reverse = False
+            descending = self.descending
+        else:
+            reverse, position, pk = cursor
+            descending = self.descending != reverse
+            after = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{after}': position}) | Q(**{field: position, f'id__{after}': pk})
+            )
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(prefix + field, prefix + 'id')
+
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+        return Response(response)
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, order, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(order, reverse))
+
+    @classmethod
+    def encode_cursor(cls, order, reverse=False):
+        position = f"{'p' if reverse else 'n'}|{getattr(order, cls.position_field).isoformat()}|{order.pk}"
+        return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            direction, position, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+            position = self.parse_position(position)
+            if direction not in ('n', 'p') or position is None:
+                raise ValueError
+            return direction == 'p', position, int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class DueDateCursorPagination(OrderCursorPagination):
+    """Keyset pagination on (due_date, id), earliest due first."""
+    position_field = 'due_date'
+    descending = False
+    parse_position = staticmethod(parse_date)
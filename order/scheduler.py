@@ -0,0 +1,230 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from BusinessPartner.imports import imported
+from BusinessPartner.models import BusinessPartner
+
+from .counters import counter_key, record_moves
+from .history import StatusChange, record_events
+from .models import CraftsmanLoad, CraftsmanSkill, Order, OrderRejection
+
+
+class AssignmentPolicy:
+    """
+    Picks the craftsman for an order. `candidates` is a CraftsmanLoad
+    queryset of active craftsmen with spare capacity that have not rejected
+    the order; policies only add an ORDER BY that one of the load indexes
+    covers, so a pick reads a few index entries whatever the number of craftsmen.
+    """
+
+    def choose(self, order, candidates):
+        raise NotImplementedError
+
+
+class LeastLoadedPolicy(AssignmentPolicy):
+    """Fewest open orders first; ties go to whoever waited longest for an assignment."""
+
+    def choose(self, order, candidates):
+        return candidates.order_by('open_orders', 'last_assigned_at', 'craftsman_id').first()
+
+
+class RoundRobinPolicy(AssignmentPolicy):
+    """Craftsmen take turns: the one that has waited longest since its last order goes next."""
+
+    def choose(self, order, candidates):
+        return candidates.order_by('last_assigned_at', 'craftsman_id').first()
+
+
+class CategoryAffinityPolicy(LeastLoadedPolicy):
+    """Least loaded among craftsmen who already made this category, otherwise least loaded overall."""
+
+    def choose(self, order, candidates):
+        if order.category:
+            skilled = CraftsmanSkill.objects.filter(category=order.category).values('craftsman_id')
+            choice = super().choose(order, candidates.filter(craftsman_id__in=skilled))
+            if choice is not None:
+                return choice
+        return super().choose(order, candidates)
+
+
+POLICIES = {
+    'least-loaded': 'order.scheduler.LeastLoadedPolicy',
+    'round-robin': 'order.scheduler.RoundRobinPolicy',
+    'category-affinity': 'order.scheduler.CategoryAffinityPolicy',
+}
+
+
+def get_policy(name=None):
+    """
+    Return the assignment policy `name`, or the CRAFTSMAN_ASSIGNMENT_POLICY
+    setting (default 'least-loaded'). Names are looked up in POLICIES and the
+    CRAFTSMAN_ASSIGNMENT_POLICIES setting; anything else is a dotted path.
+    """
+    name = name or getattr(settings, 'CRAFTSMAN_ASSIGNMENT_POLICY', 'least-loaded')
+    policies = {**POLICIES, **getattr(settings, 'CRAFTSMAN_ASSIGNMENT_POLICIES', {})}
+    return import_string(policies.get(name, name))()
+
+
+def available_loads(order):
+    return (
+        CraftsmanLoad.objects.select_related('craftsman')
+        .filter(active=True, open_orders__lt=F('capacity'))
+        .exclude(craftsman_id__in=OrderRejection.objects.filter(order=order).values('craftsman_id'))
+    )
+
+
+def next_craftsman(order, policy=None):
+    """The craftsman the order should go to next, or None when nobody can take it."""
+    load = get_policy(policy).choose(order, available_loads(order))
+    return load.craftsman if load else None
+
+
+def assign(order, craftsman, due_date=None, user=None):
+    """Assign the order to the craftsman. The craftsman's load follows through the status counters."""
+    order._changed_by = user
+    order.craftsman = craftsman
+    order.status = 'assigned'
+    if due_date:
+        order.due_date = due_date
+    order.save()
+    CraftsmanLoad.objects.filter(craftsman=craftsman).update(last_assigned_at=timezone.now())
+    if order.category:
+        record_skills({(craftsman.pk, order.category): 1})
+
+
+def resolve_craftsmen(labels):
+    """
+    Map "CODE-Business Name" labels, as offered by the assignment screen, to
+    craftsmen with one query. Labels that are malformed or match nobody are left out.
+    """
+    wanted = {}
+    for label in labels:
+        code, sep, business_name = label.partition('-')
+        if sep:
+            wanted[label] = (code, business_name.strip().lower())
+    partners = BusinessPartner.objects.filter(role='CRAFTSMAN', bp_code__in={code for code, name in wanted.values()})
+    by_key = {(partner.bp_code, (partner.business_name or '').lower()): partner for partner in partners}
+    return {label: by_key[key] for label, key in wanted.items() if key in by_key}
+
+
+def bulk_assign(assignments, user=None):
+    """
+    Assign many orders at once. `assignments` is a list of dicts with
+    order_no (the order id), bp_code ("CODE-Business Name") and an optional
+    due_date. Craftsmen and orders are each fetched with one query and the
+    orders are updated with one bulk UPDATE, all in one transaction, and
+    the status changes are recorded as done by `user`. Returns a result dict per assignment, in the same order.
+    """
+    craftsmen = resolve_craftsmen({item['bp_code'] for item in assignments})
+    now = timezone.now()
+    today = now.date()
+
+    with transaction.atomic():
+        orders = Order.objects.select_for_update().only(
+            'id', 'status', 'status_changed_at', 'craftsman_id', 'bp_code_id', 'due_date', 'category',
+        )
+        orders = orders.in_bulk({item['order_no'] for item in assignments})
+        results, updated, moves, changes, seen = [], [], [], [], set()
+        for item in assignments:
+            order_id, label, due_date = item['order_no'], item['bp_code'], item.get('due_date')
+            order, craftsman = orders.get(order_id), craftsmen.get(label)
+            error = None
+            if order is None:
+                error = f"Order {order_id} not found."
+            elif order_id in seen:
+                error = f"Order {order_id} is listed more than once."
+            elif craftsman is None:
+                error = f"No CRAFTSMAN found for '{label}'."
+            elif due_date and due_date <= today:
+                error = "Due date must be in the future"
+            if error:
+                results.append({"order_no": order_id, "status": "error", "message": error})
+                continue
+
+            seen.add(order_id)
+            old_key = counter_key(order.status, order.craftsman_id, order.bp_code_id)
+            if order.status != 'assigned':
+                changes.append(StatusChange(
+                    order_id, order.status, 'assigned', order.status_changed_at, order.craftsman_id, craftsman.pk, order.category,
+                ))
+                order.status_changed_at = now
+            elif order.craftsman_id != craftsman.pk:
+                changes.append(StatusChange(order_id, 'assigned', 'assigned', None, order.craftsman_id, craftsman.pk, order.category))
+            order.craftsman, order.status, order.updated_at = craftsman, 'assigned', now
+            if due_date:
+                order.due_date = due_date
+            moves.append((old_key, counter_key(order.status, craftsman.pk, order.bp_code_id)))
+            updated.append(order)
+            results.append({
+                "order_no": order_id,
+                "status": "success",
+                "message": f"Order {order_id} assigned to {craftsman.full_name}",
+                "due_date": order.due_date.strftime('%Y-%m-%d') if order.due_date else None,
+            })
+
+        if updated:
+            Order.objects.bulk_update(updated, ['craftsman', 'status', 'status_changed_at', 'due_date', 'updated_at'])
+            record_moves(moves)
+            record_events(changes, user, ts=now)
+            CraftsmanLoad.objects.filter(craftsman_id__in={order.craftsman_id for order in updated}).update(
+                last_assigned_at=now)
+            skills = Counter((order.craftsman_id, order.category) for order in updated if order.category)
+            if skills:
+                record_skills(skills)
+    return results
+
+
+def record_skills(assignments):
+    """Add {(craftsman id, category): orders} to the craftsmen's category history."""
+    existing = {
+        (skill.craftsman_id, skill.category): skill
+        for skill in CraftsmanSkill.objects.filter(
+            craftsman_id__in={craftsman_id for craftsman_id, category in assignments},
+            category__in={category for craftsman_id, category in assignments},
+        )
+    }
+    for key, orders in assignments.items():
+        if key in existing:
+            CraftsmanSkill.objects.filter(pk=existing[key].pk).update(orders=F('orders') + orders)
+    CraftsmanSkill.objects.bulk_create(
+        [
+            CraftsmanSkill(craftsman_id=craftsman_id, category=category, orders=orders)
+            for (craftsman_id, category), orders in assignments.items()
+            if (craftsman_id, category) not in existing
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def record_rejection(order, craftsman):
+    OrderRejection.objects.create(order=order, craftsman=craftsman)
+
+
+def is_schedulable(partner):
+    return partner.role == 'CRAFTSMAN' and partner.status not in ('freezed', 'revoked') and not partner.freezed and not partner.revoked
+
+
+@receiver(post_save, sender=BusinessPartner)
+def sync_craftsman_load(sender, instance, created, **kwargs):
+    active = is_schedulable(instance)
+    if created:
+        if active:
+            CraftsmanLoad.objects.get_or_create(craftsman=instance)
+        return
+    if not CraftsmanLoad.objects.filter(craftsman=instance).update(active=active) and active:
+        CraftsmanLoad.objects.get_or_create(craftsman=instance)
+
+
+@receiver(imported, sender=BusinessPartner)
+def create_imported_craftsman_loads(sender, instances, **kwargs):
+    CraftsmanLoad.objects.bulk_create(
+        [CraftsmanLoad(craftsman=partner) for partner in instances if is_schedulable(partner)],
+        ignore_conflicts=True,
+    )
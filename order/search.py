@@ -0,0 +1,88 @@
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Order, OrderSearchTerm
+
+
+# Searchable fields and how much a match in each counts towards the rank.
+SEARCH_FIELDS = {
+    'reference_no': 5.0,
+    'name': 3.0,
+    'product': 2.0,
+    'design': 2.0,
+    'vendor_design': 2.0,
+    'collection': 1.5,
+    'theme': 1.5,
+    'narration': 1.0,
+    'description': 1.0,
+}
+
+TOKEN_RE = re.compile(r'[0-9a-z]+')
+MAX_TERM_LENGTH = 50
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower()) if len(token) > 1]
+
+
+def order_terms(order):
+    """Return {term: weight} for an order's searchable fields."""
+    weights = Counter()
+    for field, field_weight in SEARCH_FIELDS.items():
+        for token in tokenize(getattr(order, field)):
+            weights[token] += field_weight
+    return dict(weights)
+
+
+def index_order(order):
+    """Bring the order's search terms up to date; a no-op when nothing changed."""
+    terms = order_terms(order)
+    existing = dict(OrderSearchTerm.objects.filter(order=order).values_list('term', 'weight'))
+    if existing == terms:
+        return
+    with transaction.atomic():
+        OrderSearchTerm.objects.filter(order=order).delete()
+        OrderSearchTerm.objects.bulk_create([
+            OrderSearchTerm(term=term, order=order, weight=weight) for term, weight in terms.items()
+        ])
+
+
+def index_new_orders(orders):
+    """Index orders that have no search terms yet (e.g. just bulk created) in one insert."""
+    OrderSearchTerm.objects.bulk_create([
+        OrderSearchTerm(term=term, order=order, weight=weight)
+        for order in orders
+        for term, weight in order_terms(order).items()
+    ])
+
+
+def search_orders(query, offset=0, limit=20):
+    """
+    Return ([(order_id, score), ...], has_more) for orders containing every
+    term of `query`, best match first.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return [], False
+    matches = (
+        OrderSearchTerm.objects.filter(term__in=terms)
+        .values('order_id')
+        .annotate(score=Sum('weight'), hits=Count('term'))
+        .filter(hits=len(terms))
+        .order_by('-score', '-order_id')
+        .values_list('order_id', 'score')
+    )
+    rows = list(matches[offset:offset + limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+@receiver(post_save, sender=Order)
+def index_order_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(SEARCH_FIELDS) & set(update_fields):
+        return
+    index_order(instance)
@@ -1,8 +1,11 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
 import pytz
 from rest_framework import serializers
 from SuperAdmin.models import SuperAdmin
-from .models import Order
+from .models import Order, OrderEvent, get_order_no
+from .transitions import BULK_TRANSITIONS
+from BusinessPartner.fieldsets import SparseFieldsetMixin
 from BusinessPartner.models import BusinessPartner
 from user.models import ResUser, BusinessPartner  
 from django.db.models.signals import post_save
@@ -11,7 +14,7 @@ from datetime import timedelta
 from datetime import date
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer class for the Order model.
     """
@@ -37,6 +40,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'console_id', 'tolerance_from', 'tolerance_to'
         ]
         read_only_fields = ['order_no', 'order_date'] 
+        sparse_field_sources = {'order_date': ['order_date']}
 
     def create(self, validated_data):
         if 'bp_code' not in validated_data:
@@ -46,7 +50,7 @@ class OrderSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Modify the output representation to include business_name with bp_code."""
         data = super().to_representation(instance)
-        if instance.bp_code:
+        if 'bp_code' in data and instance.bp_code:
             data['bp_code'] = f"{instance.bp_code.bp_code}-{instance.bp_code.business_name}"
         return data
     
@@ -69,19 +73,10 @@ class OrderSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         if 'bp_code' not in validated_data:
             raise serializers.ValidationError({"bp_code": "This field is required."})
-        last_order = Order.objects.all().order_by('id').last()
-        
-        if not last_order:
-            new_order_no = '001'
-        else:
-            try:
-                last_number = int(last_order.order_no)
-                new_number = last_number + 1
-                new_order_no = f"{new_number:02d}"
-            except (ValueError, AttributeError):
-                new_order_no = f"{Order.objects.count() + 1:02d}"
-        
-        validated_data['order_no'] = new_order_no
+        try:
+            validated_data['order_no'] = get_order_no(validated_data.get('branch_code'))
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.message_dict)
         return super().create(validated_data)
     
 
@@ -147,6 +142,31 @@ class OrderActionSerializer(serializers.Serializer):
     order_no = serializers.CharField()
     action = serializers.ChoiceField(choices=["accept", "reject"])
 
+
+class OrderTransitionSerializer(serializers.Serializer):
+    """Ids of the orders to move and the transition to apply (see order.transitions)."""
+    order_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    transition = serializers.ChoiceField(choices=BULK_TRANSITIONS)
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    actor = serializers.CharField(source='actor.username', default=None, read_only=True)
+    craftsman = serializers.CharField(source='craftsman.bp_code', default=None, read_only=True)
+
+    class Meta:
+        model = OrderEvent
+        fields = ['ts', 'from_status', 'to_status', 'seconds_in_previous', 'actor', 'craftsman', 'notes']
+
+
+class OrderAssignmentItemSerializer(serializers.Serializer):
+    order_no = serializers.IntegerField()
+    bp_code = serializers.CharField()
+    due_date = serializers.DateField(required=False)
+
+
+class OrderBatchAssignmentSerializer(serializers.Serializer):
+    """Orders to assign in one go; each item is checked when the batch is applied (see scheduler.bulk_assign)."""
+    assignments = serializers.ListField(child=OrderAssignmentItemSerializer(), allow_empty=False, max_length=1000)
+
 class OrderCraftsmanSerializer(serializers.ModelSerializer):
     """Serializer for listing all orders."""
     craftsman = CraftsmanSerializer(read_only=True)
@@ -304,7 +324,7 @@ class OrderRejectSerializer(serializers.ModelSerializer):
 def assign_bp_code_to_orders(sender, instance, created, **kwargs):
     """Assign user's bp_code to their orders when a new user is created."""
     if created and instance.bp_code:
-        Order.objects.filter(user=instance).update(bp_code=instance.bp_code)
+        Order.objects.filter(user=instance).update(bp_code=instance.bp_code, updated_at=timezone.now())
         
         
 @receiver(post_save, sender=Order)
@@ -0,0 +1,152 @@
+import os
+import socket
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OPEN_STATUSES, Lease, Order, OrderDueNotice
+
+
+SWEEP_CHUNK_SIZE = 500
+SWEEP_LEASE = 'order-due-sweep'
+
+
+def make_holder():
+    """A lease holder name unique to this process."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(name, holder, seconds):
+    """
+    Take the lease `name` for `seconds`, or extend it when `holder` already
+    has it. Returns False while another holder's lease has not expired.
+    The row is claimed with a conditional UPDATE and created at most once,
+    so any number of nodes can race for it.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=seconds)
+    claimable = Lease.objects.filter(Q(holder=holder) | Q(expires_at__lte=now), name=name)
+    if claimable.update(holder=holder, expires_at=expires_at):
+        return True
+    try:
+        with transaction.atomic():
+            Lease.objects.create(name=name, holder=holder, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        return False
+
+
+def release_lease(name, holder):
+    Lease.objects.filter(name=name, holder=holder).update(expires_at=timezone.now())
+
+
+def sweep_ranges(today, soon):
+    """
+    Yield (orders, new due_state) for every group of orders whose due_state
+    is out of date on `today`, with due soon meaning due by `soon`. Each
+    group is a single range of order_status_due_idx, and the orders leave
+    it once updated. Stale marks are cleared first, so a rescheduled order
+    is marked again in the same sweep.
+    """
+    for status in dict(Order.STATUS_CHOICES):
+        orders = Order.objects.filter(status=status)
+        if status not in OPEN_STATUSES:
+            yield orders.filter(due_state='overdue'), ''
+            yield orders.filter(due_state='due-soon'), ''
+            continue
+        yield orders.filter(due_state='overdue', due_date__gte=today), ''
+        yield orders.filter(due_state='due-soon', due_date__gt=soon), ''
+    for status in OPEN_STATUSES:
+        orders = Order.objects.filter(status=status)
+        yield orders.filter(due_state='', due_date__lt=today), 'overdue'
+        yield orders.filter(due_state='due-soon', due_date__lt=today), 'overdue'
+        yield orders.filter(due_state='', due_date__gte=today, due_date__lte=soon), 'due-soon'
+
+
+def sweep(today=None, chunk_size=None, renew=None):
+    """
+    Bring the due_state of every order up to date and queue a notice for
+    the craftsmen and key users of the orders that became overdue or due
+    soon (ORDER_DUE_SOON_DAYS, default 2). Works through index ranges in
+    chunks of ORDER_SWEEP_CHUNK_SIZE orders, one transaction each, so memory
+    use does not grow with the table. `renew` is called before each chunk;
+    the sweep stops when it returns False.
+    Returns a Counter of orders per new due_state ('' for cleared marks).
+    """
+    # Same basis as the due date validators of the order serializers and importers.
+    today = today or timezone.now().date()
+    soon = today + timedelta(days=getattr(settings, 'ORDER_DUE_SOON_DAYS', 2))
+    chunk_size = chunk_size or getattr(settings, 'ORDER_SWEEP_CHUNK_SIZE', SWEEP_CHUNK_SIZE)
+    swept = Counter()
+    for orders, due_state in sweep_ranges(today, soon):
+        while True:
+            if renew is not None and not renew():
+                return swept
+            count = sweep_chunk(orders, due_state, chunk_size)
+            swept[due_state] += count
+            if count < chunk_size:
+                break
+    return swept
+
+
+def sweep_chunk(orders, due_state, chunk_size):
+    with transaction.atomic():
+        rows = list(
+            orders.select_for_update().order_by('due_date', 'id').values_list('id', 'craftsman_id', 'user_id')[:chunk_size]
+        )
+        if rows:
+            # The rows are locked; by primary key only, as the planner would otherwise walk the range again.
+            Order.objects.filter(pk__in=[pk for pk, craftsman_id, user_id in rows]).update(due_state=due_state, updated_at=timezone.now())
+            if due_state:
+                queue_notices(due_state, rows)
+    return len(rows)
+
+
+def queue_notices(kind, rows):
+    """
+    Add (order id, craftsman id, user id) rows to the unsent notices of
+    their recipients: one query finds the notices already queued, which are
+    incremented with one UPDATE per distinct number of new orders, and the
+    rest are inserted at once. Relies on the sweep lease for there being a
+    single writer of new notices.
+    """
+    recipients = Counter()
+    for pk, craftsman_id, user_id in rows:
+        if craftsman_id:
+            recipients[(craftsman_id, 0)] += 1
+        if user_id:
+            recipients[(0, user_id)] += 1
+    craftsman_keys = {craftsman_key for craftsman_key, user_key in recipients if craftsman_key}
+    user_keys = {user_key for craftsman_key, user_key in recipients if user_key}
+    queued = OrderDueNotice.objects.filter(kind=kind, sent_at__isnull=True).filter(
+        Q(craftsman_key__in=craftsman_keys, user_key=0) | Q(craftsman_key=0, user_key__in=user_keys)
+    )
+    increments = defaultdict(list)
+    for pk, craftsman_key, user_key in queued.values_list('pk', 'craftsman_key', 'user_key'):
+        increments[recipients.pop((craftsman_key, user_key))].append(pk)
+    for orders, pks in increments.items():
+        OrderDueNotice.objects.filter(pk__in=pks, sent_at__isnull=True).update(orders=F('orders') + orders)
+    OrderDueNotice.objects.bulk_create([
+        OrderDueNotice(kind=kind, craftsman_key=craftsman_key, user_key=user_key, orders=orders)
+        for (craftsman_key, user_key), orders in recipients.items()
+    ], batch_size=SWEEP_CHUNK_SIZE)
+
+
+def run_sweep(holder=None, today=None, chunk_size=None):
+    """
+    Sweep while holding the sweep lease (ORDER_SWEEP_LEASE_SECONDS, default
+    300, renewed before every chunk). Returns None when another node holds it.
+    """
+    holder = holder or make_holder()
+    seconds = getattr(settings, 'ORDER_SWEEP_LEASE_SECONDS', 300)
+    if not acquire_lease(SWEEP_LEASE, holder, seconds):
+        return None
+    try:
+        return sweep(today, chunk_size, renew=lambda: acquire_lease(SWEEP_LEASE, holder, seconds))
+    finally:
+        release_lease(SWEEP_LEASE, holder)
@@ -0,0 +1,922 @@
+import asyncio
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from BusinessPartner.fieldsets import apply_sparse_fields
+from BusinessPartner.imports import run_job
+from BusinessPartner.models import BusinessPartner
+from BusinessPartner.tests import ImportTestCase
+from .counters import count_orders, summarize
+from .feed import get_broker
+from .models import OPEN_STATUSES, CraftsmanLoad, Order, OrderDueNotice, OrderEvent, OrderRejection, OrderSearchTerm, OrderStatusCounter, get_order_no, reserve_order_nos
+from .history import status_changed
+from .scheduler import assign, bulk_assign, next_craftsman
+from .serializers import OrderSerializer
+from .sweeper import SWEEP_LEASE, acquire_lease, run_sweep, sweep_ranges
+from .transitions import TransitionError, apply_transition, bulk_transition, order_transitioned
+
+
+def make_order(number, **kwargs):
+    fields = {
+        'name': f"Order {number}",
+        'reference_no': f"REF{number}",
+        'branch_code': f"BR{number}",
+        'due_date': timezone.localdate() + timedelta(days=7),
+        'state': 'draft',
+        'product': "Ring",
+        'design': "D1",
+        'vendor_design': "V1",
+    }
+    fields.update(kwargs)
+    return Order.objects.create(**fields)
+
+
+class OrderNumberTests(TestCase):
+    def test_orders_are_numbered_from_sequence(self):
+        first = make_order(1)
+        second = make_order(2)
+        self.assertEqual(first.order_no, 'WR001')
+        self.assertEqual(second.order_no, 'WR002')
+
+    def test_reserve_order_nos_returns_consecutive_numbers(self):
+        get_order_no()
+        self.assertEqual(reserve_order_nos(3), ['WR002', 'WR003', 'WR004'])
+
+    @override_settings(ORDER_NO_FORMAT='W{year}{number:04d}')
+    def test_per_year_series(self):
+        year = timezone.localdate().year
+        self.assertEqual(get_order_no(), f"W{year}0001")
+
+    @override_settings(ORDER_NO_FORMAT='{branch}{number:03d}')
+    def test_per_branch_series(self):
+        self.assertEqual(get_order_no('CH'), 'CH001')
+        self.assertEqual(get_order_no('MU'), 'MU001')
+        self.assertEqual(get_order_no('CH'), 'CH002')
+
+    @override_settings(ORDER_NO_FORMAT='{branch}-{year}-{number:05d}')
+    def test_long_branch_codes_fit(self):
+        year = timezone.localdate().year
+        self.assertEqual(get_order_no('CHENNAI-01'), f"CHENNAI-01-{year}-00001")
+
+    @override_settings(ORDER_NO_FORMAT='ORDER-{branch}-{year}-{number:010d}')
+    def test_formats_too_long_for_the_column_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            get_order_no('CHENNAI-01')
+        with self.assertRaises(ValidationError):
+            reserve_order_nos(2, 'CHENNAI-01')
+
+
+class OrderPaginationTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username='staff', password='pass', role_name='Admin')
+        self.client.force_login(self.user)
+        self.orders = [make_order(i) for i in range(7)]
+
+    def test_pages_walk_every_order_once(self):
+        seen = []
+        url = '/orders/list?limit=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(row['order_no'] for row in response.data['results'])
+            url = response.data['next']
+        expected = [order.order_no for order in sorted(self.orders, key=lambda o: (o.created_at, o.id), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_to_earlier_page(self):
+        first = self.client.get('/orders/list?limit=3')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_limit_is_capped_and_count_is_optional(self):
+        response = self.client.get('/orders/list?limit=100000')
+        self.assertEqual(len(response.data['results']), 7)
+        self.assertNotIn('count', response.data)
+        response = self.client.get('/orders/list?count=true')
+        self.assertEqual(response.data['count'], 7)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/orders/list?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.client.force_login(user_model.objects.create_user(username='staff', password='pass', role_name='Admin'))
+        self.order = make_order(1, narration="long text")
+
+    def test_fields_limits_output_and_columns(self):
+        response = self.client.get(f'/orders/detail/{self.order.order_no}/?fields=order_no,name,order_date')
+        self.assertEqual(set(response.data), {'order_no', 'name', 'order_date'})
+
+        request = Request(APIRequestFactory().get('/orders/list', {'fields': 'order_no,name'}))
+        projected = apply_sparse_fields(Order.objects.all(), OrderSerializer, request)
+        self.assertEqual(projected.query.deferred_loading, ({'order_no', 'name'}, False))
+
+    def test_exclude_drops_fields(self):
+        response = self.client.get('/orders/list?exclude=narration,description')
+        row = response.data['results'][0]
+        self.assertNotIn('narration', row)
+        self.assertIn('order_no', row)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/orders/list?fields=order_no,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+
+class ListQueryCountTests(TestCase):
+    """Each list endpoint runs a fixed number of queries, whatever the row count."""
+
+    endpoints = [
+        '/orders/list',
+        '/orders/create',
+        '/orders/new-orders/',
+        '/orders/assigned-orders/',
+        '/orders/in-process/',
+        '/orders/completed/',
+    ]
+
+    def setUp(self):
+        user_model = get_user_model()
+        self.client.force_login(user_model.objects.create_user(
+            username='staff', password='pass', role_name='Admin', is_staff=True))
+        self.buyer = BusinessPartner.objects.create(
+            role='BUYER', bp_code='BA001', term='T1', business_name="Aurum", full_name="Buyer",
+            mobile='9000000001', email='buyer@example.com', pincode='600001', city='Chennai', state='Tamil Nadu')
+        self.craftsman = BusinessPartner.objects.create(
+            role='CRAFTSMAN', bp_code='AK001', term='T1', business_name="Kanak", full_name="Craftsman",
+            mobile='9000000002', email='craftsman@example.com', pincode='600001', city='Chennai', state='Tamil Nadu')
+        self.count = 0
+
+    def add_orders(self, count):
+        for status in ['in-process', 'complete']:
+            for _ in range(count):
+                self.count += 1
+                make_order(self.count, status=status, bp_code=self.buyer, craftsman=self.craftsman)
+
+    def query_counts(self):
+        counts = {}
+        for url in self.endpoints:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[url] = len(queries)
+        return counts
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_orders(1)
+        single = self.query_counts()
+        self.add_orders(10)
+        self.assertEqual(self.query_counts(), single)
+
+
+class OrderCounterTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.client.force_login(user_model.objects.create_user(username='staff', password='pass', role_name='Admin'))
+        self.craftsman = BusinessPartner.objects.create(
+            role='CRAFTSMAN', bp_code='AK001', term='T1', business_name="Kanak", full_name="Craftsman",
+            mobile='9000000002', email='craftsman@example.com', pincode='600001', city='Chennai', state='Tamil Nadu')
+
+    def test_counters_follow_status_changes(self):
+        first = make_order(1)
+        second = make_order(2, status='in-process')
+        first.status = 'in-process'
+        first.craftsman = self.craftsman
+        first.save()
+        second.delete()
+
+        self.assertEqual(count_orders(), {('in-process', self.craftsman.id, 0): 1})
+        summary = self.client.get('/orders/summary').data
+        self.assertEqual(summary['statuses'], {'in-process': {'total': 1, 'assigned': 1}})
+        self.assertEqual(summary['total'], 1)
+
+    def test_deleting_a_craftsman_moves_its_counters(self):
+        make_order(1, status='assigned', craftsman=self.craftsman)
+        make_order(2, status='in-process', craftsman=self.craftsman)
+        make_order(3)
+        self.craftsman.delete()
+
+        self.assertEqual(count_orders(), {
+            (row.status, row.craftsman_key, row.bp_code_key): row.count
+            for row in OrderStatusCounter.objects.filter(count__gt=0)
+        })
+        self.assertEqual(self.client.get('/orders/summary').data['assigned'], 0)
+        self.assertFalse(CraftsmanLoad.objects.exists())
+
+    def test_summary_filters_by_craftsman(self):
+        make_order(1, craftsman=self.craftsman)
+        make_order(2)
+        response = self.client.get('/orders/summary?craftsman=AK001')
+        self.assertEqual(response.data['total'], 1)
+
+    def test_rebuild_command_repairs_drift(self):
+        make_order(1)
+        OrderStatusCounter.objects.update(count=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_order_counters', '--check', stdout=StringIO())
+        call_command('rebuild_order_counters', stdout=StringIO())
+        call_command('rebuild_order_counters', '--check', stdout=StringIO())
+
+
+class OrderSearchTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.client.force_login(user_model.objects.create_user(username='staff', password='pass', role_name='Admin'))
+        self.ring = make_order(1, name="Gold ring", product="Ring", theme="Floral")
+        self.chain = make_order(2, name="Gold chain", product="Chain", narration="Matching ring set")
+        self.bangle = make_order(3, name="Silver bangle", product="Bangle")
+
+    def search(self, query, **params):
+        response = self.client.get('/orders/search', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['order_no'] for row in response.data['results']]
+
+    def test_all_words_must_match_and_results_are_ranked(self):
+        self.assertEqual(self.search("gold ring"), [self.ring.order_no, self.chain.order_no])
+        self.assertEqual(self.search("silver"), [self.bangle.order_no])
+        self.assertEqual(self.search("platinum"), [])
+
+    def test_index_follows_edits(self):
+        self.bangle.theme = "Floral gold"
+        self.bangle.save()
+        self.assertIn(self.bangle.order_no, self.search("floral"))
+        self.ring.theme = ""
+        self.ring.save()
+        self.assertNotIn(self.ring.order_no, self.search("floral"))
+
+    def test_paging(self):
+        first = self.client.get('/orders/search', {'q': 'gold', 'limit': 1}).data
+        self.assertEqual(len(first['results']), 1)
+        self.assertEqual(first['next_page'], 2)
+        second = self.client.get('/orders/search', {'q': 'gold', 'limit': 1, 'page': 2}).data
+        self.assertIsNone(second['next_page'])
+        self.assertNotEqual(first['results'][0]['order_no'], second['results'][0]['order_no'])
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.client.force_login(user_model.objects.create_user(username='staff', password='pass', role_name='Admin'))
+        make_order(1, status='new')
+        make_order(2, status='in-process', narration="Line one, with comma")
+
+    def read_csv(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(StringIO(content)))
+
+    def test_export_streams_selected_columns_with_filters(self):
+        rows = self.read_csv(self.client.get('/orders/export', {'columns': 'order_no,status,narration', 'status': 'in-process'}))
+        self.assertEqual(rows, [['order_no', 'status', 'narration'], ['WR002', 'in-process', "Line one, with comma"]])
+
+    def test_formulas_in_text_are_neutralised(self):
+        make_order(3, narration='=HYPERLINK("http://example.com","x")', assigned_by="-2+3", name="@SUM(A1)")
+        rows = self.read_csv(self.client.get('/orders/export', {'columns': 'order_no,name,narration,assigned_by'}))
+        self.assertEqual(rows[-1], ['WR003', "'@SUM(A1)", '\'=HYPERLINK("http://example.com","x")', "'-2+3"])
+
+    def test_unknown_column_is_rejected(self):
+        response = self.client.get('/orders/export', {'columns': 'order_no,password'})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderImportTests(ImportTestCase):
+    header = 'bp_code,name,reference_no,due_date,branch_code,product,design,vendor_design,collection'
+
+    def row(self, number, bp_code='BA001', due_date=None):
+        due_date = due_date or timezone.localdate() + timedelta(days=10)
+        return f"{bp_code},Order {number},REF{number},{due_date},BR{number},Ring,D1,V1,Peacock"
+
+    def test_import_numbers_orders_and_updates_counters_and_search(self):
+        partner = BusinessPartner.objects.create(
+            role='BUYER', bp_code='BA001', term='T1', business_name="Aurum", full_name="Buyer",
+            mobile='9000000001', email='buyer@example.com', pincode='600001', city='Chennai', state='Tamil Nadu')
+        make_order(1)
+        job = self.make_job('orders', [
+            self.header,
+            self.row(2),
+            self.row(3),
+            self.row(1),
+            self.row(4, bp_code='ZZ999'),
+            self.row(5, due_date=timezone.now().date()),
+        ], user=get_user_model().objects.create_user(username='key', password='pass', role_name='Key User'))
+
+        run_job(job)
+
+        self.assertEqual((job.status, job.created_rows, job.error_rows), ('completed', 2, 3))
+        self.assertEqual(
+            list(Order.objects.filter(bp_code=partner).order_by('order_no').values_list('order_no', 'reference_no')),
+            [('WR002', 'REF2'), ('WR003', 'REF3')])
+        self.assertEqual([sorted(error['errors']) for error in job.errors], [['reference_no'], ['bp_code'], ['due_date']])
+        self.assertEqual(count_orders(), {
+            (row.status, row.craftsman_key, row.bp_code_key): row.count
+            for row in OrderStatusCounter.objects.filter(count__gt=0)
+        })
+        self.assertEqual(OrderSearchTerm.objects.filter(term='peacock').count(), 2)
+
+    def test_users_import_orders_of_their_own_partner_only(self):
+        mine, other = (
+            BusinessPartner.objects.create(
+                role='BUYER', bp_code=code, term='T1', business_name=code, full_name="Buyer",
+                mobile=f"90000000{number:02d}", email=f"{code}@example.com", pincode='600001', city='Chennai', state='Tamil Nadu')
+            for number, code in enumerate(('BA001', 'BA002'), start=1))
+        clerk = get_user_model().objects.create_user(username='clerk', password='pass', role_name='User', bp_code=mine)
+        job = self.make_job('orders', [self.header, self.row(1), self.row(2, bp_code='BA002')], user=clerk)
+
+        run_job(job)
+
+        self.assertEqual((job.status, job.created_rows), ('completed', 1))
+        self.assertEqual(job.errors[0]['row'], 3)
+        self.assertFalse(Order.objects.filter(bp_code=other).exists())
+
+        craftsman = get_user_model().objects.create_user(username='maker', password='pass', role_name='Craftsman', bp_code=mine)
+        job = run_job(self.make_job('orders', [self.header, self.row(3)], user=craftsman))
+        self.assertEqual(job.status, 'failed')
+
+
+class OrderBulkTransitionTests(TestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user(username='key', password='pass', role_name='Key User'))
+
+    def transition(self, order_ids, transition='approve'):
+        return self.client.post('/orders/transition', {'order_ids': order_ids, 'transition': transition}, content_type='application/json')
+
+    def test_moves_orders_in_expected_status_and_reports_the_rest(self):
+        pending = [make_order(n, status='pending').pk for n in range(1, 4)]
+        in_process = make_order(4, status='in-process').pk
+
+        response = self.transition(pending + [in_process, 999, pending[0]])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['moved'], pending)
+        self.assertEqual(response.json()['skipped'], [
+            {'id': in_process, 'reason': "Order is in-process, expected pending."},
+            {'id': 999, 'reason': "Order not found."},
+        ])
+        self.assertEqual(Order.objects.filter(status='in-process').count(), 4)
+        self.assertEqual(summarize()['statuses'], {'in-process': {'total': 4, 'assigned': 0}})
+
+        # Repeating the request moves nothing.
+        self.assertEqual(self.transition(pending).json()['moved'], [])
+
+    def test_statement_count_does_not_grow_with_orders(self):
+        def transition_queries(orders):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(len(self.transition([order.pk for order in orders]).json()['moved']), len(orders))
+            return len(queries)
+
+        transition_queries([make_order(0, status='pending')])  # creates the in-process counter row
+        few = [make_order(n, status='pending') for n in range(1, 3)]
+        many = [make_order(n, status='pending') for n in range(10, 60)]
+        self.assertEqual(transition_queries(few), transition_queries(many))
+
+    def test_unknown_transition_is_rejected(self):
+        self.assertEqual(self.transition([1], transition='teleport').status_code, 400)
+
+
+def make_craftsman(number, **kwargs):
+    fields = {
+        'role': 'CRAFTSMAN', 'bp_code': f"AK{number:03d}", 'term': 'T1', 'business_name': f"Kanak {number}",
+        'full_name': f"Craftsman {number}", 'mobile': f"91000{number:05d}", 'email': f"craftsman{number}@example.com",
+        'pincode': '600001', 'city': 'Chennai', 'state': 'Tamil Nadu',
+    }
+    fields.update(kwargs)
+    return BusinessPartner.objects.create(**fields)
+
+
+class CraftsmanSchedulerTests(TestCase):
+    def setUp(self):
+        self.busy, self.idle, self.spare = (make_craftsman(n) for n in range(1, 4))
+        make_order(90, craftsman=self.busy, status='in-process')
+        make_order(92, craftsman=self.busy, status='awaiting-approval')
+        make_order(91, craftsman=self.spare, status='assigned')
+
+    def test_load_follows_order_status(self):
+        order = make_order(1)
+        assign(order, self.idle)
+        self.assertEqual(CraftsmanLoad.objects.get(craftsman=self.idle).open_orders, 1)
+        order.status = 'complete'
+        order.save()
+        self.assertEqual(CraftsmanLoad.objects.get(craftsman=self.idle).open_orders, 0)
+        call_command('rebuild_order_counters', '--check', stdout=StringIO())
+
+    def test_least_loaded_skips_rejections_and_full_craftsmen(self):
+        order = make_order(1)
+        self.assertEqual(next_craftsman(order), self.idle)
+        OrderRejection.objects.create(order=order, craftsman=self.idle)
+        CraftsmanLoad.objects.filter(craftsman=self.spare).update(capacity=1)
+        self.assertEqual(next_craftsman(order), self.busy)
+        OrderRejection.objects.create(order=order, craftsman=self.busy)
+        self.assertIsNone(next_craftsman(order))
+
+    def test_round_robin_and_category_affinity(self):
+        assign(make_order(1, category='Rings'), self.busy)
+        assign(make_order(2), self.idle)
+        self.assertEqual(next_craftsman(make_order(3), policy='round-robin'), self.spare)
+        self.assertEqual(next_craftsman(make_order(4, category='Rings'), policy='category-affinity'), self.busy)
+        self.assertEqual(next_craftsman(make_order(5, category='Chains'), policy='category-affinity'), self.spare)
+
+    def test_inactive_craftsmen_are_not_scheduled(self):
+        self.idle.status = 'freezed'
+        self.idle.save()
+        self.assertEqual(next_craftsman(make_order(1)), self.spare)
+
+    def test_rejections_walk_through_every_craftsman(self):
+        self.client.force_login(get_user_model().objects.create_user(username='staff', password='pass', role_name='Admin'))
+        order = make_order(1)
+        assign(order, self.idle)
+        offered = [self.idle]
+        for _ in range(3):
+            self.client.post('/orders/response-from-order/', {'order_no': order.order_no, 'action': 'reject'})
+            order.refresh_from_db()
+            offered.append(order.craftsman)
+        self.assertEqual(offered, [self.idle, self.spare, self.busy, None])
+        self.assertEqual(order.status, 'rejected')
+        self.assertEqual(OrderRejection.objects.filter(order=order).count(), 3)
+
+
+class OrderBatchAssignmentTests(TestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user(username='staff', password='pass', role_name='Admin'))
+        self.first, self.second = make_craftsman(1), make_craftsman(2)
+
+    def assign(self, assignments):
+        return self.client.post('/orders/assign-orders/batch/', {'assignments': assignments}, content_type='application/json')
+
+    def test_applies_valid_items_and_reports_the_rest(self):
+        due_date = timezone.localdate() + timedelta(days=10)
+        first, second = make_order(1, category='Rings'), make_order(2)
+        response = self.assign([
+            {'order_no': first.pk, 'bp_code': "AK001-kanak 1", 'due_date': due_date.isoformat()},
+            {'order_no': second.pk, 'bp_code': "AK002-Kanak 2"},
+            {'order_no': 999, 'bp_code': "AK001-Kanak 1"},
+            {'order_no': second.pk, 'bp_code': "AK001-Someone else"},
+            {'order_no': first.pk, 'bp_code': "AK002-Kanak 2"},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['assigned'], 2)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['success', 'success', 'error', 'error', 'error'])
+        first.refresh_from_db()
+        self.assertEqual((first.craftsman, first.status, first.due_date), (self.first, 'assigned', due_date))
+        self.assertEqual(Order.objects.get(pk=second.pk).craftsman, self.second)
+        self.assertEqual(CraftsmanLoad.objects.get(craftsman=self.first).open_orders, 1)
+        self.assertEqual(next_craftsman(make_order(3, category='Rings'), policy='category-affinity'), self.first)
+        call_command('rebuild_order_counters', '--check', stdout=StringIO())
+
+    def test_statement_count_does_not_grow_with_orders(self):
+        def assign_queries(orders):
+            items = [{'order_no': order.pk, 'bp_code': f"AK00{1 + i % 2}-Kanak {1 + i % 2}"} for i, order in enumerate(orders)]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.assign(items).json()['assigned'], len(orders))
+            return len(queries)
+
+        assign_queries([make_order(0), make_order(1)])  # creates the assigned counter rows
+        few = [make_order(n) for n in range(2, 4)]
+        many = [make_order(n) for n in range(10, 60)]
+        self.assertEqual(assign_queries(few), assign_queries(many))
+
+    def test_past_due_date_is_rejected_per_item(self):
+        order = make_order(1)
+        result = self.assign([{'order_no': order.pk, 'bp_code': "AK001-Kanak 1", 'due_date': timezone.now().date().isoformat()}]).json()
+        self.assertEqual(result['results'][0]['message'], "Due date must be in the future")
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'new')
+
+
+class OrderTransitionEngineTests(TestCase):
+    def setUp(self):
+        self.key_user = get_user_model().objects.create_user(username='key', password='pass', role_name='Key User')
+        self.client.force_login(self.key_user)
+
+    def test_double_click_moves_the_order_once(self):
+        order = make_order(1, status='pending')
+        first = self.client.post(f'/orders/approve/{order.pk}/')
+        second = self.client.post(f'/orders/approve/{order.pk}/')
+        self.assertEqual((first.status_code, second.status_code), (200, 400))
+        self.assertEqual(summarize()['statuses'], {'in-process': {'total': 1, 'assigned': 0}})
+
+    def test_stale_copy_loses_the_race(self):
+        order = make_order(1, status='pending')
+        stale = Order.objects.get(pk=order.pk)
+        apply_transition(order, 'approve', self.key_user)
+        with self.assertRaises(TransitionError):
+            apply_transition(stale, 'approve', self.key_user)
+        self.assertEqual(summarize()['statuses'], {'in-process': {'total': 1, 'assigned': 0}})
+
+    def test_role_guard(self):
+        order = make_order(1, status='in-process')
+        with self.assertRaises(TransitionError) as raised:
+            apply_transition(order, 'verify', self.key_user)
+        self.assertEqual(raised.exception.status_code, 403)
+        self.assertEqual(self.client.post(f'/orders/admin-verification/{order.pk}/').status_code, 403)
+
+    def test_craftsmen_move_only_their_own_orders(self):
+        mine, theirs = make_craftsman(1), make_craftsman(2)
+        craftsman = get_user_model().objects.create_user(username='maker', password='pass', role_name='Craftsman', bp_code=mine)
+        own = make_order(1, status='assigned', craftsman=mine)
+        other = make_order(2, status='assigned', craftsman=theirs)
+        busy = make_order(3, status='in-process', craftsman=theirs)
+
+        with self.assertRaises(TransitionError) as raised:
+            apply_transition(own, 'accept', self.key_user)
+        self.assertEqual(raised.exception.status_code, 403)
+        with self.assertRaises(TransitionError) as raised:
+            apply_transition(other, 'accept', craftsman)
+        self.assertEqual(raised.exception.status_code, 403)
+        apply_transition(own, 'accept', craftsman)
+
+        moved, skipped = bulk_transition([own.pk, busy.pk], 'mark-completed', craftsman)
+        self.assertEqual(moved, [own.pk])
+        self.assertEqual(skipped, [{'id': busy.pk, 'reason': "Order is not assigned to you."}])
+        self.assertEqual(Order.objects.get(pk=busy.pk).status, 'in-process')
+
+    def test_one_update_of_the_status_columns_and_hook_after_commit(self):
+        order = make_order(1, status='pending')
+        received = []
+
+        def receiver(order_ids, **kwargs):
+            received.append(order_ids)
+
+        order_transitioned.connect(receiver, sender=Order)
+        self.addCleanup(order_transitioned.disconnect, receiver, sender=Order)
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            apply_transition(order, 'approve', self.key_user)
+            self.assertEqual(received, [])
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "order_order"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"name"', updates[0])
+        self.assertEqual(received, [[order.pk]])
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'in-process')
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.key_user = user_model.objects.create_user(username='key', password='pass', role_name='Key User')
+        self.admin = user_model.objects.create_user(username='admin', password='pass', role_name='Admin')
+        self.client.force_login(self.admin)
+
+    def test_timeline_records_every_change_with_actor_and_notes(self):
+        order = make_order(1, status='pending', category='Rings')
+        apply_transition(order, 'approve', self.key_user, notes="Looks fine")
+        self.client.post(f'/orders/admin-verification/{order.pk}/', {'approval_notes': "Go ahead"})
+        assign(Order.objects.get(pk=order.pk), make_craftsman(1), user=self.admin)
+
+        timeline = self.client.get(f'/orders/{order.order_no}/timeline').json()
+        self.assertEqual(timeline['status'], 'assigned')
+        self.assertEqual(
+            [(event['from_status'], event['to_status'], event['actor'], event['notes']) for event in timeline['events']],
+            [
+                ('', 'pending', None, ''),
+                ('pending', 'in-process', 'key', "Looks fine"),
+                ('in-process', 'verified', 'admin', "Go ahead"),
+                ('verified', 'assigned', 'admin', ''),
+            ],
+        )
+        self.assertEqual(timeline['events'][-1]['craftsman'], 'AK001')
+
+    def test_reassignments_are_recorded_and_published(self):
+        first, second, third = make_craftsman(1), make_craftsman(2), make_craftsman(3)
+        order = make_order(1, status='verified')
+        assign(order, first, user=self.admin)
+        Order.objects.filter(pk=order.pk).update(status_changed_at=timezone.now() - timedelta(days=3))
+        received = []
+
+        def collect(sender, changes, **kwargs):
+            received.extend(changes)
+        status_changed.connect(collect, sender=Order)
+        self.addCleanup(status_changed.disconnect, collect, sender=Order)
+
+        reassigned_at = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            assign(Order.objects.get(pk=order.pk), second, user=self.admin)
+            bulk_assign([{'order_no': order.pk, 'bp_code': "AK003-Kanak 3"}], self.admin)
+
+        self.assertEqual(
+            [(change.from_status, change.to_status, change.craftsman_before, change.craftsman_after) for change in received],
+            [('assigned', 'assigned', first.pk, second.pk), ('assigned', 'assigned', second.pk, third.pk)])
+        self.assertEqual(
+            list(order.events.order_by('id').values_list('to_status', 'craftsman_id', 'seconds_in_previous'))[-2:],
+            [('assigned', second.pk, None), ('assigned', third.pk, None)])
+        for ts in list(order.events.order_by('id').values_list('ts', flat=True))[-2:]:
+            self.assertGreaterEqual(ts, reassigned_at)
+
+    def test_time_in_state_is_aggregated_when_orders_leave_a_status(self):
+        craftsman = make_craftsman(1)
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for number in range(1, 4):
+            make_order(number, status='in-process', craftsman=craftsman, category='Rings', status_changed_at=hour_ago)
+        make_order(4, status='in-process', category='Chains', status_changed_at=timezone.now() - timedelta(hours=3))
+        bulk_transition(list(Order.objects.values_list('pk', flat=True)), 'mark-completed', self.admin)
+
+        rows = self.client.get('/orders/time-in-state?by=category').json()['statuses']
+        by_category = {row['category']: row for row in rows}
+        self.assertEqual(by_category['Rings']['orders'], 3)
+        self.assertAlmostEqual(by_category['Rings']['average_seconds'], 3600, delta=60)
+        self.assertAlmostEqual(by_category['Chains']['max_seconds'], 3 * 3600, delta=60)
+        craftsman_rows = self.client.get('/orders/time-in-state', {'craftsman': 'AK001'}).json()['statuses']
+        self.assertEqual([(row['status'], row['orders']) for row in craftsman_rows], [('in-process', 3)])
+
+    def test_bulk_changes_write_events_in_one_insert(self):
+        orders = [make_order(n, status='pending').pk for n in range(1, 51)]
+        with CaptureQueriesContext(connection) as queries:
+            bulk_transition(orders, 'approve', self.key_user)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "order_orderevent"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(OrderEvent.objects.filter(to_status='in-process').count(), 50)
+
+
+@override_settings(ORDER_FEED_STREAM_SECONDS=0.3)
+class OrderFeedTests(TestCase):
+    def setUp(self):
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+        self.broker = get_broker()
+        self.key_user = get_user_model().objects.create_user(username='key', password='pass', role_name='Key User')
+
+    def event(self, order_id, from_status, to_status, craftsman_id=None, bp_code_id=None):
+        return {
+            'order_id': order_id, 'order_no': str(order_id), 'from_status': from_status, 'to_status': to_status,
+            'craftsman_id': craftsman_id, 'previous_craftsman_id': None, 'bp_code_id': bp_code_id, 'ts': '',
+        }
+
+    async def read_feed(self, user, path='/orders/feed', last_event_id=None):
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(path, headers={'Last-Event-ID': last_event_id} if last_event_id else {})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        # Status events only; reset events carry no data.
+        return [json.loads(line[6:]) for line in body.splitlines() if line.startswith('data: {"')], body
+
+    def test_status_changes_are_published_after_commit(self):
+        order = make_order(1, status='pending')
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_transition(order, 'approve', self.key_user)
+            self.assertEqual(self.broker.last_id, 0)
+        events, missed = self.broker.since(0)
+        self.assertEqual([(payload['order_id'], payload['to_status']) for event_id, payload in events], [(order.pk, 'in-process')])
+
+    async def test_streams_live_events_filtered_by_role(self):
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, self.broker.publish, [self.event(1, 'pending', 'in-process'), self.event(2, 'assigned', 'in-process')])
+        loop.call_later(0.1, self.broker.publish, [self.event(3, 'verified', 'assigned'), self.event(4, 'new', 'pending')])
+        events, body = await self.read_feed(self.key_user)
+        self.assertEqual([event['order_id'] for event in events], [1, 2, 4])
+        self.assertIn('id: 4\n', body)
+
+    async def test_customers_only_see_their_own_orders(self):
+        partner = await sync_to_async(BusinessPartner.objects.create)(
+            role='BUYER', bp_code='BA001', term='T1', business_name="Aurum", full_name="Buyer",
+            mobile='9000000001', email='buyer@example.com', pincode='600001', city='Chennai', state='Tamil Nadu')
+        customer = await sync_to_async(get_user_model().objects.create_user)(
+            username='buyer', password='pass', role_name='User', bp_code=partner)
+        self.broker.publish([self.event(1, 'new', 'pending', bp_code_id=partner.pk), self.event(2, 'new', 'pending', bp_code_id=partner.pk + 1)])
+
+        events, body = await self.read_feed(customer, last_event_id='0')
+        self.assertEqual([event['order_id'] for event in events], [1])
+
+        stranger = await sync_to_async(get_user_model().objects.create_user)(username='stranger', password='pass', role_name='')
+        await self.async_client.aforce_login(stranger)
+        self.assertEqual((await self.async_client.get('/orders/feed')).status_code, 403)
+
+    async def test_resumes_after_last_event_id_and_resets_when_too_far_behind(self):
+        craftsman = await sync_to_async(make_craftsman)(1)
+        admin = await sync_to_async(get_user_model().objects.create_user)(username='admin', password='pass', role_name='Admin')
+        self.broker.publish([self.event(n, 'assigned', 'in-process', craftsman_id=craftsman.pk if n % 2 else None) for n in range(1, 6)])
+
+        events, body = await self.read_feed(admin, '/orders/feed?craftsman=AK001', last_event_id='2')
+        self.assertEqual([event['order_id'] for event in events], [3, 5])
+        self.assertNotIn('event: reset', body)
+
+        self.broker.publish([self.event(n, 'assigned', 'in-process') for n in range(6, 1100)])
+        events, body = await self.read_feed(admin, last_event_id='5')
+        self.assertIn('event: reset', body)
+        self.assertEqual(len(events), 1000)
+
+    def test_unauthenticated_and_unknown_partner(self):
+        self.assertEqual(self.client.get('/orders/feed').status_code, 401)
+        self.client.force_login(self.key_user)
+        self.assertEqual(self.client.get('/orders/feed?bp_code=NOPE').status_code, 404)
+
+
+class OrderInboxTests(TestCase):
+    def setUp(self):
+        self.mine, self.other = make_craftsman(1), make_craftsman(2)
+        self.user = get_user_model().objects.create_user(username='maker', password='pass', role_name='Craftsman', bp_code=self.mine)
+        self.client.force_login(self.user)
+        today = timezone.localdate()
+        self.orders = [
+            make_order(n, craftsman=self.mine, status='assigned', due_date=today + timedelta(days=10 - n)) for n in range(1, 4)
+        ]
+        make_order(4, craftsman=self.mine, status='in-process')
+        make_order(5, craftsman=self.other, status='assigned')
+
+    def test_lists_only_own_orders_by_due_date_with_counts(self):
+        first = self.client.get('/orders/inbox', {'limit': 2}).json()
+        self.assertEqual(first['counts'], {'assigned': 3, 'in-process': 1})
+        self.assertEqual([row['order_no'] for row in first['results']], [self.orders[2].order_no, self.orders[1].order_no])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['order_no'] for row in second['results']], [self.orders[0].order_no])
+        self.assertIsNone(second['next'])
+        self.assertEqual(len(self.client.get('/orders/inbox', {'status': 'in-process'}).json()['results']), 1)
+
+    def test_if_none_match_skips_serialization(self):
+        etag = self.client.get('/orders/inbox')['ETag']
+        self.assertEqual(self.client.get('/orders/inbox', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        apply_transition(self.orders[0], 'accept')
+        response = self.client.get('/orders/inbox', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_edits_that_keep_the_status_change_the_etag(self):
+        etag = self.client.get('/orders/inbox')['ETag']
+        order = Order.objects.get(pk=self.orders[0].pk)
+        order.narration = "Use the old mould"
+        order.save()
+        self.assertEqual(self.client.get('/orders/inbox', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_non_craftsmen_have_no_inbox(self):
+        self.client.force_login(get_user_model().objects.create_user(username='key', password='pass', role_name='Key User'))
+        self.assertEqual(self.client.get('/orders/inbox').status_code, 403)
+
+    def test_inbox_query_uses_the_craftsman_index(self):
+        plan = Order.objects.filter(craftsman=self.mine, status='assigned').order_by('due_date', 'id').explain()
+        self.assertIn('order_craftsman_inbox_idx', plan)
+
+
+class OrderDueSweeperTests(TestCase):
+    def setUp(self):
+        self.craftsman = make_craftsman(1)
+        self.key_user = get_user_model().objects.create_user(username='key', password='pass', role_name='Key User')
+        self.late = make_order(1, craftsman=self.craftsman, user=self.key_user, status='assigned')
+        self.later = make_order(2, craftsman=self.craftsman, user=self.key_user, status='in-process')
+        self.soon = make_order(3, craftsman=self.craftsman, status='awaiting-approval')
+        self.done = make_order(4, craftsman=self.craftsman, user=self.key_user, status='complete')
+        self.on_time = make_order(5, craftsman=self.craftsman, status='assigned')
+        self.set_due(-3, self.late, self.later, self.done)
+        self.set_due(1, self.soon)
+
+    def set_due(self, days, *orders):
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(due_date=timezone.now().date() + timedelta(days=days))
+
+    def due_states(self):
+        return dict(Order.objects.values_list('pk', 'due_state'))
+
+    def notices(self):
+        return {
+            (notice.kind, notice.craftsman_key, notice.user_key): notice.orders
+            for notice in OrderDueNotice.objects.filter(sent_at__isnull=True)
+        }
+
+    def test_marks_open_orders_and_queues_one_notice_per_recipient(self):
+        swept = run_sweep(chunk_size=1)
+        self.assertEqual((swept['overdue'], swept['due-soon'], swept['']), (2, 1, 0))
+        self.assertEqual(self.due_states(), {
+            self.late.pk: 'overdue', self.later.pk: 'overdue', self.soon.pk: 'due-soon', self.done.pk: '', self.on_time.pk: '',
+        })
+        self.assertEqual(self.notices(), {
+            ('overdue', self.craftsman.pk, 0): 2,
+            ('overdue', 0, self.key_user.pk): 2,
+            ('due-soon', self.craftsman.pk, 0): 1,
+        })
+
+    def test_sweeping_again_only_adds_new_orders(self):
+        run_sweep()
+        self.assertEqual(sum(run_sweep().values()), 0)
+        OrderDueNotice.objects.update(sent_at=timezone.now())
+        self.set_due(-1, self.soon)
+        swept = run_sweep()
+        self.assertEqual(swept['overdue'], 1)
+        self.assertEqual(self.notices(), {('overdue', self.craftsman.pk, 0): 1})
+        self.assertEqual(OrderDueNotice.objects.count(), 4)
+
+    def test_clears_marks_of_closed_and_rescheduled_orders(self):
+        run_sweep()
+        apply_transition(self.later, 'mark-completed')
+        apply_transition(self.soon, 'approve-completion')
+        self.set_due(10, self.late)
+        swept = run_sweep()
+        self.assertEqual(swept[''], 2)
+        self.assertEqual(self.due_states()[self.late.pk], '')
+        self.assertEqual(self.due_states()[self.soon.pk], '')
+        # awaiting-approval is still open, so it stays overdue.
+        self.assertEqual(self.due_states()[self.later.pk], 'overdue')
+
+    def test_only_the_lease_holder_sweeps(self):
+        self.assertTrue(acquire_lease(SWEEP_LEASE, 'other-node', 60))
+        self.assertIsNone(run_sweep('this-node'))
+        self.assertEqual(Order.objects.exclude(due_state='').count(), 0)
+        self.assertFalse(acquire_lease(SWEEP_LEASE, 'this-node', 60))
+        self.assertTrue(acquire_lease(SWEEP_LEASE, 'other-node', 0))
+        self.assertEqual(run_sweep('this-node')['overdue'], 2)
+        self.assertTrue(acquire_lease(SWEEP_LEASE, 'other-node', 60))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('sweep_due_orders', stdout=out)
+        self.assertIn("2 overdue, 1 due soon, 0 cleared", out.getvalue())
+
+
+class OrderConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user(username='staff', password='pass', role_name='Admin'))
+        self.partner = make_craftsman(1)
+        self.order = make_order(1, bp_code=self.partner, status='in-process')
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_detail_changes_with_queryset_updates_and_the_partner(self):
+        url = f'/orders/detail/{self.order.order_no}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        apply_transition(self.order, 'mark-completed')
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.partner.business_name = "Renamed"
+        self.partner.save()
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['bp_code'], f"{self.partner.bp_code}-Renamed")
+
+    def test_list(self):
+        etag = self.client.get('/orders/list')['ETag']
+        self.assertEqual(self.revalidate('/orders/list', etag).status_code, 304)
+        make_order(2)
+        self.assertEqual(self.revalidate('/orders/list', etag).status_code, 200)
+
+
+def query_plan(queryset):
+    """EXPLAIN output; on PostgreSQL sequential scans are disabled so small test tables still show the index."""
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+class OrderIndexPlanTests(TestCase):
+    """Every Order index, and the hot query it is there for."""
+
+    def setUp(self):
+        self.craftsman = make_craftsman(1)
+        make_order(1, craftsman=self.craftsman, status='assigned', rejected_by=self.craftsman)
+
+    def assertUsesIndex(self, queryset, index):
+        plan = query_plan(queryset)
+        self.assertRegex(plan, index, plan)
+        self.assertNotRegex(plan, r'SCAN order_order(?! USING)|Seq Scan on "?order_order', plan)
+
+    def test_status_filter(self):
+        self.assertUsesIndex(Order.objects.filter(status='in-process'), 'order_status_(created|due)_idx')
+        self.assertUsesIndex(Order.objects.filter(status='in-process').order_by('-created_at', '-id'), 'order_status_created_idx')
+
+    def test_bp_code_list(self):
+        bp = self.craftsman
+        self.assertUsesIndex(Order.objects.filter(bp_code=bp).order_by('-created_at', '-id'), 'order_bp_created_idx')
+
+    def test_assigned_list(self):
+        # Most orders have a craftsman, so walking the created_at index and skipping the rest is enough.
+        self.assertUsesIndex(Order.objects.filter(craftsman__isnull=False).order_by('-created_at', '-id'), 'order_created_idx')
+
+    def test_craftsman_inbox(self):
+        self.assertUsesIndex(
+            Order.objects.filter(craftsman=self.craftsman, status='assigned').order_by('due_date', 'id'), 'order_craftsman_inbox_idx')
+
+    def test_due_sweeper_ranges(self):
+        today = timezone.localdate()
+        for orders, due_state in sweep_ranges(today, today + timedelta(days=2)):
+            self.assertUsesIndex(orders.order_by('due_date', 'id'), 'order_status_due_idx')
+
+    def test_latest_change(self):
+        self.assertUsesIndex(Order.objects.order_by('-updated_at').values_list('updated_at')[:1], 'order_updated_idx')
+
+    def test_inbox_page_keys_come_from_the_index(self):
+        keys = Order.objects.filter(craftsman=self.craftsman, status='assigned').order_by('due_date', 'id')
+        self.assertUsesIndex(keys.values_list('id', 'due_date', 'updated_at'), 'COVERING INDEX order_craftsman_inbox_idx|Index Only Scan')
+
+    def test_rejected_by_and_craftsman_foreign_keys(self):
+        self.assertUsesIndex(Order.objects.filter(rejected_by=self.craftsman), 'rejected_by')
+        self.assertUsesIndex(Order.objects.filter(craftsman=self.craftsman), 'craftsman')
@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .counters import counter_key, record_moves
+from .history import StatusChange, record_events
+from .models import Order
+
+
+# Sent after the transaction that moved orders commits, with sender=Order,
+# transition (the name), order_ids and user.
+order_transitioned = Signal()
+
+ADMINS = ('Project Owner', 'Super Admin', 'Admin')
+KEY_USERS = ADMINS + ('Key User',)
+CRAFTSMEN = ADMINS + ('Craftsman',)
+
+
+class TransitionError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Transition:
+    """
+    A status change: the statuses an order must be in, the status it moves
+    to, the roles allowed to make it (None: any user) and the other columns
+    the caller may set along with the status. Craftsmen may only move the
+    orders assigned to them.
+    """
+
+    def __init__(self, sources, target, roles=None, fields=(), error=None):
+        self.sources = sources
+        self.target = target
+        self.roles = roles
+        self.fields = fields
+        self.error = error or f"Order must be {' or '.join(sources)}."
+
+    def check_role(self, user):
+        if self.roles is None or user is None or user.is_superuser:
+            return
+        if getattr(user, 'role_name', None) not in self.roles:
+            raise TransitionError("You are not allowed to change this order's status.", status_code=403)
+
+    def scope(self, user):
+        """Extra UPDATE filter for the orders `user` may move."""
+        if user is None or user.is_superuser or getattr(user, 'role_name', None) != 'Craftsman':
+            return {}
+        if user.bp_code_id is None:
+            raise TransitionError("You are not allowed to change this order's status.", status_code=403)
+        return {'craftsman_id': user.bp_code_id}
+
+
+TRANSITIONS = {
+    'approve': Transition(('pending',), 'in-process', KEY_USERS, error="Only pending orders can be approved by key user."),
+    'verify': Transition(('in-process',), 'verified', ADMINS, error="Only in-process orders can be verified by admin."),
+    'admin-reject': Transition(('in-process',), 'admin-rejected', ADMINS, error="Only in-process orders can be rejected by admin."),
+    'accept': Transition(('assigned',), 'in-process', CRAFTSMEN, error="Order is not in assigned state"),
+    'reject': Transition(('assigned',), 'rejected', CRAFTSMEN, fields=('craftsman', 'rejected_by'), error="Order is not in assigned state"),
+    'mark-completed': Transition(('in-process',), 'awaiting-approval', CRAFTSMEN, error="Order is not in-process"),
+    'approve-completion': Transition(('awaiting-approval',), 'complete', KEY_USERS, error="Order is not awaiting approval"),
+}
+
+# Transitions that only change the status, which can be applied to many orders at once.
+BULK_TRANSITIONS = [name for name, transition in TRANSITIONS.items() if not transition.fields]
+
+
+def send_transitioned(name, order_ids, user):
+    transaction.on_commit(
+        lambda: order_transitioned.send(sender=Order, transition=name, order_ids=order_ids, user=user)
+    )
+
+
+def apply_transition(order, name, user=None, notes='', **changes):
+    """
+    Move `order` along transition `name` with a single conditional UPDATE of
+    the status columns. The UPDATE only matches while the order still has
+    the status, craftsman and business partner it was read with, so a
+    double click or a concurrent approver gets a TransitionError instead of
+    moving the order twice. `order` is updated in place and the change is
+    recorded in its history, with `notes`.
+    """
+    transition = TRANSITIONS[name]
+    transition.check_role(user)
+    scope = transition.scope(user)
+    unknown = set(changes) - set(transition.fields)
+    if unknown:
+        raise ValueError(f"{name} cannot change {', '.join(sorted(unknown))}")
+    if order.craftsman_id != scope.get('craftsman_id', order.craftsman_id):
+        raise TransitionError("This order is not assigned to you.", status_code=403)
+    if order.status not in transition.sources:
+        raise TransitionError(transition.error)
+
+    old_key = counter_key(order.status, order.craftsman_id, order.bp_code_id)
+    change = StatusChange(order.pk, order.status, transition.target, order.status_changed_at, order.craftsman_id, None, order.category)
+    now = timezone.now()
+    with transaction.atomic():
+        # craftsman_id is the order's, which the check above matched against the scope.
+        updated = Order.objects.filter(
+            pk=order.pk, status=order.status, craftsman_id=order.craftsman_id, bp_code_id=order.bp_code_id,
+        ).update(status=transition.target, status_changed_at=now, updated_at=now, **changes)
+        if not updated:
+            raise TransitionError(transition.error)
+        order.status, order.status_changed_at = transition.target, now
+        for field, value in changes.items():
+            setattr(order, field, value)
+        record_moves([(old_key, counter_key(order.status, order.craftsman_id, order.bp_code_id))])
+        record_events([change._replace(craftsman_after=order.craftsman_id)], user, notes, now)
+        send_transitioned(name, [order.pk], user)
+    return order
+
+
+def bulk_transition(order_ids, name, user=None):
+    """
+    Apply the `name` transition to every order in `order_ids` that is in one
+    of its source statuses, with a single conditional UPDATE.
+    Returns (moved ids, [{'id': ..., 'reason': ...}] for the skipped ones).
+    """
+    transition = TRANSITIONS[name]
+    transition.check_role(user)
+    scope = transition.scope(user)
+    sources, target = transition.sources, transition.target
+    order_ids = list(dict.fromkeys(order_ids))
+
+    now = timezone.now()
+    with transaction.atomic():
+        current = {
+            row[0]: row[1:]
+            for row in Order.objects.select_for_update()
+            .filter(pk__in=order_ids)
+            .values_list('pk', 'status', 'craftsman_id', 'bp_code_id', 'status_changed_at', 'category')
+        }
+        allowed = {pk for pk, row in current.items() if row[1] == scope.get('craftsman_id', row[1])}
+        moved = [pk for pk in order_ids if pk in allowed and current[pk][0] in sources]
+        if moved:
+            Order.objects.filter(pk__in=moved, status__in=sources, **scope).update(status=target, status_changed_at=now, updated_at=now)
+            record_moves([
+                (counter_key(*current[pk][:3]), counter_key(target, *current[pk][1:3])) for pk in moved
+            ])
+            changes = []
+            for pk in moved:
+                status, craftsman_id, bp_code_id, entered_at, category = current[pk]
+                changes.append(StatusChange(pk, status, target, entered_at, craftsman_id, craftsman_id, category))
+            record_events(changes, user, ts=now)
+            send_transitioned(name, moved, user)
+
+    skipped = []
+    for pk in order_ids:
+        if pk not in current:
+            skipped.append({'id': pk, 'reason': "Order not found."})
+        elif pk not in allowed:
+            skipped.append({'id': pk, 'reason': "Order is not assigned to you."})
+        elif current[pk][0] not in sources:
+            skipped.append({'id': pk, 'reason': f"Order is {current[pk][0]}, expected {' or '.join(sources)}."})
+    return moved, skipped
@@ -1,20 +1,31 @@
 from django.urls import path
-from .views import KeyUserApprovalView, AdminVerificationView, OrderCreateView, OrderList, OrderDetailView, NewOrdersListView, AssignOrdersToCraftsman, OrderInProcessAPI, ApproveOrderView, CompletedOrdersView, RejectedOrdersView, CraftsmanOrderResponse, AssignedOrdersList
+from .views import KeyUserApprovalView, AdminVerificationView, OrderCreateView, OrderList, OrderDetailView, NewOrdersListView, AssignOrdersToCraftsman, BatchAssignOrdersToCraftsman, OrderInProcessAPI, ApproveOrderView, CompletedOrdersView, RejectedOrdersView, CraftsmanOrderResponse, AssignedOrdersList, OrderSummaryView, OrderSearchView, OrderExportView, OrderBulkTransitionView, OrderTimelineView, OrderTimeInStateView, OrderFeedView, OrderInboxView
+from BusinessPartner.views import ImportJobView
 
 urlpatterns = [
     path('orders/create', OrderCreateView.as_view(), name='order-create'), # Handles POST (create)
     path('orders/approve/<int:order_no>/', KeyUserApprovalView.as_view(), name='order-approve'),
     path('orders/admin-verification/<str:order_no>/', AdminVerificationView.as_view(), name='admin-verification'),
+    path('orders/transition', OrderBulkTransitionView.as_view(), name='order-bulk-transition'),
     path('orders/new-orders/', NewOrdersListView.as_view(), name='new-orders'),
     # path('order-requests/<int:request_id>/verify/', OrderRequestVerificationView.as_view(), name='order-request-verify'),
     path('orders/list', OrderList.as_view(), name='order-list'),  # Handles GET (list)
     path('orders/detail/<str:order_no>/', OrderDetailView.as_view(), name='order-detail'),
     path('orders/delete/<int:id>/', OrderCreateView.as_view(), name='update-delete'),  # Handles GET, PUT, DELETE for a specific order
     path('orders/assign-orders/', AssignOrdersToCraftsman.as_view(), name='assign-orders'),
+    path('orders/assign-orders/batch/', BatchAssignOrdersToCraftsman.as_view(), name='assign-orders-batch'),
     path('orders/assigned-orders/', AssignedOrdersList.as_view(), name='assigned-orders'),
     path('orders/response-from-order/', CraftsmanOrderResponse.as_view()),
     path('orders/in-process/', OrderInProcessAPI.as_view(), name='order-in-process'),
     path('orders/approve/', ApproveOrderView.as_view(), name='approve-order'),
     path('orders/completed/', CompletedOrdersView.as_view(), name='completed-orders'),
     path('orders/rejected/', RejectedOrdersView.as_view(), name='rejected-orders'),
+    path('orders/summary', OrderSummaryView.as_view(), name='order-summary'),
+    path('orders/inbox', OrderInboxView.as_view(), name='order-inbox'),
+    path('orders/feed', OrderFeedView.as_view(), name='order-feed'),
+    path('orders/time-in-state', OrderTimeInStateView.as_view(), name='order-time-in-state'),
+    path('orders/<str:order_no>/timeline', OrderTimelineView.as_view(), name='order-timeline'),
+    path('orders/search', OrderSearchView.as_view(), name='order-search'),
+    path('orders/export', OrderExportView.as_view(), name='order-export'),
+    path('orders/import', ImportJobView.as_view(kind='orders'), name='order-import'),
 ]
\ No newline at end of file
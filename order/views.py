@@ -2,12 +2,28 @@ from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
 from .models import Order
 from BusinessPartner.models import BusinessPartner
-from .serializers import OrderSerializer, CraftsmanSerializer, OrderCraftsmanSerializer, OrderAssignmentSerializer, OrderActionSerializer
+from .serializers import OrderSerializer, CraftsmanSerializer, OrderCraftsmanSerializer, OrderAssignmentSerializer, OrderActionSerializer, OrderTransitionSerializer, OrderBatchAssignmentSerializer, OrderEventSerializer
+from .pagination import DueDateCursorPagination, OrderCursorPagination
+from .counters import summarize
+from .history import time_in_state
+from .feed import authenticate, event_filter, get_broker, stream
+from .search import search_orders
+from .transitions import TRANSITIONS, TransitionError, apply_transition, bulk_transition
+from .scheduler import assign, bulk_assign, next_craftsman as pick_craftsman, record_rejection
+from BusinessPartner.fieldsets import apply_sparse_fields
+from BusinessPartner.conditional import list_etag, not_modified, not_modified_response, row_etag, weak_etag
+from BusinessPartner.exports import export_columns, stream_csv
+from django.utils.dateparse import parse_date
 from rest_framework.response import Response
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from asgiref.sync import sync_to_async
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,7 +41,7 @@ def is_valid_user_role(user):
     return user.role_name in valid_roles
 
 class OrderRequestCreateView(generics.CreateAPIView):
-    queryset = Order.objects.all()
+    queryset = Order.objects.select_related('bp_code')
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
@@ -64,9 +80,10 @@ class OrderRequestVerificationView(APIView):
     
 
 class OrderCreateView(generics.CreateAPIView):
-    queryset = Order.objects.all()
+    queryset = Order.objects.select_related('bp_code')
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
     def get(self, request, *args, **kwargs):
         """
@@ -74,15 +91,16 @@ class OrderCreateView(generics.CreateAPIView):
         Shows pending orders for regular users, shows all for staff/admin users.
         """
         bp_code = request.query_params.get("bp_code")
-        queryset = self.get_queryset()
+        queryset = apply_sparse_fields(self.get_queryset(), OrderSerializer, request)
         
         if bp_code:
             queryset = queryset.filter(bp_code=bp_code)
         if not request.user.is_staff:
             queryset = queryset.filter(created_by=request.user, status='pending')
             
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
     def post(self, request, *args, **kwargs):
         """
@@ -104,17 +122,10 @@ class KeyUserApprovalView(APIView):
         Key User approves an order – set status to 'in-process'
         """
         order = get_object_or_404(Order, id=order_no)
-
-        if order.status != 'pending':
-            return Response(
-                {"error": "Only pending orders can be approved by key user."}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        order.status = 'in-process'
-        order.key_user_approval_notes = request.data.get('approval_notes', '')
-        order.approved_by_key_user = request.user
-        order.save()
+        try:
+            apply_transition(order, 'approve', request.user, notes=request.data.get('approval_notes', ''))
+        except TransitionError as e:
+            return Response({"error": str(e)}, status=e.status_code)
 
         return Response({
             "message": "Order approved by Key User. Waiting for Admin verification.",
@@ -128,15 +139,18 @@ class KeyUserApprovalView(APIView):
         Key User rejects an order – delete the pending order
         """
         order = get_object_or_404(Order, id=order_no)
+        try:
+            TRANSITIONS['approve'].check_role(request.user)
+        except TransitionError as e:
+            return Response({"error": str(e)}, status=e.status_code)
 
-        if order.status != 'pending':
+        # Delete only while still pending, so a concurrent approval wins cleanly.
+        if not Order.objects.filter(pk=order.pk, status='pending').delete()[0]:
             return Response(
                 {"error": "Only pending orders can be rejected by Key User."}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
         rejection_notes = request.data.get('rejection_notes', '')
-        order.delete()
 
         return Response({
             "message": "Order rejected by Key User and deleted.",
@@ -154,17 +168,10 @@ class AdminVerificationView(APIView):
         Admin approves an order – set status to 'verified'
         """
         order = get_object_or_404(Order, id=order_no)
-
-        if order.status != 'in-process':
-            return Response(
-                {"error": "Only in-process orders can be verified by admin."}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        order.status = 'verified'
-        order.admin_approval_notes = request.data.get('approval_notes', '')
-        order.verified_by_admin = request.user
-        order.save()
+        try:
+            apply_transition(order, 'verify', request.user, notes=request.data.get('approval_notes', ''))
+        except TransitionError as e:
+            return Response({"error": str(e)}, status=e.status_code)
 
         return Response({
             "message": "Order verified by admin. Ready for craftsman assignment.",
@@ -178,17 +185,10 @@ class AdminVerificationView(APIView):
         Admin rejects an order – set status to 'admin-rejected'
         """
         order = get_object_or_404(Order, id=order_no)
-
-        if order.status != 'in-process':
-            return Response(
-                {"error": "Only in-process orders can be rejected by admin."}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        order.status = 'admin-rejected'
-        order.admin_rejection_notes = request.data.get('rejection_notes', '')
-        order.rejected_by_admin = request.user
-        order.save()
+        try:
+            apply_transition(order, 'admin-reject', request.user, notes=request.data.get('rejection_notes', ''))
+        except TransitionError as e:
+            return Response({"error": str(e)}, status=e.status_code)
 
         return Response({
             "message": "Order rejected by admin.",
@@ -197,29 +197,66 @@ class AdminVerificationView(APIView):
             "rejected_by": request.user.username,
         }, status=status.HTTP_200_OK)
 
+class OrderBulkTransitionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Apply one transition (approve, verify, ...) to many orders at once.
+        Orders that are not in the expected status are skipped, with the reason.
+        """
+        serializer = OrderTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        transition = serializer.validated_data['transition']
+        try:
+            moved, skipped = bulk_transition(serializer.validated_data['order_ids'], transition, request.user)
+        except TransitionError as e:
+            return Response({"error": str(e)}, status=e.status_code)
+        return Response({
+            "transition": transition,
+            "status": TRANSITIONS[transition].target,
+            "moved": moved,
+            "skipped": skipped,
+        }, status=status.HTTP_200_OK)
+
+
 class NewOrdersListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        new_orders = Order.objects.filter(status='in-process')
-        serializer = OrderSerializer(new_orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        new_orders = Order.objects.filter(status='in-process').select_related('bp_code')
+        new_orders = apply_sparse_fields(new_orders, OrderSerializer, request)
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(new_orders, request, view=self)
+        serializer = OrderSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
         
 class OrderList(generics.GenericAPIView):
     
-    queryset = Order.objects.all()
+    queryset = Order.objects.select_related('bp_code')
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
     
     def get(self, request, *args, **kwargs):
         """
         Get all Order or filter by `bp_code`.
         """
         bp_code = request.query_params.get("bp_code")
-        queryset = self.get_queryset().filter(bp_code=bp_code) if bp_code else self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        queryset = apply_sparse_fields(self.get_queryset(), OrderSerializer, request)
+        queryset = queryset.filter(bp_code=bp_code) if bp_code else queryset
+        # The status counters know how many orders there are without counting the table.
+        etag = list_etag(request, queryset, count=summarize(bp_code_id=bp_code or None)['total'])
+        if not_modified(request, etag):
+            return not_modified_response(etag)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response['ETag'] = etag
+        return response
         
         
 class OrderDetailView(generics.GenericAPIView):
@@ -227,7 +264,7 @@ class OrderDetailView(generics.GenericAPIView):
     - GET: Retrieve a Order by bp_code.
     - PUT: Update a Order.
     """
-    queryset = Order.objects.all()
+    queryset = Order.objects.select_related('bp_code')
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     
@@ -238,9 +275,13 @@ class OrderDetailView(generics.GenericAPIView):
 
     def get(self, request, order_no, *args, **kwargs):
         """Retrieve a Order by bp_code."""
-        instance = self.get_object(order_no)
+        instance = get_object_or_404(apply_sparse_fields(self.get_queryset(), OrderSerializer, request), order_no=order_no)
+        # The body shows the partner's business name, so the partner's edits count too.
+        etag = row_etag(request, instance, instance.bp_code if Order.bp_code.is_cached(instance) else None)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
         serializer = self.get_serializer(instance)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     def put(self, request, order_no, *args, **kwargs):
         """Update an existing Order using bp_code."""
@@ -255,7 +296,7 @@ class OrderDetailView(generics.GenericAPIView):
         
 
 class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all()
+    queryset = Order.objects.select_related('bp_code')
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
@@ -351,13 +392,7 @@ class AssignOrdersToCraftsman(APIView):
                 role="CRAFTSMAN"
             )
             order = get_object_or_404(Order, id=order_no)
-            order.craftsman = craftsman
-            order.status = "assigned"
-            
-            if due_date:  # Only update due_date if it was provided
-                order.due_date = due_date
-                
-            order.save()
+            assign(order, craftsman, due_date, request.user)
 
             return Response({
                 "status": "success",
@@ -370,19 +405,45 @@ class AssignOrdersToCraftsman(APIView):
                 "status": "error",
                 "message": str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
-            
-    
+
+
+class BatchAssignOrdersToCraftsman(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Assign many orders to craftsmen in one transaction. Items that cannot
+        be applied (unknown order or craftsman, past due date) are reported
+        in their result and do not stop the others.
+        """
+        serializer = OrderBatchAssignmentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk_assign(serializer.validated_data['assignments'], request.user)
+        return Response({
+            "assigned": sum(result["status"] == "success" for result in results),
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
+
+# Columns OrderCraftsmanSerializer reads, so the status lists load narrow rows.
+CRAFTSMAN_LIST_FIELDS = (
+    'id', 'created_at', 'order_no', 'status', 'due_date',
+    'craftsman__id', 'craftsman__full_name', 'craftsman__bp_code', 'craftsman__business_name',
+)
+
+
 class AssignedOrdersList(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         """Return all orders assigned to a craftsman (regardless of status)."""
-        assigned_orders = Order.objects.filter(craftsman__isnull=False)
-        order_serializer = OrderCraftsmanSerializer(assigned_orders, many=True)
-
-        return Response({
-            "orders": order_serializer.data
-        })
+        assigned_orders = Order.objects.filter(craftsman__isnull=False).select_related('craftsman').only(*CRAFTSMAN_LIST_FIELDS)
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(assigned_orders, request, view=self)
+        order_serializer = OrderCraftsmanSerializer(page, many=True)
+        return paginator.get_paginated_response(order_serializer.data)
 
 class CraftsmanOrderResponse(APIView):
     permission_classes = [IsAuthenticated]
@@ -400,12 +461,11 @@ class CraftsmanOrderResponse(APIView):
         except Order.DoesNotExist:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if order.status != "assigned":
-            return Response({"error": "Order is already in assigned state"}, status=status.HTTP_400_BAD_REQUEST)
-
         if action == "accept":
-            order.status = "in-process"
-            order.save()
+            try:
+                apply_transition(order, 'accept', request.user)
+            except TransitionError as e:
+                return Response({"error": str(e)}, status=e.status_code)
             return Response({
                 "status": "success",
                 "message": f"Order {order_no} accepted and is now in-process",
@@ -415,17 +475,17 @@ class CraftsmanOrderResponse(APIView):
 
         elif action == "reject":
             current_craftsman = order.craftsman
-            order.status = "rejected"
-            order.rejected_by = current_craftsman
-            order.craftsman = None
-            order.save()
+            try:
+                apply_transition(order, 'reject', request.user, craftsman=None, rejected_by=current_craftsman)
+            except TransitionError as e:
+                return Response({"error": str(e)}, status=e.status_code)
+            if current_craftsman:
+                record_rejection(order, current_craftsman)
             
             
             next_craftsman = self.get_next_available_craftsman(order)            
             if next_craftsman:
-                order.craftsman = next_craftsman
-                order.status = "assigned"
-                order.save()
+                assign(order, next_craftsman, user=request.user)
                 
                 return Response({
                     "message": f"Order {order_no} reassigned to {next_craftsman.full_name}",
@@ -439,23 +499,57 @@ class CraftsmanOrderResponse(APIView):
                     "order_status": order.status
                 })
 
-    def get_next_available_craftsman(self, order):       
-        rejected_by = Order.objects.filter(
-            order_no=order.order_no,
-            status='rejected'
-        ).values_list('craftsman__id', flat=True)
-        
-        return BusinessPartner.objects.filter(
-            role="CRAFTSMAN"
-        ).exclude(
-            id__in=rejected_by
-        ).first()
+    def get_next_available_craftsman(self, order):
+        """Pick the next craftsman with the configured assignment policy (see order.scheduler)."""
+        return pick_craftsman(order)
             
+class OrderInboxView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        The logged-in craftsman's own orders: counts per status, and the
+        orders in `status` (default 'assigned'), earliest due first.
+        Supports `fields`, `limit` and `cursor` like the other lists, and
+        answers 304 when If-None-Match carries the current ETag.
+        """
+        craftsman = BusinessPartner.objects.filter(pk=request.user.bp_code_id, role='CRAFTSMAN').only('id', 'bp_code').first()
+        if craftsman is None:
+            return Response({"error": "Only craftsmen have an inbox."}, status=status.HTTP_403_FORBIDDEN)
+        wanted = request.query_params.get('status', 'assigned')
+        if wanted not in dict(Order.STATUS_CHOICES):
+            return Response({"error": f"Unknown status {wanted}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts = {name: row['total'] for name, row in summarize(craftsman_id=craftsman.pk)['statuses'].items()}
+        paginator = DueDateCursorPagination()
+        keys = paginator.paginate_queryset(
+            Order.objects.filter(craftsman=craftsman, status=wanted).only('id', 'due_date', 'updated_at'),
+            request, view=self,
+        )
+        etag = inbox_etag(request, counts, keys)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
+
+        orders = apply_sparse_fields(Order.objects.select_related('bp_code'), OrderSerializer, request).in_bulk([order.pk for order in keys])
+        data = OrderSerializer([orders[order.pk] for order in keys if order.pk in orders], many=True, context={'request': request}).data
+        response = paginator.get_paginated_response(data)
+        response.data = {"craftsman": craftsman.bp_code, "counts": counts, "status": wanted, **response.data}
+        response['ETag'] = etag
+        return response
+
+
+def inbox_etag(request, counts, orders):
+    """Validator for an inbox page: the query, the status counts and when each listed order last changed."""
+    return weak_etag(
+        request, sorted(counts.items()), [(order.pk, order.due_date, order.updated_at) for order in orders],
+    )
+
+
 class CraftsmanAssignedOrders(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        assigned_orders = Order.objects.filter(status='assigned')
+        assigned_orders = Order.objects.filter(status='assigned').select_related('bp_code')
         serializer = OrderSerializer(assigned_orders, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
@@ -463,9 +557,11 @@ class OrderInProcessAPI(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        orders = Order.objects.filter(status='in-process')
-        serializer = OrderCraftsmanSerializer(orders, many=True)
-        return Response(serializer.data)
+        orders = Order.objects.filter(status='in-process').select_related('craftsman').only(*CRAFTSMAN_LIST_FIELDS)
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer = OrderCraftsmanSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
 # class RejectedOrdersView(APIView):
 #     permission_classes = [IsAuthenticated]
@@ -488,9 +584,187 @@ class RejectedOrdersView(APIView):
 
         return Response({
             "rejected_orders": list(rejected_orders),
-            "total_rejected": rejected_orders.count()
+            "total_rejected": summarize()['statuses'].get('rejected', {}).get('total', 0)
         }, status=status.HTTP_200_OK)
     
+
+ORDER_EXPORT_COLUMNS = {
+    'order_no': 'order_no',
+    'bp_code': 'bp_code__bp_code',
+    'business_name': 'bp_code__business_name',
+    'name': 'name',
+    'reference_no': 'reference_no',
+    'status': 'status',
+    'order_date': 'order_date',
+    'due_date': 'due_date',
+    'category': 'category',
+    'order_type': 'order_type',
+    'quantity': 'quantity',
+    'weight': 'weight',
+    'branch_code': 'branch_code',
+    'product': 'product',
+    'design': 'design',
+    'vendor_design': 'vendor_design',
+    'supplied': 'supplied',
+    'balance': 'balance',
+    'purity': 'purity',
+    'metal_colour': 'metal_colour',
+    'craftsman': 'craftsman__bp_code',
+    'assigned_by': 'assigned_by',
+    'narration': 'narration',
+}
+
+
+class OrderExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Stream orders as CSV.
+        - columns: comma separated subset of ORDER_EXPORT_COLUMNS
+        - filters: status, bp_code, craftsman, from, to (order date, YYYY-MM-DD)
+        """
+        columns = export_columns(request, ORDER_EXPORT_COLUMNS)
+        orders = Order.objects.order_by('id')
+
+        params = request.query_params
+        if params.get("status"):
+            orders = orders.filter(status=params["status"])
+        if params.get("bp_code"):
+            orders = orders.filter(bp_code__bp_code=params["bp_code"])
+        if params.get("craftsman"):
+            orders = orders.filter(craftsman__bp_code=params["craftsman"])
+        for param, lookup in (("from", "order_date__date__gte"), ("to", "order_date__date__lte")):
+            if params.get(param):
+                day = parse_date(params[param])
+                if day is None:
+                    return Response({param: "Expected a date as YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+                orders = orders.filter(**{lookup: day})
+
+        return stream_csv(orders, columns, "orders.csv")
+
+
+class OrderSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+
+    def get(self, request):
+        """
+        Search orders by name, reference, product, design, collection, theme,
+        narration and description. Every word in `q` must match; results are
+        ranked by where the words occur. Paged with `page` and `limit`.
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = max(int(request.query_params.get("page", 1)), 1)
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), self.max_limit)
+        except ValueError:
+            return Response({"error": "page and limit must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches, has_more = search_orders(query, offset=(page - 1) * limit, limit=limit)
+        orders = Order.objects.select_related('bp_code').in_bulk([order_id for order_id, _ in matches])
+        results = []
+        for order_id, score in matches:
+            if order_id in orders:
+                data = OrderSerializer(orders[order_id], context={'request': request}).data
+                data['score'] = score
+                results.append(data)
+
+        return Response({
+            "page": page,
+            "next_page": page + 1 if has_more else None,
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
+
+class OrderSummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Order counts per status from the status counters.
+        Optional filters: `craftsman` and `bp_code` (partner codes).
+        """
+        filters = {}
+        for param, key in (("craftsman", "craftsman_id"), ("bp_code", "bp_code_id")):
+            code = request.query_params.get(param)
+            if code:
+                partner = BusinessPartner.objects.filter(bp_code=code).values_list('id', flat=True).first()
+                if partner is None:
+                    return Response({"error": f"Business partner {code} not found"}, status=status.HTTP_404_NOT_FOUND)
+                filters[key] = partner
+        return Response(summarize(**filters), status=status.HTTP_200_OK)
+
+
+class OrderTimelineView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, order_no):
+        """Every status change of the order, oldest first, with who made it."""
+        order = get_object_or_404(Order.objects.only('id', 'order_no', 'status', 'status_changed_at'), order_no=order_no)
+        events = order.events.select_related('actor', 'craftsman').order_by('ts', 'id')
+        return Response({
+            "order_no": order.order_no,
+            "status": order.status,
+            "status_changed_at": order.status_changed_at,
+            "events": OrderEventSerializer(events, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+
+class OrderFeedView(View):
+    """
+    Server-sent events of order status changes, so screens can refetch only
+    the orders that changed instead of polling the lists. Optional filters:
+    `craftsman` and `bp_code` (partner codes); resumes after the
+    Last-Event-ID header (or `last_event_id` parameter) on reconnect.
+    """
+
+    async def get(self, request):
+        user = await authenticate(request)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        try:
+            matches = await sync_to_async(event_filter)(user, request.GET)
+        except BusinessPartner.DoesNotExist as e:
+            return JsonResponse({"error": str(e)}, status=404)
+        except PermissionDenied as e:
+            return JsonResponse({"detail": str(e)}, status=403)
+
+        last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        seconds = getattr(settings, 'ORDER_FEED_STREAM_SECONDS', 300)
+        response = StreamingHttpResponse(
+            stream(get_broker(), matches, int(last_id) if last_id and last_id.isdigit() else None, seconds),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class OrderTimeInStateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Average and longest time orders spent in each status, from the
+        precomputed durations. Optional filters: `craftsman` (partner code)
+        and `category`; `by=craftsman` or `by=category` breaks the rows down.
+        """
+        filters = {}
+        code = request.query_params.get("craftsman")
+        if code:
+            filters["craftsman_id"] = BusinessPartner.objects.filter(bp_code=code).values_list('id', flat=True).first()
+            if filters["craftsman_id"] is None:
+                return Response({"error": f"Business partner {code} not found"}, status=status.HTTP_404_NOT_FOUND)
+        if request.query_params.get("category"):
+            filters["category"] = request.query_params["category"]
+        by = request.query_params.get("by")
+        if by not in (None, "craftsman", "category"):
+            return Response({"error": "by must be craftsman or category"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"statuses": time_in_state(by=by, **filters)}, status=status.HTTP_200_OK)
+
 class ApproveOrderView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -501,11 +775,10 @@ class ApproveOrderView(APIView):
         except Order.DoesNotExist:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if order.status != "in-process":
-            return Response({"error": "Order is not in-process"}, status=status.HTTP_400_BAD_REQUEST)
-
-        order.status = "awaiting-approval"
-        order.save()
+        try:
+            apply_transition(order, 'mark-completed', request.user)
+        except TransitionError as e:
+            return Response({"error": str(e)}, status=e.status_code)
 
         return Response({
             "message": f"Order {order_no} marked as completed by craftsman, waiting for approval"
@@ -515,9 +788,11 @@ class CompletedOrdersView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        completed_orders = Order.objects.filter(status="complete")
-        serializer = OrderCraftsmanSerializer(completed_orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        completed_orders = Order.objects.filter(status="complete").select_related('craftsman').only(*CRAFTSMAN_LIST_FIELDS)
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(completed_orders, request, view=self)
+        serializer = OrderCraftsmanSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request):
         order_no = request.data.get("order_no")
@@ -526,11 +801,10 @@ class CompletedOrdersView(APIView):
         except Order.DoesNotExist:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if order.status != "awaiting-approval":
-            return Response({"error": "Order is not awaiting approval"}, status=status.HTTP_400_BAD_REQUEST)
-
-        order.status = "complete"
-        order.save()
+        try:
+            apply_transition(order, 'approve-completion', request.user)
+        except TransitionError as e:
+            return Response({"error": str(e)}, status=e.status_code)
 
         return Response({
             "status": "completed",
@@ -0,0 +1,109 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+
+from BusinessPartner.imports import BaseImporter, ImportFailed
+from BusinessPartner.models import ROLE_CHOICES, BusinessPartner
+
+from .models import ResUser
+from .serializers import reserve_user_codes, reserve_usernames
+
+
+PERMISSION_COLUMNS = (
+    'view_only', 'copy', 'screenshot', 'print_perm', 'download', 'share', 'edit', 'delete',
+    'manage_roles', 'approve', 'reject', 'archive', 'restore', 'transfer', 'custom_access', 'full_control',
+)
+# Roles only an admin may hand out.
+PRIVILEGED_ROLES = tuple(ROLE_CHOICES) + ('Key User',)
+
+
+def _setup_worker():
+    if not apps.ready:
+        django.setup()
+
+
+class UserImporter(BaseImporter):
+    """
+    Bulk import of users. Usernames and user codes come from the same
+    sequences as registration; passwords are hashed in a process pool
+    (IMPORT_HASH_WORKERS, default: one per CPU) since hashing is CPU bound.
+    """
+    model = ResUser
+    columns = (
+        'full_name', 'email_id', 'mobile_no', 'company_name', 'password', 'role_name', 'user_state', 'status',
+        'dob', 'gender', 'city', 'state', 'country', 'pincode',
+    ) + PERMISSION_COLUMNS
+    required = ('role_name', 'password')
+    generated = ('username', 'user_code', 'password')
+    lookups = {'bp_code': (BusinessPartner, 'bp_code')}
+    unique_together = (('email_id',), ('mobile_no',))
+
+    def __init__(self, job):
+        super().__init__(job)
+        self.pool = None
+
+    def check_permission(self):
+        if self.user is None:
+            raise ImportFailed("You do not have permission to create users.")
+
+    def validate_row(self, user, data):
+        """Uploaders who are not admins may only create users with ordinary roles and no permission flags."""
+        if self.uploader_is_admin():
+            return
+        errors = {}
+        if user.role_name in PRIVILEGED_ROLES:
+            errors['role_name'] = [f"Only an admin can create {user.role_name} users."]
+        for column in PERMISSION_COLUMNS:
+            if getattr(user, column):
+                errors[column] = ["Only an admin can grant permissions."]
+        if errors:
+            raise ValidationError(errors)
+
+    def hash_passwords(self, passwords):
+        workers = min(getattr(settings, 'IMPORT_HASH_WORKERS', os.cpu_count() or 1), len(passwords))
+        if workers <= 1:
+            return [make_password(password) for password in passwords]
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker)
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(self.pool.map(make_password, passwords, chunksize=chunksize))
+
+    def prepare(self, users):
+        for user, username in zip(users, reserve_usernames(len(users))):
+            user.username = username
+        by_role = defaultdict(list)
+        for user in users:
+            by_role[user.role_name].append(user)
+        for role_name, members in by_role.items():
+            for user, user_code in zip(members, reserve_user_codes(role_name, len(members))):
+                user.user_code = user_code
+        for user, password in zip(users, self.hash_passwords([user.password for user in users])):
+            user.password = password
+        self.fill_locations(users)
+
+    def after_create(self, users):
+        """Put the users in their role group, as ResUser.save() does for new users."""
+        by_role = defaultdict(list)
+        for user in users:
+            by_role[user.role_name].append(user)
+        membership = ResUser.groups.through
+        for role_name, members in by_role.items():
+            group, created = Group.objects.get_or_create(name=role_name)
+            membership.objects.bulk_create(
+                [membership(resuser_id=user.pk, group_id=group.pk) for user in members],
+                ignore_conflicts=True,
+            )
+            # The role group's permissions follow the flags of the last user saved with that role.
+            members[-1].assign_role_permissions()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-16 20:20
+
+import re
+
+from django.db import migrations
+
+
+def seed_user_code_sequences(apps, schema_editor):
+    """
+    Start each user_code:<prefix> sequence after the highest code in use, and
+    the username sequence after the highest User<digits> name (at least 999,
+    so new usernames keep four digits).
+    """
+    ResUser = apps.get_model('user', 'ResUser')
+    Sequence = apps.get_model('BusinessPartner', 'Sequence')
+
+    highest = {'username': 999}
+    for user_code, username in ResUser._base_manager.values_list('user_code', 'username').iterator():
+        match = re.fullmatch(r'([A-Z]{2})-(\d+)', user_code or '')
+        if match:
+            key = f"user_code:{match.group(1)}"
+            highest[key] = max(highest.get(key, 0), int(match.group(2)))
+        match = re.fullmatch(r'User(\d+)', username or '')
+        if match:
+            highest['username'] = max(highest['username'], int(match.group(1)))
+
+    for key, value in highest.items():
+        sequence, created = Sequence.objects.get_or_create(key=key, defaults={'last_value': value})
+        if not created and sequence.last_value < value:
+            sequence.last_value = value
+            sequence.save(update_fields=['last_value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0030_sequence'),
+        ('user', '0017_alter_resuser_role_name_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_user_code_sequences, migrations.RunPython.noop),
+    ]
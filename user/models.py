@@ -6,10 +6,9 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth.models import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import Group, Permission
-from BusinessPartner.models import BusinessPartner
+from BusinessPartner.enrichment import mark_pending, touches_location
+from BusinessPartner.models import LOCATION_STATUS_CHOICES, BusinessPartner
 import logging
-import requests
-import time
 
 logger = logging.getLogger(__name__)
 
@@ -76,6 +75,9 @@ class ResUser(AbstractUser):
     state = models.CharField(max_length=100, blank=True, null=True)
     country = models.CharField(max_length=100, blank=True, null=True)
     pincode = models.CharField(max_length=10, blank=True, null=True)
+    location_status = models.CharField(max_length=10, choices=LOCATION_STATUS_CHOICES, default='', blank=True, editable=False)
+    location_attempts = models.PositiveSmallIntegerField(default=0, editable=False)
+    location_retry_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -100,6 +102,11 @@ class ResUser(AbstractUser):
     groups = models.ManyToManyField(Group, related_name="custom_users", blank=True)
     user_permissions = models.ManyToManyField(Permission, related_name="custom_users", blank=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['location_status', 'location_retry_at'], name='user_location_pending_idx'),
+        ]
+
     def assign_role_permissions(self):
         """
         Dynamically assigns permissions based on user's role and permission fields,
@@ -150,48 +157,10 @@ class ResUser(AbstractUser):
             self.assign_role_permissions()
     
     
-def fetch_location_pre_save(sender, instance, **kwargs):
-    if instance.pincode:
-        url_primary = f"https://api.postalpincode.in/pincode/{instance.pincode}"
-        url_backup = f"https://api.zippopotam.us/in/{instance.pincode}"
-        retries = 3  
-        timeout_seconds = 10
-
-        for attempt in range(retries):
-            try:
-                response = requests.get(url_primary, timeout=timeout_seconds)
-                response.raise_for_status()
-                data = response.json()
-
-                if data and data[0]['Status'] == "Success" and data[0]['PostOffice']:
-                    post_office = data[0]['PostOffice'][0]
-                    instance.city = post_office.get('District', '').strip() or None
-                    instance.state = post_office.get('State', '').strip() or None
-                    instance.country = post_office.get('Country', '').strip() or None
-                    return
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Attempt {attempt + 1}: Error fetching location for {instance.pincode}: {str(e)}")
-                time.sleep(2)
-        try:
-            response = requests.get(url_backup, timeout=timeout_seconds)
-            response.raise_for_status()
-            data = response.json()
-
-            if 'places' in data:
-                place = data['places'][0]
-                instance.city = place.get('place name', '').strip() or None
-                instance.state = place.get('state', '').strip() or None
-                instance.country = data.get('country', '').strip() or None
-                return
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Backup API failed: {str(e)}")
-
-        logger.error(f"Failed to fetch location for pincode {instance.pincode} after {retries} attempts")
-        instance.city = "Unknown"
-        instance.state = "Unknown"
-        instance.country = "Unknown"
+def fetch_location_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Queue a missing city, state or country for the enrichment worker (see BusinessPartner.enrichment)."""
+    if touches_location(update_fields, ('city', 'state', 'country')):
+        mark_pending(instance, ('city', 'state', 'country'))
 
 models.signals.pre_save.connect(fetch_location_pre_save, sender=ResUser)
 
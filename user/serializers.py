@@ -13,12 +13,28 @@ from rest_framework.exceptions import ValidationError
 from django.utils.crypto import get_random_string
 from django.core.cache import cache
 from django.contrib.auth.hashers import make_password, check_password
+from twilio.http.http_client import TwilioHttpClient
+from twilio.http.response import Response as TwilioResponse
 from twilio.rest import Client
 from rest_framework.exceptions import PermissionDenied
 from BusinessPartner.models import BusinessPartner
+from BusinessPartner.sequences import next_value, reserve
+from BusinessPartner.fieldsets import SparseFieldsetMixin
+from BusinessPartner.outbound import get_client
 
 
-class ResUserSerializer(serializers.ModelSerializer):
+USER_CODE_PREFIXES = {
+    "Project Owner": "PO",
+    "Super Admin": "SA",
+    "Admin": "AD",
+    "Key User": "KU",
+    "User": "UR",
+    "Craftsman": "CF",
+    "Walking Customer": "WC"
+}
+
+
+class ResUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Base User Serializer for handling general user logic.
     """
@@ -56,7 +72,7 @@ class ResUserSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'profile_picture', 'user_code', 'bp_code', 'full_name', 'email_id', 'mobile_no',
             'company_name', 'password', 'role_name', 'user_state', 'status', 'dob', 'gender',
-            'city', 'state', 'country', 'pincode', 'created_at', 'updated_at','user_permissions',
+            'city', 'state', 'country', 'pincode', 'location_status', 'created_at', 'updated_at','user_permissions',
             'view_only', 'copy', 'screenshot', 'print_perm', 'download', 'share', 'edit', 'delete', 
             'manage_roles', 'approve', 'reject', 'archive', 'restore', 'transfer', 'custom_access', 'full_control','delete_flag',
         ]
@@ -106,12 +122,11 @@ class ResUserSerializer(serializers.ModelSerializer):
         """
         data = super().to_representation(instance)
         
-        if instance.bp_code:
-            bp = BusinessPartner.objects.filter(bp_code=instance.bp_code.bp_code).first()
-            if bp:
-                data['bp_email'] = bp.email
-                data['bp_mobile'] = bp.mobile
-                data['bp_full_name'] = bp.full_name
+        if 'bp_code' in data and instance.bp_code:
+            bp = instance.bp_code
+            data['bp_email'] = bp.email
+            data['bp_mobile'] = bp.mobile
+            data['bp_full_name'] = bp.full_name
 
         return data
     
@@ -121,25 +136,8 @@ class ResUserSerializer(serializers.ModelSerializer):
         """
         Generate user_code based on role_name.
         """
-        role_prefix_mapping = {
-            "Project Owner": "PO",
-            "Super Admin": "SA",
-            "Admin": "AD",
-            "Key User": "KU",
-            "User": "UR",
-            "Craftsman": "CF",
-            "Walking Customer": "WC"
-        }
-
-        prefix = role_prefix_mapping.get(role_name, "UR")  # Default to UR if role not found
-        last_user = ResUser.objects.filter(user_code__startswith=prefix + "-").order_by('-user_code').first()
-        
-        if last_user:
-            last_number = int(last_user.user_code.split('-')[1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
-        
+        prefix = USER_CODE_PREFIXES.get(role_name, "UR")  # Default to UR if role not found
+        new_number = next_value(f"user_code:{prefix}")
         return f"{prefix}-{new_number:04d}"  # Formats as SA-0001, AD-0001, etc.
 
     def create(self, validated_data):
@@ -239,9 +237,52 @@ class LoginSerializer(serializers.Serializer):
 
         return data
     
+def generate_username():
+    """Generate a unique username (User1000, User1001, ...) from the username sequence."""
+    return f"User{next_value('username'):04d}"
+
+
+def reserve_usernames(count):
+    """Reserve `count` usernames at once, e.g. for batch imports."""
+    first, last = reserve('username', count)
+    return [f"User{number:04d}" for number in range(first, last + 1)]
+
+
+def reserve_user_codes(role_name, count):
+    """Reserve `count` user codes for `role_name` at once, e.g. for batch imports."""
+    prefix = USER_CODE_PREFIXES.get(role_name, "UR")
+    first, last = reserve(f"user_code:{prefix}", count)
+    return [f"{prefix}-{number:04d}" for number in range(first, last + 1)]
+
+
+class OutboundTwilioHttpClient(TwilioHttpClient):
+    """Sends Twilio API calls through the shared 'twilio' outbound client (see BusinessPartner.outbound)."""
+
+    def __init__(self):
+        super().__init__(pool_connections=False)
+
+    def request(self, method, url, params=None, data=None, headers=None, auth=None, timeout=None, allow_redirects=False):
+        body = {'json': data} if headers and headers.get('Content-Type', '').endswith('json') else {'data': data}
+        response = get_client('twilio').request(
+            method.upper(), url, params=params, headers=headers, auth=auth,
+            allow_redirects=allow_redirects, **({'timeout': timeout} if timeout else {}), **body)
+        return TwilioResponse(int(response.status_code), response.text, response.headers)
+
+
+_sms_client = None
+
+
+def sms_client():
+    """The Twilio client, built once so OTPs reuse its pooled connection."""
+    global _sms_client
+    if _sms_client is None:
+        _sms_client = Client(settings.TWILIO_ACCOUNT, settings.TWILIO_TOKEN, http_client=OutboundTwilioHttpClient())
+    return _sms_client
+
+
 def send_otp_via_sms(mobile_no, otp):
     """Twilio SMS gateway se OTP bhejne ke liye"""
-    client = Client(settings.TWILIO_ACCOUNT, settings.TWILIO_TOKEN)
+    client = sms_client()
     message = client.messages.create(
         body=f"Your OTP for password reset is {otp}.",
         from_=settings.TWILIO_FROM,
@@ -1,3 +1,132 @@
-from django.test import TestCase
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from BusinessPartner.enrichment import enrich_pending, requeue
+from BusinessPartner.imports import run_job
+from BusinessPartner.models import BusinessPartner
+from BusinessPartner.tests import ImportTestCase, PincodeDatasetTestCase
+from user.models import ResUser
+from user.serializers import ResUserSerializer, generate_username
+
+
+class CodeGenerationTests(TestCase):
+    def test_user_codes_are_keyed_by_role_prefix(self):
+        serializer = ResUserSerializer()
+        self.assertEqual(serializer.generate_user_code('Admin'), 'AD-0001')
+        self.assertEqual(serializer.generate_user_code('Admin'), 'AD-0002')
+        self.assertEqual(serializer.generate_user_code('Key User'), 'KU-0001')
+
+    def test_usernames_are_unique(self):
+        usernames = {generate_username() for _ in range(50)}
+        self.assertEqual(len(usernames), 50)
+
+
+class UserListQueryCountTests(TestCase):
+    def setUp(self):
+        self.partner = BusinessPartner.objects.create(
+            role='BUYER', bp_code='BA001', term='T1', business_name="Aurum", full_name="Buyer",
+            mobile='9000000001', email='buyer@example.com', pincode='600001', city='Chennai', state='Tamil Nadu')
+        self.permission = Permission.objects.first()
+        self.count = 0
+
+    def add_users(self, count):
+        for _ in range(count):
+            self.count += 1
+            user = ResUser.objects.create(username=f"user{self.count}", role_name='Admin', bp_code=self.partner)
+            user.user_permissions.add(self.permission)
+
+    def list_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_users(1)
+        single = {url: self.list_queries(url) for url in ['/user/list/', '/admin/list/']}
+        self.add_users(10)
+        self.assertEqual({url: self.list_queries(url) for url in single}, single)
+
+
+class UserConditionalGetTests(TestCase):
+    def test_detail_answers_304_until_the_user_changes(self):
+        user = ResUser.objects.create(username='maker', role_name='Admin', email_id='maker@example.com')
+        url = '/user/detail/maker@example.com/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", {etag.removeprefix("W/")}').status_code, 304)
+        user.full_name = "Maker"
+        user.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get('/user/list/')['ETag']
+        self.assertEqual(self.client.get('/user/list/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class UserLocationTests(PincodeDatasetTestCase):
+    def test_pincode_fills_city_state_and_country_in_the_background(self):
+        user = ResUser.objects.create(username='maker', role_name='Admin', pincode='600002')
+        self.assertEqual((user.city, user.location_status), (None, 'pending'))
+        enrich_pending()
+        user.refresh_from_db()
+        self.assertEqual((user.city, user.state, user.country), ('Chennai', 'Tamil Nadu', 'India'))
+        self.assertEqual(user.location_status, '')
+
+    def test_saves_that_skip_the_location_do_not_check_it(self):
+        user = ResUser.objects.create(username='maker', role_name='Admin', pincode='600002')
+        user.pincode = '400001'
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
+    def test_requeue_re_enriches_unknown_locations(self):
+        user = ResUser.objects.create(username='maker', role_name='Admin', pincode='400001', city='Pune', state='Maharashtra', country='India')
+        ResUser.objects.filter(pk=user.pk).update(city='Unknown', state='Unknown', country='Unknown')
+        self.assertEqual(requeue()['user.ResUser'], 1)
+        enrich_pending()
+        user.refresh_from_db()
+        self.assertEqual((user.city, user.state, user.country), ('Mumbai', 'Maharashtra', 'India'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], IMPORT_HASH_WORKERS=2)
+class UserImportTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = ResUser.objects.create(username='admin', role_name='Admin')
+
+    def test_import_generates_codes_and_hashes_passwords(self):
+        job = self.make_job('users', [
+            'full_name,email_id,mobile_no,role_name,password,edit',
+            'Asha,asha@example.com,9000000001,Admin,secret1,True',
+            'Ravi,ravi@example.com,9000000002,Admin,secret2,',
+            'Mala,mala@example.com,9000000003,Key User,secret3,',
+            'Copy,asha@example.com,9000000004,Admin,secret4,',
+            'Nobody,nobody@example.com,9000000005,Boss,secret5,',
+        ], user=self.admin)
+
+        run_job(job)
+
+        self.assertEqual((job.status, job.created_rows, job.error_rows), ('completed', 3, 2))
+        users = {user.full_name: user for user in ResUser.objects.exclude(pk=self.admin.pk)}
+        self.assertEqual(
+            sorted((user.user_code, user.username) for user in users.values()),
+            [('AD-0001', 'User1000'), ('AD-0002', 'User1001'), ('KU-0001', 'User1002')])
+        self.assertTrue(check_password('secret2', users['Ravi'].password))
+        self.assertEqual(list(users['Mala'].groups.values_list('name', flat=True)), ['Key User'])
+        self.assertEqual([sorted(error['errors']) for error in job.errors], [['email_id'], ['role_name']])
+
+    def test_only_admins_import_privileged_users(self):
+        clerk = ResUser.objects.create(username='clerk', role_name='User')
+        job = self.make_job('users', [
+            'full_name,email_id,role_name,password,full_control',
+            'Asha,asha@example.com,Admin,secret1,',
+            'Ravi,ravi@example.com,User,secret2,True',
+            'Mala,mala@example.com,User,secret3,',
+        ], user=clerk)
+
+        run_job(job)
+
+        self.assertEqual((job.status, job.created_rows), ('completed', 1))
+        self.assertEqual([sorted(error['errors']) for error in job.errors], [['role_name'], ['full_control']])
+        self.assertEqual(ResUser.objects.get(email_id='mala@example.com').role_name, 'User')
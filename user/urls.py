@@ -1,5 +1,6 @@
 from django.urls import path
-from user.views import ResUserRegistrationAPI, ResUserDetailView, ResUserDeleteView, ResAdminAPI, LoginAPIView, ForgotAPIView, ResetAPIView
+from user.views import ResUserRegistrationAPI, ResUserDetailView, ResUserDeleteView, ResAdminAPI, LoginAPIView, ForgotAPIView, ResetAPIView, ResUserExportView
+from BusinessPartner.views import ImportJobView
 
 urlpatterns = [
     # User API Endpoints
@@ -8,6 +9,8 @@ urlpatterns = [
     path('user/delete/<str:identifier>/', ResUserDeleteView.as_view(), name='user_delete_api'),  # DELETE for deleting a user
     path('user/list/', ResUserRegistrationAPI.as_view(), name='user_list_api'),  # GET for all users
     path('user/detail/<str:identifier>/', ResUserDetailView.as_view(), name='user_detail_api'),  # GET for single user
+    path('user/export/', ResUserExportView.as_view(), name='user_export_api'),  # GET streaming CSV export
+    path('user/import/', ImportJobView.as_view(kind='users'), name='user_import_api'),  # POST CSV/XLSX bulk import
     
     # Admin API Endpoints
     path('admin/registration/', ResAdminAPI.as_view(), name='admin_registration_api'),  # POST for admin registration
@@ -5,8 +5,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.hashers import check_password
 from user.models import ResUser, RoleDashboardMapping
-from user.serializers import ResUserSerializer, ResAdminUserSerializer, LoginSerializer, ForgotPasswordSerializer, ResetPasswordSerializer
+from user.serializers import ResUserSerializer, ResAdminUserSerializer, LoginSerializer, ForgotPasswordSerializer, ResetPasswordSerializer, generate_username
 from django.views.decorators.csrf import csrf_exempt
+from BusinessPartner.fieldsets import apply_sparse_fields
+from BusinessPartner.conditional import list_etag, not_modified, not_modified_response, row_etag
+from BusinessPartner.exports import export_columns, stream_csv
 from django.utils.decorators import method_decorator
 from django.core.cache import cache
 from rest_framework.permissions import AllowAny
@@ -18,13 +21,18 @@ import random
 from rest_framework.views import APIView
 
 
+def cached_partner(user):
+    """The user's business partner when the query already joined it, for the ETag."""
+    return user.bp_code if ResUser.bp_code.is_cached(user) else None
+
+
 class ResUserRegistrationAPI(generics.GenericAPIView):
     """
     API View for user registration.
     """
     serializer_class = ResUserSerializer
     permission_classes = [AllowAny]
-    queryset = ResUser.objects.all()
+    queryset = ResUser.objects.select_related('bp_code').prefetch_related('user_permissions')
 
     def post(self, request):
         """
@@ -45,7 +53,7 @@ class ResUserRegistrationAPI(generics.GenericAPIView):
             return Response({"error": "Mobile number is already taken"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Generate a unique username
-        username = f"User{random.randint(1000, 9999)}"
+        username = generate_username()
         user = serializer.save(username=username)
         user.set_password(serializer.validated_data['password'])
         user.save()
@@ -56,14 +64,60 @@ class ResUserRegistrationAPI(generics.GenericAPIView):
         """
         Retrieve user(s).
         """
+        queryset = apply_sparse_fields(self.get_queryset(), self.serializer_class, request)
+        if id:
+            user = get_object_or_404(queryset, id=id)
+            etag = row_etag(request, user, cached_partner(user))
+        else:
+            etag = list_etag(request, queryset)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
         if id:
-            user = get_object_or_404(ResUser, id=id)
-            serializer = self.serializer_class(user)
+            serializer = self.serializer_class(user, context={'request': request})
         else:
-            users = ResUser.objects.all()
-            serializer = self.serializer_class(users, many=True)
+            serializer = self.serializer_class(queryset, many=True, context={'request': request})
         
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+USER_EXPORT_COLUMNS = {
+    'user_code': 'user_code',
+    'username': 'username',
+    'full_name': 'full_name',
+    'email_id': 'email_id',
+    'mobile_no': 'mobile_no',
+    'role_name': 'role_name',
+    'user_state': 'user_state',
+    'status': 'status',
+    'company_name': 'company_name',
+    'bp_code': 'bp_code__bp_code',
+    'gender': 'gender',
+    'dob': 'dob',
+    'city': 'city',
+    'state': 'state',
+    'country': 'country',
+    'pincode': 'pincode',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+
+
+class ResUserExportView(APIView):
+    """
+    Stream users as CSV.
+    - columns: comma separated subset of USER_EXPORT_COLUMNS
+    - filters: role_name, status, user_state
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        columns = export_columns(request, USER_EXPORT_COLUMNS)
+        users = ResUser.objects.order_by('id')
+        for param in ("role_name", "status", "user_state"):
+            value = request.query_params.get(param)
+            if value:
+                users = users.filter(**{param: value})
+        return stream_csv(users, columns, "users.csv")
 
 
 class ResUserDetailView(generics.GenericAPIView):
@@ -72,26 +126,30 @@ class ResUserDetailView(generics.GenericAPIView):
     - GET: Retrieve a Business Partner by email or mobile_no.
     - PUT: Update a Business Partner.
     """
-    queryset = ResUser.objects.all()
+    queryset = ResUser.objects.select_related('bp_code').prefetch_related('user_permissions')
     serializer_class = ResUserSerializer
 
-    def get_object(self, identifier):
+    def get_object(self, identifier, queryset=None):
         """Helper method to get the object by email or mobile_no or return 404."""
+        queryset = ResUser.objects.all() if queryset is None else queryset
         # First try to find by email
         try:
-            return ResUser.objects.get(email_id=identifier)
+            return queryset.get(email_id=identifier)
         except ResUser.DoesNotExist:
             try:
                 # If not found by email, try by mobile_no
-                return ResUser.objects.get(mobile_no=identifier)
+                return queryset.get(mobile_no=identifier)
             except ResUser.DoesNotExist:
                 raise Http404("No ResUser matches the given query.")
 
     def get(self, request, identifier, *args, **kwargs):
         """Retrieve a Business Partner by email or mobile_no."""
-        instance = self.get_object(identifier)
+        instance = self.get_object(identifier, apply_sparse_fields(self.get_queryset(), ResUserSerializer, request))
+        etag = row_etag(request, instance, cached_partner(instance))
+        if not_modified(request, etag):
+            return not_modified_response(etag)
         serializer = self.get_serializer(instance)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     def put(self, request, identifier, *args, **kwargs):
         """Update an existing Business Partner using email or mobile_no."""
@@ -107,7 +165,7 @@ class ResUserDeleteView(generics.GenericAPIView):
     API for deleting a Business Partner:
     - DELETE: Delete a Business Partner by email or mobile_no
     """
-    queryset = ResUser.objects.all()
+    queryset = ResUser.objects.select_related('bp_code').prefetch_related('user_permissions')
     serializer_class = ResUserSerializer
 
     def get_object(self, identifier):
@@ -139,7 +197,7 @@ class ResAdminAPI(generics.GenericAPIView):
     API View for admin registration and management.
     """
     serializer_class = ResAdminUserSerializer
-    queryset = ResUser.objects.all()
+    queryset = ResUser.objects.select_related('bp_code').prefetch_related('user_permissions')
     permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
@@ -173,10 +231,10 @@ class ResAdminAPI(generics.GenericAPIView):
         Retrieve admin(s).
         """
         if id:
-            admin = get_object_or_404(ResUser, id=id)
+            admin = get_object_or_404(self.get_queryset(), id=id)
             serializer = self.get_serializer(admin)
         else:
-            admins = ResUser.objects.filter(role_name__iexact='admin')
+            admins = self.get_queryset().filter(role_name__iexact='admin')
             serializer = self.get_serializer(admins, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 